@@ -2,6 +2,8 @@
 ASGI config for spotify_apps project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the app with it (e.g. ``uvicorn spotify_apps.asgi:application``) so the
+loading page gets its progress streamed instead of polling for it.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
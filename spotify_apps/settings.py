@@ -141,6 +141,60 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# 'shared' and 'results' are seen by every web worker and management command
+# ('shared' e.g. for the MusicBrainz/Nominatim rate limits and artist cards,
+# 'results' for users' cached top artists). Create them with
+# `manage.py createcachetable`.
+# Beyond MAX_ENTRIES, a DatabaseCache deletes expired entries and then a
+# slice of the rest in cache key order (not the oldest), so the per-user
+# results, which grow with the number of users, have their own table and
+# can't push anything else out
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'spotify_map_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+    'results': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'spotify_map_result_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+}
+
+# Offline gazetteer that get_coords checks before Nominatim
+# (build it with `manage.py build_gazetteer`)
+GAZETTEER_INDEX_PATH = BASE_DIR / 'spotify_map' / 'data' / 'gazetteer.idx'
+
+# Offline MusicBrainz artist index checked before the MusicBrainz API
+# (build it with `manage.py build_musicbrainz_index`)
+MUSICBRAINZ_INDEX_PATH = BASE_DIR / 'spotify_map' / 'data' / 'musicbrainz.sqlite3'
+
+# Run /start-loading/ jobs on a thread pool in the web process. Set to False
+# and run `manage.py run_loading_jobs` to process them separately instead
+LOADING_JOBS_IN_PROCESS = True
+
+# Where `manage.py backup_database` writes (and restore_database reads) backups
+BACKUP_DIR = BASE_DIR / 'spotify_apps' / 'data' / 'backups'
+
+# Upstream APIs (`manage.py run_benchmarks` points these at local stubs)
+SPOTIFY_API_URL = os.getenv('SPOTIFY_API_URL', 'https://api.spotify.com/v1/')
+SPOTIFY_TOKEN_URL = os.getenv('SPOTIFY_TOKEN_URL', 'https://accounts.spotify.com/api/token')
+MUSICBRAINZ_API_URL = os.getenv('MUSICBRAINZ_API_URL', 'https://musicbrainz.org/ws/2/')
+NOMINATIM_URL = os.getenv('NOMINATIM_URL', 'https://nominatim.openstreetmap.org')
+
+# Where `manage.py run_benchmarks` saves its results
+BENCHMARK_DIR = BASE_DIR / 'spotify_apps' / 'data' / 'benchmarks'
+
 # Login redirection
 LOGIN_REDIRECT_URL = '/landing'  # Where users are redirected after logging in
 LOGOUT_REDIRECT_URL = '/'  # Where users are redirected after logging out
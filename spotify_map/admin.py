@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Artists,Coordinates
+from .models import Artists,Coordinates,UnmatchedArtists,UnresolvedLocations
 
 admin.site.register(Artists)
 admin.site.register(Coordinates)
+admin.site.register(UnresolvedLocations)
+admin.site.register(UnmatchedArtists)
@@ -0,0 +1,105 @@
+from django.core.cache import caches
+from .models import Artists, UnmatchedArtists
+
+# Display records ("cards") for artists, shared by every user and web worker.
+# Sessions only hold ranked Spotify IDs, which are hydrated from here. Cards
+# are built from the database when first asked for, so anything that changes
+# an artist's row (or UnmatchedArtists tombstone) must call forget_cards
+CARD_CACHE = "shared"
+CARD_TTL = 60 * 60 * 24 * 30  # 30 days
+
+TIME_RANGES = ["st_artists", "mt_artists", "lt_artists"]
+
+# Time ranges as they appear in URLs
+TIME_RANGE_KEYS = {"short": "st_artists", "medium": "mt_artists", "long": "lt_artists"}
+
+
+def _key(spotify_id: str) -> str:
+    return f"artist_card:{spotify_id}"
+
+
+def existing_artist_info(existing_artist: Artists, name: str = None) -> dict:
+    """
+    Builds the display dictionary for an artist already in the database.
+    """
+    return {
+        'spotify_id': existing_artist.spotify_id,
+        'name': name or existing_artist.name,
+        'birth_latitude': existing_artist.birth_latitude,
+        'birth_longitude': existing_artist.birth_longitude,
+        'birth_date': existing_artist.birth_date.isoformat() if existing_artist.birth_date else None,
+        'birth_location': existing_artist.birth_location,
+        'photo': existing_artist.photo_url,
+        'sign': existing_artist.zodiac_sign,
+    }
+
+
+def ranked_ids(all_artist_data: dict) -> dict:
+    """
+    Reduces a fetch_artists_info result to the ranked Spotify IDs per time
+    range, which is all that's kept in the session.
+    """
+    return {
+        time_range: [artist["spotify_id"] for artist in all_artist_data.get(time_range, [])]
+        for time_range in TIME_RANGES
+    }
+
+
+def get_cards(spotify_ids) -> dict:
+    """
+    Returns the cards for the given artists, keyed by spotify_id.
+
+    Cards missing from the cache are built from the database (and cached),
+    from UnmatchedArtists for artists MusicBrainz couldn't match (or
+    couldn't be asked about); artists in neither are left out.
+    """
+    spotify_ids = set(spotify_ids)
+    cache = caches[CARD_CACHE]
+    cached = cache.get_many([_key(spotify_id) for spotify_id in spotify_ids])
+    cards = {card["spotify_id"]: card for card in cached.values()}
+
+    missing = spotify_ids - set(cards)
+    if missing:
+        rebuilt = {
+            artist.spotify_id: existing_artist_info(artist)
+            for artist in Artists.objects.only(*Artists.DISPLAY_FIELDS).filter(spotify_id__in=missing)
+        }
+        # Artists MusicBrainz couldn't match only have a name
+        rebuilt.update(
+            (spotify_id, {"spotify_id": spotify_id, "name": name})
+            for spotify_id, name in UnmatchedArtists.objects.filter(
+                spotify_id__in=missing - set(rebuilt)
+            ).values_list("spotify_id", "name")
+        )
+        cache.set_many({_key(spotify_id): card for spotify_id, card in rebuilt.items()}, CARD_TTL)
+        cards.update(rebuilt)
+
+    return cards
+
+
+def forget_cards(spotify_ids):
+    """
+    Drops cached cards for artists whose details have changed, so they're
+    rebuilt from the database next time.
+    """
+    caches[CARD_CACHE].delete_many([_key(spotify_id) for spotify_id in spotify_ids])
+
+
+def hydrate(session_artists: dict, time_ranges=TIME_RANGES) -> dict:
+    """
+    Turns the session's ranked IDs back into lists of ranked artist
+    dictionaries, like the ones fetch_artists_info returns.
+    """
+    cards = get_cards(
+        spotify_id
+        for time_range in time_ranges
+        for spotify_id in session_artists.get(time_range, [])
+    )
+    return {
+        time_range: [
+            {**cards[spotify_id], "rank": i + 1}
+            for i, spotify_id in enumerate(session_artists.get(time_range, []))
+            if spotify_id in cards
+        ]
+        for time_range in time_ranges
+    }
@@ -0,0 +1,227 @@
+import gzip
+import json
+import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .artist_cards import forget_cards
+from .bulk import bulk_upsert
+from .models import Artists, Coordinates
+
+# Backups are directories of gzipped JSON Lines files, one set per table,
+# listed in order in the backup directory's manifest. An incremental backup
+# only holds rows whose updated_at is after the previous backup started, so a
+# restore replays the latest full backup and every incremental one after it.
+# Deleted rows aren't tracked.
+MANIFEST_NAME = "manifest.json"
+
+# Tables backed up, with the fields that identify a row on restore.
+# Coordinates' ids aren't referenced anywhere, so they're left out
+BACKUP_TABLES = {
+    "artists": (Artists, ["spotify_id"]),
+    "coordinates": (Coordinates, ["location"]),
+}
+
+
+class BackupEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds times to milliseconds; keep them exact so
+    # restored rows match the originals
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def backup_fields(model) -> list:
+    return [field.attname for field in model._meta.concrete_fields if not field.auto_created]
+
+
+def load_manifest(backup_dir: Path) -> dict:
+    try:
+        with open(backup_dir / MANIFEST_NAME, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"backups": []}
+
+
+def save_manifest(backup_dir: Path, manifest: dict):
+    # Written to a temporary file first so a failed run never corrupts it
+    tmp_path = backup_dir / (MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, backup_dir / MANIFEST_NAME)
+
+
+def backup_database(backup_dir, incremental: bool = False, rows_per_file: int = 100_000, chunk_size: int = 2000) -> dict:
+    """
+    Backs up every table in BACKUP_TABLES into a new directory under
+    backup_dir, one thread per table, and records it in the manifest.
+
+    Args:
+        backup_dir: Directory holding the manifest and backups.
+        incremental: Only back up rows changed since the last backup (falls
+            back to a full backup if there isn't one).
+        rows_per_file: Rows per compressed file.
+        chunk_size: Rows read from the database per query.
+
+    Returns:
+        The manifest entry for the new backup.
+    """
+    backup_dir = Path(backup_dir)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(backup_dir)
+
+    since = None
+    if incremental and manifest["backups"]:
+        since = parse_datetime(manifest["backups"][-1]["started_at"])
+
+    # Rows changed while the backup runs are picked up again next time
+    started_at = timezone.now()
+    kind = "incremental" if since else "full"
+    # To the microsecond, so backups started in the same second don't clash
+    name = f"{started_at:%Y%m%dT%H%M%S%f}-{kind}"
+    (backup_dir / name).mkdir()
+
+    with ThreadPoolExecutor(max_workers=len(BACKUP_TABLES)) as executor:
+        futures = {
+            table: executor.submit(_dump_table, table, backup_dir / name, since, rows_per_file, chunk_size)
+            for table in BACKUP_TABLES
+        }
+        tables = {table: future.result() for table, future in futures.items()}
+
+    entry = {
+        "name": name,
+        "kind": kind,
+        "started_at": started_at.isoformat(),
+        "since": since.isoformat() if since else None,
+        "tables": tables,
+    }
+    manifest["backups"].append(entry)
+    save_manifest(backup_dir, manifest)
+    return entry
+
+
+def _dump_table(table: str, target: Path, since, rows_per_file: int, chunk_size: int) -> dict:
+    model, _ = BACKUP_TABLES[table]
+    fields = backup_fields(model)
+    pk = model._meta.pk.attname
+    rows = model.objects.all()
+    if since:
+        rows = rows.filter(updated_at__gte=since)
+    rows = rows.values(*fields) if pk in fields else rows.values(*fields, pk)
+
+    files = []
+    count = 0
+    file = None
+    try:
+        for row in _keyset_pages(rows, pk, chunk_size):
+            if pk not in fields:
+                del row[pk]
+            if count % rows_per_file == 0:
+                if file:
+                    file.close()
+                files.append(f"{table}-{len(files):05d}.jsonl.gz")
+                file = gzip.open(target / files[-1], "wt", encoding="utf-8")
+            file.write(json.dumps(row, cls=BackupEncoder) + "\n")
+            count += 1
+    finally:
+        if file:
+            file.close()
+        connection.close()  # Each thread has its own connection
+
+    return {"rows": count, "files": files}
+
+
+def _keyset_pages(rows, pk: str, chunk_size: int):
+    # Pages by primary key rather than using iterator(), which MySQL's driver
+    # can't stream, so memory stays flat without one long-running query
+    rows = rows.order_by(pk)
+    last = None
+    while True:
+        page = list(rows.filter(pk__gt=last)[:chunk_size] if last is not None else rows[:chunk_size])
+        for row in page:
+            last = row[pk]
+            yield row
+        if len(page) < chunk_size:
+            return
+
+
+def restore_database(backup_dir, until: str = None, batch_size: int = 1000) -> list:
+    """
+    Restores the latest full backup (or the latest one up to and including
+    `until`) and every incremental backup after it, with bulk upserts, one
+    thread per table (except on SQLite).
+
+    Returns:
+        The manifest entries that were restored, each with the rows restored
+        per table.
+    """
+    backup_dir = Path(backup_dir)
+    backups = load_manifest(backup_dir)["backups"]
+    if until:
+        names = [backup["name"] for backup in backups]
+        if until not in names:
+            raise ValueError(f"No backup named {until!r} in {backup_dir}")
+        backups = backups[:names.index(until) + 1]
+
+    fulls = [i for i, backup in enumerate(backups) if backup["kind"] == "full"]
+    if not fulls:
+        raise ValueError(f"No full backup in {backup_dir}")
+    chain = backups[fulls[-1]:]
+
+    # SQLite allows one writer at a time, so tables are restored in turn there
+    workers = 1 if connection.vendor == "sqlite" else len(BACKUP_TABLES)
+
+    restored = []
+    for backup in chain:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                table: executor.submit(_load_table, table, backup_dir / backup["name"], info["files"], batch_size)
+                for table, info in backup["tables"].items()
+                if table in BACKUP_TABLES
+            }
+            restored.append({**backup, "restored": {table: future.result() for table, future in futures.items()}})
+    return restored
+
+
+def _load_table(table: str, source: Path, files: list, batch_size: int) -> int:
+    model, unique_fields = BACKUP_TABLES[table]
+    update_fields = [field for field in backup_fields(model) if field not in unique_fields]
+    count = 0
+    try:
+        for name in files:
+            with gzip.open(source / name, "rt", encoding="utf-8") as file:
+                rows = (json.loads(line) for line in file)
+                while batch := list(islice(rows, batch_size)):
+                    with transaction.atomic():
+                        bulk_upsert(model, [model(**row) for row in batch], unique_fields=unique_fields, update_fields=update_fields)
+                        _restore_timestamps(model, unique_fields, batch)
+                    if model is Artists:
+                        forget_cards([row["spotify_id"] for row in batch])
+                    count += len(batch)
+    finally:
+        connection.close()
+    return count
+
+
+def _restore_timestamps(model, unique_fields: list, rows: list):
+    # Bulk writes set auto_now fields (e.g. updated_at) to now, which would
+    # put every restored row in the next incremental backup. Puts the backed
+    # up values back, in one UPDATE per field
+    fields = [field for field in model._meta.concrete_fields if getattr(field, "auto_now", False)]
+    if not fields:
+        return
+    key = unique_fields[0]
+    model.objects.filter(**{f"{key}__in": [row[key] for row in rows]}).update(**{
+        field.attname: Case(
+            *[When(**{key: row[key]}, then=Value(parse_datetime(row[field.attname]))) for row in rows],
+            output_field=field,
+        )
+        for field in fields
+    })
@@ -0,0 +1,405 @@
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+import django
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from . import coordinates, http_client, musicbrainz
+from .artist_cards import ranked_ids
+from .coordinates import get_coords
+from .gazetteer import get_gazetteer
+from .jobs import arun_loading_job, run_loading_job
+from .models import Artists, Coordinates, LoadingJobs, UnmatchedArtists, UnresolvedLocations
+from .musicbrainz import afetch_artists_info, fetch_artists_info
+from .musicbrainz_index import get_musicbrainz_index
+from .spotify_utils import fetch_all_top_artists, get_spotify_client
+
+# Version of the results file; bump it if what a benchmark measures changes,
+# so runs from before and after aren't compared
+RESULTS_FORMAT = 1
+
+# Pages and API endpoints timed, once the user's artists are loaded
+VIEWS = [
+    ("home", "home", []),
+    ("top_artists", "top_artists", ["short"]),
+    ("zodiac", "zodiac", []),
+    ("map_geojson", "map_geojson", ["short"]),
+    ("map_clusters", "map_clusters", ["short", 3]),
+    ("artists_bbox", "artists_in_viewport", []),
+    ("artists_near", "artists_nearby", []),
+]
+VIEW_QUERIES = {
+    "artists_bbox": {"south": -90, "west": -180, "north": 90, "east": 180},
+    "artists_near": {"lat": 48.85, "lon": 2.35, "k": 10},
+}
+
+
+def summarize(times: list) -> dict:
+    ms = sorted(t * 1000 for t in times)
+    return {
+        "runs": len(ms),
+        "min_ms": round(ms[0], 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def reset_data():
+    """
+    Empties everything a load fills in: the artist tables, geocoding
+    results, jobs, caches and this process's in-memory coordinates.
+    """
+    for model in (Artists, UnmatchedArtists, Coordinates, UnresolvedLocations, LoadingJobs):
+        model.objects.all().delete()
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    coordinates._coords_cache.clear()
+
+
+@contextlib.contextmanager
+def sqlite_one_writer():
+    """
+    On SQLite, which locks the whole database for each write, makes
+    fetch_artists_info() look artists up one at a time, so its threads
+    don't fail with "database is locked". Elsewhere, does nothing.
+    """
+    if connection.vendor != "sqlite":
+        yield
+        return
+    workers = musicbrainz.MUSICBRAINZ_MAX_WORKERS
+    musicbrainz.MUSICBRAINZ_MAX_WORKERS = 1
+    try:
+        yield
+    finally:
+        musicbrainz.MUSICBRAINZ_MAX_WORKERS = workers
+
+
+def run_async(coroutine):
+    """
+    asyncio.run(), closing the loop's async HTTP client before the loop goes.
+    """
+    async def run():
+        async with http_client.async_client_scope():
+            return await coroutine
+    return asyncio.run(run())
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+class Benchmarks:
+    """
+    Times the app against stub upstreams (see stub_upstreams.py), in
+    whatever database is current, which each benchmark empties and fills as
+    it needs. Run it through `manage.py run_benchmarks`, which sets up a
+    separate test database.
+
+    Each benchmark is named group.variant, e.g. get_coords.miss.
+    """
+
+    def __init__(self, upstreams, repeat: int, import_rows: int, log=None):
+        self.upstreams = upstreams
+        self.repeat = repeat
+        self.import_rows = import_rows
+        self.log = log or (lambda name, summary: None)
+        self.sp = get_spotify_client({"access_token": "stub"})
+        self._top_artists = None
+        self._upstream_names = {urlsplit(server.url).netloc: server.name for server in upstreams.servers}
+        self._reset_upstream_stats()
+
+    def _reset_upstream_stats(self):
+        # Requests to, and latency of, each upstream during the timed runs
+        # of the current benchmark (see measure)
+        self._requests = Counter()
+        self._latency = {}
+
+    def cases(self) -> list:
+        return [
+            ("fetch_artists_info.cold", self.fetch_artists_info_cold),
+            ("fetch_artists_info.warm", self.fetch_artists_info_warm),
+            ("afetch_artists_info.cold", self.afetch_artists_info_cold),
+            ("loading_job.cold", self.loading_job_cold),
+            ("loading_job.warm", self.loading_job_warm),
+            ("loading_job.async_cold", self.loading_job_async_cold),
+            ("get_coords.memory_hit", lambda: self.get_coords("memory_hit")),
+            ("get_coords.db_hit", lambda: self.get_coords("db_hit")),
+            ("get_coords.miss", lambda: self.get_coords("miss")),
+            ("import_artists_from_csv.rows", lambda: self.import_artists_from_csv(bulk=False)),
+            ("import_artists_from_csv.bulk", lambda: self.import_artists_from_csv(bulk=True)),
+            ("fetch_top_artists", self.fetch_top_artists),
+        ] + [
+            (f"view.{name}", lambda url_name=url_name, args=args, name=name: self.view(name, url_name, args))
+            for name, url_name, args in VIEWS
+        ]
+
+    def run(self, only=None) -> dict:
+        """
+        Runs the benchmarks whose names start with one of `only` (all of them
+        if not given), returning summaries keyed by name.
+        """
+        results = {}
+        for name, case in self.cases():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            self._reset_upstream_stats()
+            times = case()
+            summary = summarize(times)
+            summary["upstream_requests"] = {
+                server.name: round(self._requests[server.name] / len(times), 1) for server in self.upstreams.servers
+            }
+            # Only upstreams queried through http_client (i.e. MusicBrainz)
+            summary["upstream_latency"] = {
+                upstream: {"mean_ms": round(stats["total_ms"] / stats["count"], 1), "max_ms": stats["max_ms"]}
+                for upstream, stats in self._latency.items()
+            }
+            results[name] = summary
+            self.log(name, summary)
+        return results
+
+    def measure(self, fn, setup=None, warmup: bool = False, repeat: int = None) -> list:
+        # Seconds per run of fn(setup()), leaving out setup. Upstream requests
+        # are only counted for the timed runs, not setup or warm-up. Output
+        # (e.g. "not found in Musicbrainz") is swallowed, here and on worker
+        # threads
+        times = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            if warmup:
+                fn(setup() if setup else None)
+            for _ in range(repeat or self.repeat):
+                state = setup() if setup else None
+                requests_before = self.upstreams.request_counts()
+                http_client.reset_latency_stats()
+                start = time.perf_counter()
+                fn(state)
+                times.append(time.perf_counter() - start)
+                self._record_upstream_stats(requests_before)
+        return times
+
+    def _record_upstream_stats(self, requests_before: dict):
+        for upstream, count in self.upstreams.request_counts().items():
+            self._requests[upstream] += count - requests_before[upstream]
+        for netloc, stats in http_client.latency_stats().items():
+            upstream = self._upstream_names.get(netloc, netloc)
+            totals = self._latency.setdefault(upstream, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            totals["count"] += stats["count"]
+            totals["total_ms"] += stats["mean_ms"] * stats["count"]
+            totals["max_ms"] = max(totals["max_ms"], stats["max_ms"])
+
+    def top_artists(self) -> list:
+        if self._top_artists is None:
+            _, _, rankings = fetch_all_top_artists(self.sp)
+            self._top_artists = [rankings["st_artists"], rankings["mt_artists"], rankings["lt_artists"]]
+        return self._top_artists
+
+    # --- Loading a user's artists ---
+
+    def fetch_artists_info_cold(self) -> list:
+        # A first login, with nothing in the database
+        top_artists = self.top_artists()
+        return self.measure(lambda _: fetch_artists_info(*top_artists), setup=reset_data)
+
+    def fetch_artists_info_warm(self) -> list:
+        # Every artist already in the database (or known to be unmatched)
+        top_artists = self.top_artists()
+        return self.measure(lambda _: fetch_artists_info(*top_artists), warmup=True)
+
+    def afetch_artists_info_cold(self) -> list:
+        top_artists = self.top_artists()
+        return self.measure(lambda _: run_async(afetch_artists_info(*top_artists)), setup=reset_data)
+
+    def _new_job(self) -> LoadingJobs:
+        return LoadingJobs.objects.create(token_info={"access_token": "stub"}, status=LoadingJobs.RUNNING)
+
+    def _check_job(self, job: LoadingJobs):
+        job.refresh_from_db()
+        if job.status != LoadingJobs.DONE:
+            raise RuntimeError(f"Loading job failed:\n{job.error}")
+
+    def loading_job_cold(self) -> list:
+        # The whole of a first login, from Spotify to the result
+        def setup():
+            reset_data()
+            return self._new_job()
+
+        def run(job):
+            run_loading_job(job)
+            self._check_job(job)
+
+        return self.measure(run, setup=setup)
+
+    def loading_job_warm(self) -> list:
+        # A returning user whose top artists haven't changed
+        def run(job):
+            run_loading_job(job)
+            self._check_job(job)
+
+        return self.measure(run, setup=self._new_job, warmup=True)
+
+    def loading_job_async_cold(self) -> list:
+        def setup():
+            reset_data()
+            return self._new_job()
+
+        def run(job):
+            run_async(arun_loading_job(job))
+            self._check_job(job)
+
+        return self.measure(run, setup=setup)
+
+    # --- Geocoding ---
+
+    def locations(self) -> list:
+        catalog = self.upstreams.catalog
+        return sorted({", ".join(catalog.birthplace(i)) for i in range(len(catalog.artists))})
+
+    def get_coords(self, variant: str) -> list:
+        """
+        Time per get_coords call when the location is already in this
+        process's memory (memory_hit), only in the database (db_hit), or
+        in neither, so it's geocoded (miss).
+        """
+        reset_data()
+        locations = self.locations()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for location in locations:
+                get_coords(location)
+
+        times = []
+        for _ in range(self.repeat):
+            for location in locations:
+                if variant == "db_hit":
+                    coordinates._coords_cache.clear()
+                elif variant == "miss":
+                    Coordinates.objects.filter(location=location).delete()
+                    UnresolvedLocations.objects.filter(location=location).delete()
+                    coordinates._coords_cache.clear()
+                times += self.measure(lambda _: get_coords(location), repeat=1)
+        return times
+
+    # --- Import commands ---
+
+    def _write_import_csv(self, path: str):
+        catalog = self.upstreams.catalog
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["spotify_id", "name", "birth_date", "birth_location", "complete_artist_json"])
+            for i in range(self.import_rows):
+                artist = catalog.spotify_artist(i)
+                writer.writerow([
+                    f"csv{i:06d}", artist["name"], f"{1950 + i % 50}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+                    ", ".join(catalog.birthplace(i)), json.dumps(artist),
+                ])
+
+    def import_artists_from_csv(self, bulk: bool) -> list:
+        # Locations are geocoded by the warm-up run, so this times the import
+        # itself
+        reset_data()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "artists.csv")
+            self._write_import_csv(path)
+            return self.measure(
+                lambda _: call_command("import_artists_from_csv", path, bulk=bulk, stdout=io.StringIO()),
+                setup=lambda: Artists.objects.all().delete(),
+                warmup=True,
+            )
+
+    def fetch_top_artists(self) -> list:
+        # New artists from a Spotify ID list, through Spotify and MusicBrainz
+        reset_data()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "top.csv")
+            with open(path, "w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                writer.writerow(["id", "name", "followers", "popularity"])
+                for artist in self.upstreams.catalog.artists:
+                    writer.writerow([artist["id"], artist["name"], artist["followers"]["total"], artist["popularity"]])
+
+            # One enrichment thread on SQLite, which allows one writer at a time
+            options = {"workers": 1} if connection.vendor == "sqlite" else {}
+            return self.measure(
+                lambda _: call_command("fetch_top_artists", path, stdout=io.StringIO(), **options),
+                setup=lambda: Artists.objects.all().delete(),
+            )
+
+    # --- Views ---
+
+    def _logged_in_client(self) -> Client:
+        reset_data()
+        with contextlib.redirect_stdout(io.StringIO()), sqlite_one_writer():
+            all_artists = fetch_artists_info(*self.top_artists())
+
+        client = Client()
+        session = client.session
+        session["artists"] = ranked_ids(all_artists)
+        session.save()
+        return client
+
+    def view(self, name: str, url_name: str, args: list) -> list:
+        client = self._logged_in_client()
+        url = reverse(url_name, args=args)
+
+        def run(_):
+            response = client.get(url, VIEW_QUERIES.get(name, {}))
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} returned {response.status_code}")
+
+        return self.measure(run, warmup=True)
+
+
+def results_document(results: dict, config: dict) -> dict:
+    """
+    Everything saved for a run: the results plus what they depend on.
+    """
+    return {
+        "format": RESULTS_FORMAT,
+        "created_at": timezone.now().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "config": {
+            **config,
+            "gazetteer": get_gazetteer() is not None,
+            "musicbrainz_index": get_musicbrainz_index() is not None,
+        },
+        "results": results,
+    }
+
+
+def compare(previous: dict, current: dict) -> list:
+    """
+    (name, previous median ms, current median ms, % change) for each
+    benchmark in both runs.
+    """
+    if previous.get("format") != current.get("format"):
+        return []
+    rows = []
+    for name, summary in current["results"].items():
+        before = previous["results"].get(name)
+        if before:
+            change = 100 * (summary["median_ms"] - before["median_ms"]) / before["median_ms"] if before["median_ms"] else 0.0
+            rows.append((name, before["median_ms"], summary["median_ms"], round(change, 1)))
+    return rows
@@ -0,0 +1,23 @@
+from django.db import connections, router
+
+
+def bulk_upsert(model, objs: list, unique_fields: list, update_fields: list, batch_size: int = None):
+    """
+    Inserts rows, updating update_fields on rows that already exist, in one
+    INSERT ... ON CONFLICT/ON DUPLICATE KEY UPDATE per batch. auto_now fields
+    are always updated, as save() would.
+
+    MySQL picks the conflicting key itself and rejects unique_fields, so it's
+    only passed to backends that support it.
+    """
+    connection = connections[router.db_for_write(model)]
+    update_fields = list(update_fields) + [
+        field.name for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) and field.name not in update_fields
+    ]
+    kwargs = {}
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs["unique_fields"] = unique_fields
+    return model.objects.bulk_create(
+        objs, batch_size=batch_size, update_conflicts=True, update_fields=update_fields, **kwargs
+    )
@@ -0,0 +1,222 @@
+import base64
+import json
+from django.db.models import Case, F, FloatField, Q, When
+from django.db.models.functions import Cos, Radians
+from .geohash import cell_range, covering_cells, distance_km, radius_bbox
+from .models import Artists, Coordinates
+from .artist_cards import existing_artist_info
+
+# Artists returned per bounding-box request, at most and by default
+MAX_BBOX_RESULTS = 500
+DEFAULT_BBOX_RESULTS = 200
+
+# Limits for radius and nearest-neighbour searches
+MAX_RADIUS_KM = 1000
+MAX_RADIUS_RESULTS = 500
+MAX_NEAREST = 100
+
+# Nearest-neighbour searches look this far out first, then four times as
+# far each time until they have enough results, but never further than
+# NEAREST_MAX_RADIUS_KM
+NEAREST_START_RADIUS_KM = 10
+NEAREST_MAX_RADIUS_KM = 2500
+
+# Geohash cells a radius search scans by default. More cells means finer
+# ones, so fewer rows outside the circle are read
+COVERING_CELLS = 32
+
+# Radius searches have the database order candidates by an approximate
+# distance and only read the nearest (limit * RADIUS_CANDIDATE_FACTOR +
+# RADIUS_CANDIDATE_SLACK) of them, whose exact distances settle the order
+RADIUS_CANDIDATE_FACTOR = 2
+RADIUS_CANDIDATE_SLACK = 20
+
+
+class InvalidQuery(ValueError):
+    """
+    Raised for bounding boxes, points, limits or cursors that don't make sense.
+    """
+
+
+def _encode_cursor(artist: Artists) -> str:
+    position = [artist.birth_latitude, artist.birth_longitude, artist.spotify_id]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[float, float, str]:
+    try:
+        latitude, longitude, spotify_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(latitude), float(longitude), str(spotify_id)
+    except (ValueError, TypeError):
+        raise InvalidQuery("Invalid cursor")
+
+
+def artists_in_bbox(south: float, west: float, north: float, east: float, limit: int = DEFAULT_BBOX_RESULTS, cursor: str = None) -> tuple[list, str | None]:
+    """
+    Looks up catalog artists born inside a bounding box, a page at a time.
+
+    Boxes with west > east cross the antimeridian. Results are ordered by
+    (birth_latitude, birth_longitude, spotify_id), the columns of the
+    artists' coordinates index, so each page is one range scan of it that
+    picks up where the cursor left off.
+
+    Returns:
+        (artists, next_cursor): display dictionaries like the ones
+        existing_artist_info builds, and the cursor for the next page, or
+        None if this is the last one.
+    """
+    if not (-90 <= south <= north <= 90) or not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise InvalidQuery("Invalid bounding box")
+    if not 1 <= limit <= MAX_BBOX_RESULTS:
+        raise InvalidQuery(f"limit must be between 1 and {MAX_BBOX_RESULTS}")
+
+    artists = Artists.objects.filter(_bbox_filter("birth_latitude", "birth_longitude", south, west, north, east))
+    if cursor:
+        latitude, longitude, spotify_id = _decode_cursor(cursor)
+        artists = artists.filter(
+            Q(birth_latitude__gt=latitude)
+            | Q(birth_latitude=latitude, birth_longitude__gt=longitude)
+            | Q(birth_latitude=latitude, birth_longitude=longitude, spotify_id__gt=spotify_id)
+        )
+
+    # One extra row to tell whether there's another page
+    page = list(
+        artists.only(*Artists.DISPLAY_FIELDS)
+        .order_by("birth_latitude", "birth_longitude", "spotify_id")[:limit + 1]
+    )
+    next_cursor = _encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return [existing_artist_info(artist) for artist in page[:limit]], next_cursor
+
+
+def _bbox_filter(latitude_field: str, longitude_field: str, south: float, west: float, north: float, east: float) -> Q:
+    # Boxes with west > east cross the antimeridian
+    if west <= east:
+        longitude_filter = Q(**{f"{longitude_field}__gte": west, f"{longitude_field}__lte": east})
+    else:
+        longitude_filter = Q(**{f"{longitude_field}__gte": west}) | Q(**{f"{longitude_field}__lte": east})
+    return longitude_filter & Q(**{f"{latitude_field}__gte": south, f"{latitude_field}__lte": north})
+
+
+def _validate_point(latitude: float, longitude: float):
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise InvalidQuery("Invalid coordinates")
+
+
+def _geohash_filter(south: float, west: float, north: float, east: float, max_cells: int) -> Q:
+    # Index range scans over the geohash cells covering the box (nothing if
+    # the box is too big a part of the globe to cover in max_cells)
+    cells = covering_cells(south, west, north, east, max_cells)
+    if cells is None:
+        return Q()
+    cell_filter = Q()
+    for cell in cells:
+        low, high = cell_range(cell)
+        cell_filter |= Q(geohash__gte=low, geohash__lt=high) if high else Q(geohash__gte=low)
+    return cell_filter
+
+
+def _approximate_distance(latitude_field: str, longitude_field: str, latitude: float, longitude: float):
+    # Squared equirectangular distance in degrees (longitudes the short way
+    # round, across the antimeridian if need be): only good for ordering
+    # nearby rows, but needs no trigonometry beyond one cosine per row
+    longitude_delta = Case(
+        When(**{f"{longitude_field}__lt": longitude - 180}, then=F(longitude_field) + (360 - longitude)),
+        When(**{f"{longitude_field}__gt": longitude + 180}, then=F(longitude_field) - (360 + longitude)),
+        default=F(longitude_field) - longitude,
+        output_field=FloatField(),
+    ) * Cos(Radians((F(latitude_field) + latitude) / 2))
+    latitude_delta = F(latitude_field) - latitude
+    return latitude_delta * latitude_delta + longitude_delta * longitude_delta
+
+
+def _within_radius(model, latitude_field: str, longitude_field: str, latitude: float, longitude: float, radius_km: float, max_cells: int, limit: int) -> list:
+    # (distance_km, pk) of the (up to) limit nearest rows within radius_km,
+    # nearest first. The geohash cells pick the index ranges to scan, the
+    # bounding box trims what's read from them, and the database sorts what's
+    # left, so only the nearest few candidates reach Python
+    bbox = radius_bbox(latitude, longitude, radius_km)
+    candidates = model.objects.filter(
+        _geohash_filter(*bbox, max_cells), _bbox_filter(latitude_field, longitude_field, *bbox)
+    ).annotate(
+        approximate_distance=_approximate_distance(latitude_field, longitude_field, latitude, longitude)
+    ).order_by("approximate_distance")[:limit * RADIUS_CANDIDATE_FACTOR + RADIUS_CANDIDATE_SLACK]
+    hits = []
+    for pk, lat, lon in candidates.values_list("pk", latitude_field, longitude_field):
+        distance = distance_km(latitude, longitude, lat, lon)
+        if distance <= radius_km:
+            hits.append((distance, pk))
+    hits.sort()
+    return hits[:limit]
+
+
+def _nearest(model, latitude_field: str, longitude_field: str, latitude: float, longitude: float, k: int, max_cells: int) -> list:
+    # (distance_km, pk) of the k nearest rows within NEAREST_MAX_RADIUS_KM.
+    # Anything nearer than the kth hit within a radius is also within it, so
+    # the first radius with k hits gives the answer
+    radius_km = NEAREST_START_RADIUS_KM
+    while True:
+        hits = _within_radius(model, latitude_field, longitude_field, latitude, longitude, radius_km, max_cells, k)
+        if len(hits) >= k or radius_km >= NEAREST_MAX_RADIUS_KM:
+            return hits
+        radius_km = min(radius_km * 4, NEAREST_MAX_RADIUS_KM)
+
+
+def _artists_with_distances(hits: list) -> list:
+    artists = Artists.objects.only(*Artists.DISPLAY_FIELDS).in_bulk([pk for _, pk in hits])
+    return [
+        {**existing_artist_info(artists[pk]), "distance_km": round(distance, 3)}
+        for distance, pk in hits
+        if pk in artists
+    ]
+
+
+def artists_near(latitude: float, longitude: float, radius_km: float, limit: int = MAX_RADIUS_RESULTS, max_cells: int = COVERING_CELLS) -> list:
+    """
+    Catalog artists born within radius_km of a point, nearest first, as
+    display dictionaries with a `distance_km`.
+
+    max_cells is how many geohash cells the search may scan; raise it for
+    finer cells (fewer rows read) at the cost of a longer query.
+    """
+    _validate_point(latitude, longitude)
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise InvalidQuery(f"radius_km must be more than 0 and at most {MAX_RADIUS_KM}")
+    if not 1 <= limit <= MAX_RADIUS_RESULTS:
+        raise InvalidQuery(f"limit must be between 1 and {MAX_RADIUS_RESULTS}")
+    hits = _within_radius(Artists, "birth_latitude", "birth_longitude", latitude, longitude, radius_km, max_cells, limit)
+    return _artists_with_distances(hits)
+
+
+def nearest_artists(latitude: float, longitude: float, k: int, max_cells: int = COVERING_CELLS) -> list:
+    """
+    The k catalog artists born nearest a point, as display dictionaries with
+    a `distance_km`. Only artists within NEAREST_MAX_RADIUS_KM are
+    considered, so there may be fewer than k.
+    """
+    _validate_point(latitude, longitude)
+    if not 1 <= k <= MAX_NEAREST:
+        raise InvalidQuery(f"k must be between 1 and {MAX_NEAREST}")
+    return _artists_with_distances(_nearest(Artists, "birth_latitude", "birth_longitude", latitude, longitude, k, max_cells))
+
+
+def _coordinates_with_distances(hits: list) -> list:
+    coordinates = Coordinates.objects.in_bulk([pk for _, pk in hits])
+    return [(coordinates[pk], distance) for distance, pk in hits if pk in coordinates]
+
+
+def coordinates_near(latitude: float, longitude: float, radius_km: float, limit: int = MAX_RADIUS_RESULTS, max_cells: int = COVERING_CELLS) -> list:
+    """
+    Geocoded locations within radius_km of a point (the limit nearest),
+    nearest first, as (Coordinates, distance_km) pairs.
+    """
+    _validate_point(latitude, longitude)
+    return _coordinates_with_distances(_within_radius(Coordinates, "latitude", "longitude", latitude, longitude, radius_km, max_cells, limit))
+
+
+def nearest_coordinates(latitude: float, longitude: float, k: int, max_cells: int = COVERING_CELLS) -> list:
+    """
+    The k geocoded locations nearest a point (within NEAREST_MAX_RADIUS_KM),
+    as (Coordinates, distance_km) pairs.
+    """
+    _validate_point(latitude, longitude)
+    return _coordinates_with_distances(_nearest(Coordinates, "latitude", "longitude", latitude, longitude, k, max_cells))
@@ -0,0 +1,88 @@
+import hashlib
+import math
+from django.core.cache import caches
+from .map_data import encode_geojson
+
+# Artists are grouped on a grid of CELL_SIZE-pixel squares in Web Mercator
+# (the projection the map tiles use), so at any zoom there are never more
+# features than grid cells in view, and clusters split as the map zooms in
+CELL_SIZE = 60
+TILE_SIZE = 256
+MAX_ZOOM = 18  # Highest zoom of the map tiles; points still together there share a birthplace
+
+# Artists listed in a cluster's properties (the best ranked ones); the
+# rest are only counted
+CLUSTER_MEMBER_LIMIT = 20
+
+CLUSTER_CACHE = "shared"
+CLUSTER_TTL = 60 * 60 * 24  # 1 day
+
+
+def _project(lon: float, lat: float) -> tuple[float, float]:
+    # Web Mercator, scaled to 0-1 across the world
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = (lon + 180) / 360
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def _unproject(x: float, y: float) -> tuple[float, float]:
+    lon = x * 360 - 180
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lon, lat
+
+
+def cluster_points(points: dict, zoom: int) -> dict:
+    """
+    Groups a FeatureCollection of artist points (see artists_geojson) into
+    one feature per occupied grid cell at the given zoom.
+
+    Each feature sits at its members' centroid, with properties `count` and
+    `artists` (the members' properties, best ranked first, up to
+    CLUSTER_MEMBER_LIMIT).
+    """
+    cells_per_side = TILE_SIZE * 2 ** zoom / CELL_SIZE
+    cells = {}
+    for feature in points["features"]:
+        x, y = _project(*feature["geometry"]["coordinates"])
+        cell = (int(x * cells_per_side), int(y * cells_per_side))
+        cells.setdefault(cell, []).append((x, y, feature["properties"]))
+
+    features = []
+    for members in cells.values():
+        members.sort(key=lambda member: (member[2].get("rank") is None, member[2].get("rank")))
+        lon, lat = _unproject(
+            sum(x for x, _, _ in members) / len(members),
+            sum(y for _, y, _ in members) / len(members),
+        )
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(lon, 6), round(lat, 6)]},
+            "properties": {
+                "count": len(members),
+                "artists": [properties for _, _, properties in members[:CLUSTER_MEMBER_LIMIT]],
+            },
+        })
+
+    # Best ranked cluster first, for a stable order
+    features.sort(key=lambda feature: feature["properties"]["artists"][0].get("rank") or 0)
+    return {"type": "FeatureCollection", "features": features}
+
+
+def cluster_levels(points: dict) -> list:
+    """
+    Returns cluster_points for every zoom from 0 to MAX_ZOOM, computed once
+    per distinct set of points and cached.
+    """
+    key = "map_clusters:" + hashlib.sha256(encode_geojson(points)).hexdigest()
+    cache = caches[CLUSTER_CACHE]
+    levels = cache.get(key)
+    if levels is None:
+        levels = [cluster_points(points, zoom) for zoom in range(MAX_ZOOM + 1)]
+        cache.set(key, levels, CLUSTER_TTL)
+    return levels
+
+
+def clusters_at_zoom(points: dict, zoom: int) -> dict:
+    return cluster_levels(points)[max(0, min(zoom, MAX_ZOOM))]
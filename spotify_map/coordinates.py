@@ -1,50 +1,195 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from threading import Lock
+import time
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
 from geopy.geocoders import Nominatim
-from time import sleep
-from .models import Coordinates
+from .gazetteer import get_gazetteer
+from .models import Coordinates, UnresolvedLocations
+from .rate_limit import LIMITERS
 import re
 
+# Number of locations (found or not) remembered in memory by each process
+COORDS_CACHE_SIZE = 4096
+
+# How long a location Nominatim couldn't find is skipped before trying again
+UNRESOLVED_LOCATION_TTL = timedelta(days=30)
+
+# Geocoding blocks (geopy and the ORM), so aget_coords runs it on this many
+# threads of its own, however many async loads are in flight. Nominatim only
+# allows a request a second anyway
+GEOCODING_WORKERS = 4
+
+_geolocator = None
+_geocoding_executor = ThreadPoolExecutor(max_workers=GEOCODING_WORKERS, thread_name_prefix="geocoding")
+
+
+class LRUCache:
+    """
+    Small thread-safe least-recently-used cache.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# location -> (coordinates or None, monotonic expiry time or None)
+_coords_cache = LRUCache(COORDS_CACHE_SIZE)
+
+
+def get_geolocator() -> Nominatim:
+    global _geolocator
+    url = urlsplit(settings.NOMINATIM_URL)
+    domain = url.netloc + url.path.rstrip("/")
+    if _geolocator is None or (_geolocator.scheme, _geolocator.domain) != (url.scheme, domain):
+        _geolocator = Nominatim(user_agent="Spotify_Apps", timeout=10, domain=domain, scheme=url.scheme)
+    return _geolocator
+
+def geocode(geolocator: Nominatim, query: str):
+    # Rate limited by host, as in http_client
+    limiter = LIMITERS.get(urlsplit(geolocator.api).hostname)
+    if limiter:
+        limiter.acquire()
+    return geolocator.geocode(query)
+
+def resolve(geolocator: Nominatim, query: str) -> tuple[float, float] | None:
+    # Check the offline gazetteer first; only ask Nominatim if it's not there
+    gazetteer = get_gazetteer()
+    coords = gazetteer.lookup(query) if gazetteer else None
+    if coords:
+        return coords
+
+    coords = geocode(geolocator, query)
+    if coords:
+        return (coords.latitude, coords.longitude)
+    return None
+
 def store_coordinates_in_db(location: str, lat: float, lon: float):
-    resp = Coordinates.objects.create(location=location, latitude=lat, longitude=lon)
+    # Another worker may have stored the same location in the meantime
+    resp, created = Coordinates.objects.get_or_create(
+        location=location, defaults={'latitude': lat, 'longitude': lon}
+    )
     if not resp:
         print(f"Error adding {location} to coordinates database - skipping doing so")
+    UnresolvedLocations.objects.filter(location=location).delete()
+
+def store_unresolved_location_in_db(location: str):
+    UnresolvedLocations.objects.update_or_create(
+        location=location, defaults={'attempted_at': timezone.now()}
+    )
+
+def _remember_miss(location: str, attempted_at):
+    # Convert the persisted attempt time into an in-process expiry time
+    remaining = (attempted_at + UNRESOLVED_LOCATION_TTL - timezone.now()).total_seconds()
+    _coords_cache.set(location, (None, time.monotonic() + remaining))
+
+def _cached_coords(location: str) -> tuple[bool, tuple[float, float] | None]:
+    # (whether this process already looked the location up, what it found)
+    cached = _coords_cache.get(location)
+    if cached:
+        coords, expires = cached
+        if expires is None or expires > time.monotonic():
+            return True, coords
+    return False, None
 
 def get_coords(location: str) -> tuple[float, float] | None:
-    geolocator = Nominatim(user_agent="Spotify_Apps", timeout=10)
+    # Look to see if location already looked up by this process
+    hit, coords = _cached_coords(location)
+    if hit:
+        return coords
 
     # Look to see if location already in coordinates database
     db_coordinates = Coordinates.objects.filter(location = location).first()
 
     # If location already in dataset, return those coordinates
     if db_coordinates:
-        return (db_coordinates.latitude, db_coordinates.longitude)
+        coords = (db_coordinates.latitude, db_coordinates.longitude)
+        _coords_cache.set(location, (coords, None))
+        return coords
+
+    # If location recently not found, don't search again until it expires
+    unresolved = UnresolvedLocations.objects.filter(
+        location=location,
+        attempted_at__gt=timezone.now() - UNRESOLVED_LOCATION_TTL,
+    ).first()
+    if unresolved:
+        _remember_miss(location, unresolved.attempted_at)
+        return None
 
+    coords = search_location(location)
+    if coords:
+        store_coordinates_in_db(location, coords[0], coords[1])
+        _coords_cache.set(location, (coords, None))
     else:
-         # Attempt to search for location coordinates
-            sleep(1.1)
-            coords = geolocator.geocode(location)
-            if coords:
-                # Coordinates found, returning those
-                store_coordinates_in_db(location, coords.latitude, coords.longitude)
-                return (coords.latitude, coords.longitude)
+        store_unresolved_location_in_db(location)
+        _remember_miss(location, timezone.now())
+    return coords
 
-            else:
-                # Initial search didn't work. Try searching on location country
-                location_parts = location.split(",")
-
-                if len(location_parts) > 1:
-                    # Format is [city, country] or [city, state, country], etc.
-                    sleep(1.1)
-                    coords = geolocator.geocode(location_parts[-1])
-                    if coords:
-                        # Coordinates found for country, returning those
-                        store_coordinates_in_db(location, coords.latitude, coords.longitude)
-                        return (coords.latitude, coords.longitude)
-                    else:
-                        # Country coordinates not found, unsuccessful search
-                        return None
-
-                else:
-                    # Nothing else to search for, unsuccessful search
-                    return None
+def _get_coords_in_worker(location: str):
+    try:
+        return get_coords(location)
+    finally:
+        # Geocoding threads each open their own DB connection; don't leak them
+        connection.close()
 
+async def aget_coords(location: str) -> tuple[float, float] | None:
+    """
+    Async version of get_coords(). Locations this process has already
+    looked up are answered right away; the rest wait for a geocoding thread.
+    """
+    hit, coords = _cached_coords(location)
+    if hit:
+        return coords
+    return await asyncio.get_running_loop().run_in_executor(_geocoding_executor, _get_coords_in_worker, location)
+
+def search_location(location: str) -> tuple[float, float] | None:
+    geolocator = get_geolocator()
+
+    # Attempt to search for location coordinates
+    coords = resolve(geolocator, location)
+    if coords:
+        # Coordinates found, returning those
+        return coords
+
+    else:
+        # Initial search didn't work. Try searching on location country
+        location_parts = location.split(",")
+
+        if len(location_parts) > 1:
+            # Format is [city, country] or [city, state, country], etc.
+            coords = resolve(geolocator, location_parts[-1])
+            if coords:
+                # Coordinates found for country, returning those
+                return coords
+            else:
+                # Country coordinates not found, unsuccessful search
+                return None
 
+        else:
+            # Nothing else to search for, unsuccessful search
+            return None
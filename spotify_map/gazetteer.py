@@ -0,0 +1,91 @@
+import mmap
+import re
+import unicodedata
+from django.conf import settings
+
+# First line of an index file; bump the version if the line format changes
+INDEX_HEADER = b"SPOTIFY_MAP_GAZETTEER 1\n"
+
+_gazetteer = None
+_gazetteer_loaded = False
+
+
+def normalize_place(name: str) -> str:
+    """
+    Normalizes a place name for lookups: strips accents and punctuation,
+    lowercases and collapses whitespace ("São Paulo" -> "sao paulo").
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w]+", " ", stripped.casefold()).split())
+
+
+def location_key(location: str) -> str:
+    """
+    Index key for a "City, State" / "City, Country" style location string.
+    """
+    parts = [normalize_place(part) for part in location.split(",")]
+    return "|".join(part for part in parts if part)
+
+
+class Gazetteer:
+    """
+    Read-only, memory-mapped place name index.
+
+    The file is a header line followed by "key<TAB>lat<TAB>lon" lines sorted
+    by key (as UTF-8 bytes), so a lookup is a binary search over the mapped
+    file with no parsing up front. Build one with `manage.py build_gazetteer`.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(INDEX_HEADER)] != INDEX_HEADER:
+            raise ValueError(f"{path} is not a gazetteer index")
+
+    def _find(self, key: bytes) -> bytes | None:
+        mm = self._mm
+        lo, hi = len(INDEX_HEADER), len(mm)
+
+        # lo and hi always sit on line starts
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = mm.rfind(b"\n", 0, mid) + 1
+            end = mm.find(b"\n", start)
+            line = mm[start:end]
+            line_key = line.split(b"\t", 1)[0]
+            if line_key == key:
+                return line
+            elif line_key < key:
+                lo = end + 1
+            else:
+                hi = start
+        return None
+
+    def lookup(self, location: str) -> tuple[float, float] | None:
+        """
+        Returns the (latitude, longitude) of a location, if it's in the index.
+        """
+        key = location_key(location)
+        if not key:
+            return None
+        line = self._find(key.encode("utf-8"))
+        if line is None:
+            return None
+        _, lat, lon = line.split(b"\t")
+        return (float(lat), float(lon))
+
+
+def get_gazetteer() -> Gazetteer | None:
+    """
+    Returns the offline gazetteer, or None if no index has been built.
+    """
+    global _gazetteer, _gazetteer_loaded
+    if not _gazetteer_loaded:
+        try:
+            _gazetteer = Gazetteer(settings.GAZETTEER_INDEX_PATH)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Offline gazetteer not available ({e}) - using Nominatim only")
+            _gazetteer = None
+        _gazetteer_loaded = True
+    return _gazetteer
@@ -0,0 +1,114 @@
+import math
+
+# Geohashes name nested lat/lon cells: each extra character splits a cell
+# into 32, and cells sharing a prefix are inside the cell that prefix names.
+# Stored geohashes are indexed, so "everything in cell X" is a range scan on
+# any database (see cell_range), with no spatial extension needed
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # About 5 m x 5 m, stored on Artists and Coordinates
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True  # Bits alternate longitude, latitude, starting with longitude
+    while len(geohash) < precision:
+        value, value_range = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = bits * 2 + 1
+            value_range[0] = middle
+        else:
+            bits = bits * 2
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = bit_count = 0
+    return "".join(geohash)
+
+
+def encode_or_none(latitude, longitude, precision: int = GEOHASH_PRECISION) -> str | None:
+    if latitude is None or longitude is None:
+        return None
+    return encode(latitude, longitude, precision)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """
+    (height, width) of a geohash cell in degrees.
+    """
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def cell_range(cell: str) -> tuple[str, str | None]:
+    """
+    Bounds [low, high) of the geohashes inside a cell. The base32 alphabet
+    is in ASCII order, so this is also their order in the database (high is
+    None when there's no upper bound).
+    """
+    prefix = cell.rstrip(BASE32[-1])
+    if not prefix:
+        return cell, None
+    return cell, prefix[:-1] + BASE32[BASE32.index(prefix[-1]) + 1]
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # Haversine
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(latitude: float, longitude: float, radius_km: float) -> tuple[float, float, float, float]:
+    """
+    (south, west, north, east) of a box around a circle. west > east when it
+    crosses the antimeridian; it spans every longitude if it covers a pole.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    south, north = latitude - lat_delta, latitude + lat_delta
+    if south <= -90 or north >= 90:
+        return max(south, -90.0), -180.0, min(north, 90.0), 180.0
+
+    lon_delta = lat_delta / math.cos(math.radians(max(abs(south), abs(north))))
+    if lon_delta >= 180:
+        return south, -180.0, north, 180.0
+    west = (longitude - lon_delta + 180) % 360 - 180
+    east = (longitude + lon_delta + 180) % 360 - 180
+    return south, west, north, east
+
+
+def covering_cells(south: float, west: float, north: float, east: float, max_cells: int = 16) -> list | None:
+    """
+    The geohash cells covering a box, at the finest precision that needs no
+    more than max_cells of them. None if even one-character cells are too
+    many (i.e. the box is a big part of the globe).
+    """
+    lon_span = east - west if west <= east else east - west + 360
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        columns = min(math.floor(lon_span / width) + 2, math.ceil(360 / width))
+        if rows * columns > max_cells:
+            continue
+
+        # Stepping a whole cell at a time lands in each row and column once
+        cells = set()
+        for row in range(rows):
+            lat = min(south + row * height, 90.0)
+            for column in range(columns):
+                lon = (west + column * width + 180) % 360 - 180
+                cells.add(encode(lat, lon, precision))
+        return sorted(cells)
+    return None
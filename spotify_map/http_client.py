@@ -0,0 +1,198 @@
+import asyncio
+import contextlib
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import httpx
+from .rate_limit import LIMITERS
+
+# MusicBrainz asks every client to identify itself
+USER_AGENT = "Spotify_Apps"
+
+TIMEOUT = httpx.Timeout(10.0)
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30)
+
+# Throttled or temporarily failing responses are retried with exponential
+# backoff (0.5s, 1s, 2s, 4s), or after the upstream's Retry-After if given
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+MAX_RETRY_WAIT = 60
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+_latency_lock = threading.Lock()
+_latency = {}
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Raised when an upstream API is still throttling or failing after retries,
+    so callers don't mistake it for an empty result.
+    """
+
+
+def get_client() -> httpx.Client:
+    """
+    Returns the process-wide pooled client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    headers={"User-Agent": USER_AGENT}, timeout=TIMEOUT, limits=LIMITS
+                )
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Returns the pooled async client for the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT}, timeout=TIMEOUT, limits=LIMITS
+        )
+        _async_clients[loop] = client
+    return client
+
+
+@contextlib.asynccontextmanager
+async def async_client_scope():
+    """
+    Closes the running event loop's async client, if one was made, on the
+    way out. Wrap the work of short-lived loops (e.g. from asyncio.run()) in
+    it so their connections don't outlive them; an ASGI server's loop lasts
+    as long as the process, and its client with it.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        yield
+    finally:
+        client = _async_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+def record_latency(host: str, seconds: float):
+    # Keyed by host[:port], so upstreams on one host (e.g. local stubs) are
+    # told apart
+    with _latency_lock:
+        stats = _latency.setdefault(host, {"count": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["total"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+
+
+def latency_stats() -> dict:
+    """
+    Returns request count, mean and max latency (in ms) per upstream host,
+    since the process started or reset_latency_stats() was last called.
+    """
+    with _latency_lock:
+        return {
+            host: {
+                "count": stats["count"],
+                "mean_ms": round(1000 * stats["total"] / stats["count"], 1),
+                "max_ms": round(1000 * stats["max"], 1),
+            }
+            for host, stats in _latency.items()
+        }
+
+
+def reset_latency_stats():
+    with _latency_lock:
+        _latency.clear()
+
+
+def retry_delay(response: httpx.Response | None, attempt: int) -> float:
+    """
+    Seconds to wait before retrying, preferring the upstream's Retry-After.
+    """
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return BACKOFF_BASE * 2 ** attempt
+
+
+def _should_retry(response: httpx.Response | None) -> bool:
+    return response is None or response.status_code in RETRY_STATUSES
+
+
+def get(url: str, **kwargs) -> httpx.Response:
+    """
+    GETs a URL through the pooled client, waiting for the host's rate limit
+    and retrying throttled or failed requests.
+
+    Raises:
+        UpstreamUnavailable: if every attempt was throttled or failed.
+    """
+    host = urlsplit(url).hostname
+    limiter = LIMITERS.get(host)
+    response, error = None, None
+
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            delay = retry_delay(response, attempt - 1)
+            if delay > MAX_RETRY_WAIT:
+                break
+            time.sleep(delay)
+        if limiter:
+            limiter.acquire()
+
+        start = time.monotonic()
+        try:
+            response, error = get_client().get(url, **kwargs), None
+        except httpx.TransportError as e:
+            response, error = None, e
+        record_latency(urlsplit(url).netloc, time.monotonic() - start)
+
+        if not _should_retry(response):
+            return response
+
+    status = response.status_code if response is not None else error
+    raise UpstreamUnavailable(f"{host} unavailable ({status})") from error
+
+
+async def aget(url: str, **kwargs) -> httpx.Response:
+    """
+    Async version of get().
+    """
+    host = urlsplit(url).hostname
+    limiter = LIMITERS.get(host)
+    response, error = None, None
+
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            delay = retry_delay(response, attempt - 1)
+            if delay > MAX_RETRY_WAIT:
+                break
+            await asyncio.sleep(delay)
+        if limiter:
+            await limiter.aacquire()
+
+        start = time.monotonic()
+        try:
+            response, error = await get_async_client().get(url, **kwargs), None
+        except httpx.TransportError as e:
+            response, error = None, e
+        record_latency(urlsplit(url).netloc, time.monotonic() - start)
+
+        if not _should_retry(response):
+            return response
+
+    status = response.status_code if response is not None else error
+    raise UpstreamUnavailable(f"{host} unavailable ({status})") from error
@@ -0,0 +1,268 @@
+import asyncio
+import contextlib
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .artist_cards import ranked_ids
+from .models import LoadingJobs
+from .musicbrainz import afetch_artists_info, fetch_artists_info
+from .result_cache import cache_result, get_cached_result, top_artists_fingerprint
+from .spotify_utils import fetch_all_top_artists, get_spotify_client
+
+# Loads running at once in each web process (when run in-process)
+LOADING_JOB_WORKERS = 4
+
+# LoadingJobs counter updated for each progress stage reported by
+# fetch_artists_info
+PROGRESS_FIELDS = {
+    "to_enrich": "artists_to_enrich",
+    "enriched": "artists_enriched",
+    "geocoded": "artists_geocoded",
+}
+
+# A running job's row is touched at least this often, even between progress
+# reports, so it's known to be alive
+JOB_HEARTBEAT_INTERVAL = 30
+
+# Running jobs not heard from for JOB_STALE_AFTER seconds are taken to have
+# died with their worker, and queued jobs not started within
+# JOB_QUEUE_TIMEOUT to have been lost; both are marked failed, so the
+# loading page stops waiting
+JOB_STALE_AFTER = 120
+JOB_QUEUE_TIMEOUT = 600
+STALE_JOB_ERROR = "The job stopped responding."
+
+# Jobs are deleted once their result is in the user's session; ones nobody
+# picked up (e.g. failed, or the user left) are deleted this long after they
+# last changed
+JOB_RETENTION = 60 * 60 * 24
+
+_executor = ThreadPoolExecutor(max_workers=LOADING_JOB_WORKERS, thread_name_prefix="loading-job")
+
+# Jobs running as tasks on this process's event loop (kept so they aren't
+# garbage collected mid-run)
+_tasks = set()
+
+
+def enqueue_loading_job(token_info: dict) -> LoadingJobs:
+    """
+    Queues a load of the user's top artists and returns the job.
+
+    With settings.LOADING_JOBS_IN_PROCESS the job starts right away on this
+    process's worker pool; otherwise it waits for `manage.py run_loading_jobs`.
+    """
+    clean_up_jobs()
+    job = LoadingJobs.objects.create(token_info=token_info)
+    if settings.LOADING_JOBS_IN_PROCESS:
+        transaction.on_commit(lambda: _executor.submit(_run_in_thread, job.pk))
+    return job
+
+
+async def aenqueue_loading_job(token_info: dict, on_event_loop: bool = False) -> LoadingJobs:
+    """
+    Async version of enqueue_loading_job.
+
+    With on_event_loop (for requests served over ASGI, whose event loop
+    outlives the request) in-process jobs run as tasks on the running event
+    loop with arun_loading_job, so waiting on upstream APIs doesn't tie up a
+    thread per load.
+    """
+    if not (settings.LOADING_JOBS_IN_PROCESS and on_event_loop):
+        return await sync_to_async(enqueue_loading_job)(token_info)
+
+    await sync_to_async(clean_up_jobs)()
+    job = await LoadingJobs.objects.acreate(token_info=token_info)
+    task = asyncio.create_task(_arun_in_task(job.pk))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+def claim_job(job_id: int) -> bool:
+    """
+    Marks a queued job as running. Returns False if another worker got it first.
+    """
+    return LoadingJobs.objects.filter(pk=job_id, status=LoadingJobs.QUEUED).update(
+        status=LoadingJobs.RUNNING, updated_at=timezone.now()
+    ) == 1
+
+
+def claim_next_job() -> LoadingJobs | None:
+    """
+    Claims the oldest queued job, if any.
+    """
+    for job_id in LoadingJobs.objects.filter(status=LoadingJobs.QUEUED).order_by("created_at").values_list("pk", flat=True)[:10]:
+        if claim_job(job_id):
+            return LoadingJobs.objects.get(pk=job_id)
+    return None
+
+
+def update_job(job_id: int, **fields):
+    """
+    Updates a job's row. Queryset updates skip auto_now, so updated_at is set
+    here, which is how loading_events tells the job has changed.
+    """
+    LoadingJobs.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+
+
+async def aupdate_job(job_id: int, **fields):
+    await LoadingJobs.objects.filter(pk=job_id).aupdate(updated_at=timezone.now(), **fields)
+
+
+def is_stale(status: str, updated_at) -> bool:
+    """
+    Whether a job with this status, last changed at updated_at, looks
+    abandoned (see JOB_STALE_AFTER and JOB_QUEUE_TIMEOUT).
+    """
+    timeout = {LoadingJobs.RUNNING: JOB_STALE_AFTER, LoadingJobs.QUEUED: JOB_QUEUE_TIMEOUT}.get(status)
+    return timeout is not None and timezone.now() - updated_at > timedelta(seconds=timeout)
+
+
+def expire_stale_jobs(job_id: int = None) -> int:
+    """
+    Marks abandoned jobs (only job_id, if given) as failed, returning how
+    many there were.
+    """
+    now = timezone.now()
+    jobs = LoadingJobs.objects.filter(
+        Q(status=LoadingJobs.RUNNING, updated_at__lt=now - timedelta(seconds=JOB_STALE_AFTER))
+        | Q(status=LoadingJobs.QUEUED, updated_at__lt=now - timedelta(seconds=JOB_QUEUE_TIMEOUT))
+    )
+    if job_id is not None:
+        jobs = jobs.filter(pk=job_id)
+    return jobs.update(status=LoadingJobs.FAILED, error=STALE_JOB_ERROR, token_info=None, updated_at=now)
+
+
+def clean_up_jobs():
+    """
+    Fails abandoned jobs and deletes ones older than JOB_RETENTION.
+    """
+    expire_stale_jobs()
+    LoadingJobs.objects.filter(updated_at__lt=timezone.now() - timedelta(seconds=JOB_RETENTION)).delete()
+
+
+@contextlib.contextmanager
+def _heartbeat(job_id: int):
+    # Touches the job every JOB_HEARTBEAT_INTERVAL from a separate thread,
+    # until the block exits
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+                update_job(job_id)
+        finally:
+            connection.close()
+
+    threading.Thread(target=beat, name=f"loading-job-{job_id}-heartbeat", daemon=True).start()
+    try:
+        yield
+    finally:
+        stop.set()
+
+
+async def _aheartbeat(job_id: int):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+        await aupdate_job(job_id)
+
+
+def _run_in_thread(job_id: int):
+    try:
+        if claim_job(job_id):
+            run_loading_job(LoadingJobs.objects.get(pk=job_id))
+    finally:
+        connection.close()
+
+
+async def _arun_in_task(job_id: int):
+    if await sync_to_async(claim_job)(job_id):
+        await arun_loading_job(await LoadingJobs.objects.aget(pk=job_id))
+
+
+def run_loading_job(job: LoadingJobs):
+    """
+    Fetches the user's top artists from Spotify and enriches them, recording
+    progress on the job as it goes. The job must already be claimed.
+    """
+    def progress(stage, count=1):
+        field = PROGRESS_FIELDS[stage]
+        update_job(job.pk, **{field: F(field) + count})
+
+    try:
+        with _heartbeat(job.pk):
+            sp = get_spotify_client(job.token_info)
+
+            # Fetch artist data
+            user_id, artists, rankings = fetch_all_top_artists(sp)
+            st_artists, mt_artists, lt_artists = rankings["st_artists"], rankings["mt_artists"], rankings["lt_artists"]
+            update_job(job.pk, artists_fetched=len(artists))
+
+            # Returning users whose top artists haven't changed skip enrichment
+            fingerprint = top_artists_fingerprint(st_artists, mt_artists, lt_artists)
+            all_artists, known_artists = get_cached_result(user_id, fingerprint)
+            if all_artists is None:
+                all_artists = fetch_artists_info(
+                    st_artists, mt_artists, lt_artists, progress=progress, known_artists=known_artists
+                )
+                cache_result(user_id, fingerprint, all_artists)
+
+        # The session only keeps ranked IDs; views look the artists up in the
+        # card store, which is built from the database (see artist_cards)
+        update_job(
+            job.pk, status=LoadingJobs.DONE, result=ranked_ids(all_artists), token_info=None
+        )
+    except Exception:
+        close_old_connections()
+        traceback.print_exc()
+        update_job(
+            job.pk, status=LoadingJobs.FAILED, error=traceback.format_exc(), token_info=None
+        )
+
+
+async def arun_loading_job(job: LoadingJobs):
+    """
+    Async version of run_loading_job, so one event loop can run many loads
+    at once. The Spotify client (spotipy) blocks, so its calls run on
+    threads; MusicBrainz is queried with the async HTTP client.
+    """
+    async def progress(stage, count=1):
+        field = PROGRESS_FIELDS[stage]
+        await aupdate_job(job.pk, **{field: F(field) + count})
+
+    heartbeat = asyncio.create_task(_aheartbeat(job.pk))
+    try:
+        sp = get_spotify_client(job.token_info)
+
+        # Fetch artist data
+        user_id, artists, rankings = await sync_to_async(fetch_all_top_artists, thread_sensitive=False)(sp)
+        st_artists, mt_artists, lt_artists = rankings["st_artists"], rankings["mt_artists"], rankings["lt_artists"]
+        await aupdate_job(job.pk, artists_fetched=len(artists))
+
+        # Returning users whose top artists haven't changed skip enrichment
+        fingerprint = top_artists_fingerprint(st_artists, mt_artists, lt_artists)
+        all_artists, known_artists = await sync_to_async(get_cached_result)(user_id, fingerprint)
+        if all_artists is None:
+            all_artists = await afetch_artists_info(
+                st_artists, mt_artists, lt_artists, progress=progress, known_artists=known_artists
+            )
+            await sync_to_async(cache_result)(user_id, fingerprint, all_artists)
+
+        # The session only keeps ranked IDs (see run_loading_job)
+        await aupdate_job(
+            job.pk, status=LoadingJobs.DONE, result=ranked_ids(all_artists), token_info=None
+        )
+    except Exception:
+        await sync_to_async(close_old_connections)()
+        traceback.print_exc()
+        await aupdate_job(
+            job.pk, status=LoadingJobs.FAILED, error=traceback.format_exc(), token_info=None
+        )
+    finally:
+        heartbeat.cancel()
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from spotify_map.artist_cards import forget_cards
+from spotify_map.models import Artists, get_photo
+from spotify_map.zodiac import astrological_signs
+
+
+class Command(BaseCommand):
+    help = "Fills in the photo_url and zodiac_sign columns for every artist in the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows to update per query (default: 500)")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        artists = Artists.objects.only("spotify_id", "birth_date", "complete_artist_json").order_by("spotify_id")
+
+        batch = []
+        updated = 0
+        for artist in artists.iterator(chunk_size=batch_size):
+            batch.append(artist)
+            if len(batch) >= batch_size:
+                updated += self.update_batch(batch)
+                batch = []
+                self.stdout.write(f"✔ {updated} artists updated")
+
+        if batch:
+            updated += self.update_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"🎉 Done! {updated} artists updated."))
+
+    def update_batch(self, batch):
+        signs = astrological_signs([artist.birth_date for artist in batch])
+        now = timezone.now()
+        for artist, sign in zip(batch, signs):
+            artist.photo_url = get_photo(artist.complete_artist_json)
+            artist.zodiac_sign = sign
+            artist.updated_at = now  # bulk_update skips auto_now
+        Artists.objects.bulk_update(batch, ["photo_url", "zodiac_sign", "updated_at"])
+        forget_cards([artist.spotify_id for artist in batch])
+        return len(batch)
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from spotify_map.geohash import encode_or_none
+from spotify_map.models import Artists, Coordinates
+
+# Model -> its latitude and longitude fields
+GEOHASHED_MODELS = {
+    Artists: ("birth_latitude", "birth_longitude"),
+    Coordinates: ("latitude", "longitude"),
+}
+
+
+class Command(BaseCommand):
+    help = "Fills in the geohash column for artists and coordinates that have coordinates but no geohash."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows to update per query (default: 500)")
+        parser.add_argument("--all", action="store_true", help="Recompute every geohash, not just missing ones")
+
+    def handle(self, *args, **options):
+        for model, (latitude_field, longitude_field) in GEOHASHED_MODELS.items():
+            rows = model.objects.filter(**{f"{latitude_field}__isnull": False, f"{longitude_field}__isnull": False})
+            if not options["all"]:
+                rows = rows.filter(geohash__isnull=True)
+
+            batch = []
+            updated = 0
+            for row in rows.only("pk", latitude_field, longitude_field).order_by("pk").iterator(chunk_size=options["batch_size"]):
+                batch.append(row)
+                if len(batch) >= options["batch_size"]:
+                    updated += self.update_batch(model, batch, latitude_field, longitude_field)
+                    batch = []
+                    self.stdout.write(f"✔ {updated} {model.__name__.lower()} updated")
+            if batch:
+                updated += self.update_batch(model, batch, latitude_field, longitude_field)
+
+            self.stdout.write(self.style.SUCCESS(f"🎉 Done! {updated} {model.__name__.lower()} updated."))
+
+    def update_batch(self, model, batch, latitude_field, longitude_field):
+        now = timezone.now()
+        for row in batch:
+            row.geohash = encode_or_none(getattr(row, latitude_field), getattr(row, longitude_field))
+            row.updated_at = now  # bulk_update skips auto_now
+        model.objects.bulk_update(batch, ["geohash", "updated_at"])
+        return len(batch)
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from spotify_map.backups import backup_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Backs up the Artists and Coordinates tables as gzipped JSON Lines, one thread per table. "
+        "Restore with `manage.py restore_database`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backup-dir",
+            default=str(settings.BACKUP_DIR),
+            help="Directory to write the backup to (default: settings.BACKUP_DIR)",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only back up rows changed since the last backup (a full backup is made if there isn't one)",
+        )
+        parser.add_argument("--rows-per-file", type=int, default=100_000, help="Rows per compressed file (default: 100000)")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows read from the database per query (default: 2000)")
+
+    def handle(self, *args, **options):
+        backup = backup_database(
+            options["backup_dir"],
+            incremental=options["incremental"],
+            rows_per_file=options["rows_per_file"],
+            chunk_size=options["chunk_size"],
+        )
+
+        for table, info in backup["tables"].items():
+            self.stdout.write(f"✔ {table}: {info['rows']} rows in {len(info['files'])} file(s)")
+        since = f" (changes since {backup['since']})" if backup["since"] else ""
+        self.stdout.write(self.style.SUCCESS(f"🎉 Done! {backup['kind'].capitalize()} backup {backup['name']}{since}."))
@@ -0,0 +1,180 @@
+import csv
+import heapq
+import os
+import sys
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from spotify_map.gazetteer import INDEX_HEADER, normalize_place
+
+# GeoNames feature codes for countries/territories and first-level divisions
+COUNTRY_CODES = {"PCL", "PCLI", "PCLD", "PCLF", "PCLS", "PCLIX", "TERR"}
+ADMIN1_CODES = {"ADM1"}
+
+# When several places share a key, countries beat states beat cities, and
+# then the more populous place wins
+COUNTRY, ADMIN1, CITY = 2, 1, 0
+
+# Keys held in memory before they're sorted and spilled to a temporary run
+# file; the runs are then merged into the index, so memory stays bounded on
+# big dumps like allCountries.txt (about 12M places)
+CHUNK_KEYS = 1_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the offline gazetteer index used by get_coords from GeoNames dumps "
+        "(e.g. cities15000.txt or allCountries.txt, plus countryInfo.txt and admin1CodesASCII.txt)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("places", nargs="+", help="GeoNames place file(s)")
+        parser.add_argument("--country-info", required=True, help="Path to GeoNames countryInfo.txt")
+        parser.add_argument("--admin1", required=True, help="Path to GeoNames admin1CodesASCII.txt")
+        parser.add_argument(
+            "--output",
+            default=str(settings.GAZETTEER_INDEX_PATH),
+            help="Where to write the index (default: settings.GAZETTEER_INDEX_PATH)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_KEYS,
+            help=f"Keys sorted in memory at a time (default: {CHUNK_KEYS})",
+        )
+
+    def handle(self, *args, **options):
+        countries = self.read_countries(options["country_info"])
+        admin1 = self.read_admin1(options["admin1"])
+
+        output = options["output"]
+        output_dir = os.path.dirname(output) or "."
+        os.makedirs(output_dir, exist_ok=True)
+
+        # key -> (rank, lat, lon), for the current chunk
+        entries = {}
+        place_count = 0
+        csv.field_size_limit(sys.maxsize)
+
+        with tempfile.TemporaryDirectory(dir=output_dir) as run_dir:
+            runs = []
+            for path in options["places"]:
+                with open(path, encoding="utf-8", newline="") as file:
+                    for row in csv.reader(file, delimiter="\t", quoting=csv.QUOTE_NONE):
+                        feature_class, feature_code = row[6], row[7]
+                        if feature_class == "P":
+                            kind = CITY
+                        elif feature_class == "A" and feature_code in COUNTRY_CODES:
+                            kind = COUNTRY
+                        elif feature_class == "A" and feature_code in ADMIN1_CODES:
+                            kind = ADMIN1
+                        else:
+                            continue
+
+                        country = countries.get(row[8])
+                        state = admin1.get(f"{row[8]}.{row[10]}")
+                        rank = (kind, int(row[14] or 0))
+                        coords = (float(row[4]), float(row[5]))
+
+                        for name in {row[1], row[2]}:
+                            for key in self.place_keys(kind, name, state, country):
+                                if key not in entries or entries[key][0] < rank:
+                                    entries[key] = (rank, *coords)
+                        place_count += 1
+
+                        if len(entries) >= options["chunk_size"]:
+                            runs.append(self.write_run(entries, run_dir, len(runs)))
+                            entries = {}
+            if entries:
+                runs.append(self.write_run(entries, run_dir, len(runs)))
+            entries = {}
+
+            key_count = self.merge_runs(runs, output)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Indexed {place_count} places under {key_count} names in {output}"
+        ))
+
+    def write_run(self, entries, run_dir, number):
+        # "key<TAB>kind<TAB>population<TAB>lat<TAB>lon" lines, sorted by key.
+        # Keys never contain tabs, and a tab sorts before any other
+        # character, so sorting whole lines sorts them by key
+        path = os.path.join(run_dir, f"run-{number:05d}")
+        lines = sorted(
+            b"%s\t%d\t%d\t%.4f\t%.4f\n" % (key.encode("utf-8"), kind, population, lat, lon)
+            for key, ((kind, population), lat, lon) in entries.items()
+        )
+        with open(path, "wb") as file:
+            file.writelines(lines)
+        self.stdout.write(f"✔ Sorted {len(lines)} names into run {number + 1}")
+        return path
+
+    def merge_runs(self, runs, output):
+        # Merges the sorted runs into the index, keeping the best ranked
+        # place for keys found in several runs
+        files = [open(path, "rb") for path in runs]
+        count = 0
+        try:
+            with open(output, "wb") as index:
+                index.write(INDEX_HEADER)
+                best_key, best_rank, best_coords = None, None, None
+                for line in heapq.merge(*files):
+                    key, kind, population, coords = line.split(b"\t", 3)
+                    rank = (int(kind), int(population))
+                    if key != best_key:
+                        if best_key is not None:
+                            index.write(b"%s\t%s" % (best_key, best_coords))
+                            count += 1
+                        best_key, best_rank, best_coords = key, rank, coords
+                    elif rank > best_rank:
+                        best_rank, best_coords = rank, coords
+                if best_key is not None:
+                    index.write(b"%s\t%s" % (best_key, best_coords))
+                    count += 1
+        finally:
+            for file in files:
+                file.close()
+        return count
+
+    def place_keys(self, kind, name, state, country):
+        name = normalize_place(name)
+        state = normalize_place(state) if state else None
+        country = normalize_place(country) if country else None
+        if not name:
+            return []
+
+        if kind == COUNTRY:
+            return [name]
+        if kind == ADMIN1:
+            return [name] + ([f"{name}|{country}"] if country else [])
+
+        # Cities, in every "City, State, Country" combination we store
+        keys = [name]
+        if state:
+            keys.append(f"{name}|{state}")
+        if country:
+            keys.append(f"{name}|{country}")
+        if state and country:
+            keys.append(f"{name}|{state}|{country}")
+        return keys
+
+    def read_countries(self, path):
+        # ISO code -> country name
+        countries = {}
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("#") or not line.strip():
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                countries[fields[0]] = fields[4]
+        return countries
+
+    def read_admin1(self, path):
+        # "US.NY" -> "New York"
+        admin1 = {}
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) > 1:
+                    admin1[fields[0]] = fields[1]
+        return admin1
@@ -0,0 +1,116 @@
+import bz2
+import contextlib
+import gzip
+import io
+import json
+import lzma
+import os
+import sqlite3
+import tarfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from spotify_map.musicbrainz_index import INDEX_FORMAT, completeness, normalize_name
+
+# Where the artists are in MusicBrainz's artist.tar.xz JSON dump
+DUMP_MEMBER = "mbdump/artist"
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the offline MusicBrainz index checked before the MusicBrainz API, from a JSON dump "
+        "(artist.tar.xz from https://data.metabrainz.org/pub/musicbrainz/data/json-dumps/, or the "
+        "extracted mbdump/artist file, optionally gzip/bz2/xz-compressed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dump", help="Path to the MusicBrainz artist JSON dump")
+        parser.add_argument(
+            "--output",
+            default=str(settings.MUSICBRAINZ_INDEX_PATH),
+            help="Where to write the index (default: settings.MUSICBRAINZ_INDEX_PATH)",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000, help="Rows inserted per statement batch (default: 10000)")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        output = options["output"]
+        tmp_path = output + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+        # Built next to the old index and swapped in at the end, so lookups
+        # keep working meanwhile
+        connection = sqlite3.connect(tmp_path)
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+        connection.execute(
+            "CREATE TABLE artists (name_key TEXT NOT NULL, completeness INTEGER NOT NULL, "
+            "name TEXT NOT NULL, begin TEXT, begin_area TEXT, area TEXT)"
+        )
+
+        count = 0
+        batch = []
+        with self.open_dump(options["dump"]) as lines:
+            for line in lines:
+                row = self.parse_artist(line)
+                if row is None:
+                    continue
+                batch.append(row)
+                if len(batch) >= options["batch_size"]:
+                    count += self.insert(connection, batch)
+                    batch = []
+                    if count % 100_000 < options["batch_size"]:
+                        self.stdout.write(f"✔ {count} artists indexed")
+            count += self.insert(connection, batch)
+
+        self.stdout.write("🗂️ Creating the name index...")
+        connection.execute("CREATE INDEX artists_name_key ON artists (name_key, completeness DESC)")
+        connection.execute("INSERT INTO metadata VALUES ('format', ?)", (INDEX_FORMAT,))
+        connection.commit()
+        connection.execute("VACUUM")
+        connection.close()
+        os.replace(tmp_path, output)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Done! {count} artists indexed in {time.monotonic() - start:.0f}s, written to {output}."
+        ))
+
+    @contextlib.contextmanager
+    def open_dump(self, path):
+        if tarfile.is_tarfile(path):
+            # Members are read one at a time, stopping at the artist file, so
+            # the archive is only decompressed once (getmember() would read
+            # it all first, then extractfile() go back to the start)
+            with tarfile.open(path) as archive:
+                for member in archive:
+                    if member.name == DUMP_MEMBER:
+                        yield io.TextIOWrapper(archive.extractfile(member), encoding="utf-8")
+                        return
+            raise CommandError(f"{path} has no {DUMP_MEMBER} file - is it the artist dump?")
+
+        opener = OPENERS.get(os.path.splitext(path)[1], open)
+        with opener(path, "rt", encoding="utf-8") as file:
+            yield file
+
+    def parse_artist(self, line):
+        try:
+            artist = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        name = artist.get("name")
+        if not name:
+            return None
+
+        begin = (artist.get("life-span") or {}).get("begin")
+        begin_area = (artist.get("begin-area") or {}).get("name")
+        area = (artist.get("area") or {}).get("name")
+        return (normalize_name(name), completeness(artist), name, begin, begin_area, area)
+
+    def insert(self, connection, batch):
+        connection.executemany("INSERT INTO artists VALUES (?, ?, ?, ?, ?, ?)", batch)
+        return len(batch)
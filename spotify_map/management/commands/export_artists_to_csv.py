@@ -1,10 +1,31 @@
 import csv
-from django.core.management.base import BaseCommand
+import gzip
+import io
+import json
+import sys
+from itertools import chain, islice
+from django.core.management.base import BaseCommand, CommandError
 from spotify_map.models import Artists
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed for --format parquet
+    pa = pq = None
+
+DEFAULT_OUTPUT_PATH = '/home/evanfantozzi/spotify_map/spotify_map/spotify_map_artists_updater.csv'
+
+# The columns import_artists_from_csv reads back
+DEFAULT_COLUMNS = ['spotify_id', 'name', 'birth_date', 'birth_location']
+EXPORTABLE_COLUMNS = [
+    'spotify_id', 'name', 'birth_date', 'birth_location', 'birth_latitude', 'birth_longitude',
+    'zodiac_sign', 'photo_url', 'refreshed_at', 'complete_artist_json',
+]
+COLUMN_ALIASES = {'coordinates': ['birth_latitude', 'birth_longitude']}
+
 
 class Command(BaseCommand):
-    help = 'Export artist info to CSV file. Optionally filter by artist name.'
+    help = 'Export artist info to CSV (or Parquet). Optionally filter by artist name.'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -14,34 +35,122 @@ class Command(BaseCommand):
             default=None,
             help='Optional: The name of the artist to export'
         )
+        parser.add_argument(
+            '--output', '-o',
+            default=DEFAULT_OUTPUT_PATH,
+            help="Path to write to, or '-' for stdout (default: spotify_map_artists_updater.csv)"
+        )
+        parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='Output format (default: csv)')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument(
+            '--columns',
+            default=','.join(DEFAULT_COLUMNS),
+            help=f"Comma-separated columns to export, from {', '.join(EXPORTABLE_COLUMNS)} "
+                 f"('coordinates' for both birth coordinates). Default: {','.join(DEFAULT_COLUMNS)}"
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows read from the database at a time (default: 2000)')
 
     def handle(self, *args, **options):
         artist_name = options['artist_name']
-        output_file_path = '/home/evanfantozzi/spotify_map/spotify_map/spotify_map_artists_updater.csv'
+        output_file_path = options['output']
+        columns = self.parse_columns(options['columns'])
+        if options['format'] == 'parquet' and pq is None:
+            raise CommandError("Parquet export needs pyarrow (pip install pyarrow).")
+
+        # Progress goes to stderr when the export itself is going to stdout
+        self.log = self.stderr if output_file_path == '-' else self.stdout
 
         if artist_name:
             artists = Artists.objects.filter(name__icontains=artist_name)
         else:
             artists = Artists.objects.all()
 
-        if not artists.exists():
+        # Sort by birth_location (empty locations will appear first)
+        rows = artists.order_by('birth_location').values_list(*columns).iterator(chunk_size=options['chunk_size'])
+
+        # Peek at the first row rather than running a separate exists() query
+        first = next(rows, None)
+        if first is None:
             message = f"No artists found matching '{artist_name}'" if artist_name else "No artists found in database"
-            self.stdout.write(self.style.ERROR(message))
+            self.log.write(self.style.ERROR(message))
             return
+        rows = chain([first], rows)
 
-        # Sort by birth_location (empty locations will appear first)
-        artists = artists.order_by('birth_location')
+        if 'complete_artist_json' in columns:
+            json_index = columns.index('complete_artist_json')
+            rows = (
+                row[:json_index] + (json.dumps(row[json_index]) if row[json_index] is not None else None,) + row[json_index + 1:]
+                for row in rows
+            )
+
+        if options['format'] == 'parquet':
+            exported = self.write_parquet(rows, columns, output_file_path, options['gzip'], options['chunk_size'])
+        else:
+            exported = self.write_csv(rows, columns, output_file_path, options['gzip'])
+
+        destination = 'stdout' if output_file_path == '-' else output_file_path
+        self.log.write(self.style.SUCCESS(f"Exported {exported} artist(s) to {destination}, sorted by birth_location"))
+
+    def parse_columns(self, columns_option):
+        columns = []
+        for column in columns_option.split(','):
+            column = column.strip()
+            for name in COLUMN_ALIASES.get(column, [column]):
+                if name not in EXPORTABLE_COLUMNS:
+                    raise CommandError(f"Unknown column '{name}'. Choose from: {', '.join(EXPORTABLE_COLUMNS)}")
+                if name not in columns:
+                    columns.append(name)
+        return columns
+
+    def open_output(self, output_file_path, compress):
+        if output_file_path == '-':
+            raw = sys.stdout.buffer
+            return gzip.GzipFile(fileobj=raw, mode='wb') if compress else raw
+        return gzip.open(output_file_path, 'wb') if compress else open(output_file_path, 'wb')
 
-        with open(output_file_path, mode='w', newline='', encoding='utf-8') as file:
+    def write_csv(self, rows, columns, output_file_path, compress):
+        exported = 0
+        output = self.open_output(output_file_path, compress)
+        file = io.TextIOWrapper(output, encoding='utf-8', newline='')
+        try:
             writer = csv.writer(file)
-            writer.writerow(['spotify_id', 'name', 'birth_date', 'birth_location'])
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                exported += 1
+        finally:
+            # Detach so closing the wrapper never closes stdout
+            file.flush()
+            file.detach()
+            if output is sys.stdout.buffer:
+                output.flush()
+            else:
+                output.close()
+        return exported
 
-            for artist in artists:
-                writer.writerow([
-                    artist.spotify_id,
-                    artist.name,
-                    artist.birth_date or '',
-                    artist.birth_location or ''
-                ])
+    def write_parquet(self, rows, columns, output_file_path, compress, chunk_size):
+        schema = pa.schema([(column, self.arrow_type(column)) for column in columns])
+        exported = 0
+        sink = sys.stdout.buffer if output_file_path == '-' else output_file_path
+        # Parquet compresses each column itself, so --gzip picks the codec
+        with pq.ParquetWriter(sink, schema, compression='gzip' if compress else 'snappy') as writer:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=schema.field(column).type) for column, values in zip(columns, zip(*chunk))],
+                    schema=schema,
+                ))
+                exported += len(chunk)
+        return exported
 
-        self.stdout.write(self.style.SUCCESS(f"Exported {artists.count()} artist(s) to {output_file_path}, sorted by birth_location"))
+    def arrow_type(self, column):
+        internal_type = Artists._meta.get_field(column).get_internal_type()
+        if internal_type == 'FloatField':
+            return pa.float64()
+        if internal_type == 'DateField':
+            return pa.date32()
+        if internal_type == 'DateTimeField':
+            return pa.timestamp('us', tz='UTC')
+        return pa.string()
@@ -1,17 +1,24 @@
-from django.core.management.base import BaseCommand
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
 import pandas as pd
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-import httpx
-import time
 from datetime import datetime
 
+from spotify_map.artist_cards import forget_cards
+from spotify_map.bulk import bulk_upsert
 from spotify_map.models import Artists
 from spotify_map.coordinates import get_coords
+from spotify_map.http_client import get, UpstreamUnavailable
+from spotify_map.musicbrainz import match_search_results, musicbrainz_search_url
+from spotify_map.musicbrainz_index import get_musicbrainz_index
+from spotify_map.spotify_utils import SPOTIFY_BATCH_SIZE, get_app_spotify_client
 from django.conf import settings
 
-SPOTIFY_ARTIST_URL = "https://api.spotify.com/v1/artists/"
-MUSICBRAINZ_URL = "https://musicbrainz.org/ws/2/artist/?query=artist:"
+ARTIST_FIELDS = [
+    "name", "birth_latitude", "birth_longitude", "geohash", "birth_date", "birth_location",
+    "complete_artist_json", "photo_url", "zodiac_sign", "refreshed_at",
+]
 
 
 class Command(BaseCommand):
@@ -19,6 +26,18 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("csv_path", type=str, help="Path to the CSV file")
+        parser.add_argument(
+            "--workers", type=int, default=4,
+            help="Artists enriched at once; MusicBrainz requests still share the rate limit (default: 4)",
+        )
+        parser.add_argument(
+            "--flush-size", type=int, default=200,
+            help="Artists written to the database per transaction (default: 200)",
+        )
+        parser.add_argument(
+            "--index-only", action="store_true",
+            help="Only look artists up in the offline MusicBrainz index, never the (rate-limited) API",
+        )
 
     def handle(self, *args, **options):
         csv_path = options["csv_path"]
@@ -30,42 +49,101 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR("❌ Spotify credentials missing."))
             return
 
-        sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-            client_id=client_id,
-            client_secret=client_secret
-        ))
+        sp = get_app_spotify_client()
+
+        self.musicbrainz_index = get_musicbrainz_index()
+        self.index_only = options["index_only"]
+        if self.index_only and not self.musicbrainz_index:
+            raise CommandError("--index-only needs an offline MusicBrainz index (see build_musicbrainz_index).")
 
         df = pd.read_csv(csv_path)
         df = df[df["followers"] > 1]
         df = df.sort_values(by="popularity", ascending=False)
 
         existing_ids = set(Artists.objects.values_list("spotify_id", flat=True))
-        new_count = 0
-        skipped_count = 0
-
-        for _, row in df.iterrows():
-            spotify_id = str(row["id"])
-            if spotify_id in existing_ids:
-                name = row.get("name", "[Unknown Name]")
-                print(self.style.WARNING(f"⏭️ Skipping {name} (already in database)"))
-                skipped_count += 1
-                continue
+        new_ids = list(dict.fromkeys(
+            spotify_id for spotify_id in df["id"].astype(str) if spotify_id not in existing_ids
+        ))
+        skipped_count = len(df) - len(new_ids)
+        print(self.style.WARNING(f"⏭️ Skipping {skipped_count} artists already in the database"))
 
-            artist_data = self.fetch_data(spotify_id, sp)
-            if artist_data:
-                print(self.style.SUCCESS(f"✅ Fetched from Spotify: {artist_data['name']}"))
-                self.store_artist(artist_data)
-                new_count += 1
+        workers = options["workers"]
+        self.flush_size = options["flush_size"]
+        self.pending_artists = []
+        self.names = {}  # Future -> artist name, for errors
+        self.new_count = 0
+        self.failed_count = 0
 
-        self.stdout.write(self.style.SUCCESS(f"🎉 Done! {new_count} new artists added. {skipped_count} were already in the database."))
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                running = set()
+                for i in range(0, len(new_ids), SPOTIFY_BATCH_SIZE):
+                    for spotify_info in self.fetch_spotify_batch(new_ids[i:i + SPOTIFY_BATCH_SIZE], sp):
+                        # Don't let Spotify fetches run too far ahead of enrichment
+                        while len(running) >= workers * 2:
+                            done, running = wait(running, return_when=FIRST_COMPLETED)
+                            self.collect(done)
+                        future = executor.submit(self.enrich_in_thread, spotify_info)
+                        self.names[future] = spotify_info["name"]
+                        running.add(future)
+
+                done, _ = wait(running)
+                self.collect(done)
+        finally:
+            # Artists enriched before anything went wrong are still written
+            self.flush()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Done! {self.new_count} new artists added, {self.failed_count} failed. "
+            f"{skipped_count} were already in the database."
+        ))
 
-    def fetch_data(self, spotify_id, sp):
+    def fetch_spotify_batch(self, spotify_ids, sp):
         try:
-            spotify_info = sp.artist(spotify_id)
+            results = sp.artists(spotify_ids)["artists"]
         except Exception as e:
-            print(self.style.ERROR(f"❌ Spotify fetch failed for {spotify_id}: {e}"))
-            return None
+            print(self.style.ERROR(f"❌ Spotify fetch failed for {len(spotify_ids)} artists starting at {spotify_ids[0]}: {e}"))
+            return []
 
+        # Unknown IDs come back as None
+        for spotify_id, spotify_info in zip(spotify_ids, results):
+            if not spotify_info:
+                print(self.style.ERROR(f"❌ Spotify fetch failed for {spotify_id}: not found"))
+        return [spotify_info for spotify_info in results if spotify_info]
+
+    def enrich_in_thread(self, spotify_info):
+        try:
+            return self.fetch_data(spotify_info)
+        finally:
+            # Each worker thread opens its own DB connection (for get_coords)
+            connection.close()
+
+    def collect(self, futures):
+        for future in futures:
+            name = self.names.pop(future)
+            try:
+                artist_data = future.result()
+            except Exception as e:
+                # One artist failing (e.g. a database error geocoding them)
+                # shouldn't stop the rest
+                print(self.style.ERROR(f"❌ Enrichment failed for {name}: {e}"))
+                self.failed_count += 1
+                continue
+            if artist_data:
+                print(self.style.SUCCESS(f"✅ Fetched from Spotify: {artist_data['name']}"))
+                self.pending_artists.append(artist_data)
+        if len(self.pending_artists) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_artists:
+            return
+        self.store_artists(self.pending_artists)
+        self.new_count += len(self.pending_artists)
+        self.pending_artists = []
+
+    def fetch_data(self, spotify_info):
+        spotify_id = spotify_info["id"]
         name = spotify_info["name"]
         artist_data = {
             "spotify_id": spotify_id,
@@ -73,38 +151,41 @@ class Command(BaseCommand):
             "spotify_info": spotify_info,
         }
 
-        # MusicBrainz search
-        time.sleep(1.5)
-        url = MUSICBRAINZ_URL + f"{name}&fmt=json"
-        with httpx.Client() as client:
-            r2 = client.get(url)
-        if r2.status_code != 200:
-            print(self.style.ERROR(f"❌ MusicBrainz fetch failed for {name}"))
-            return artist_data
+        # MusicBrainz lookup, in the offline index first
+        mb_artist = self.musicbrainz_index.lookup(name) if self.musicbrainz_index else None
+        if mb_artist is None and not self.index_only:
+            url = musicbrainz_search_url(name)
+            try:
+                r2 = get(url)
+            except UpstreamUnavailable as e:
+                # Skip for now rather than storing the artist without its data
+                print(self.style.ERROR(f"❌ MusicBrainz unavailable for {name}: {e}"))
+                return None
+            if r2.status_code != 200:
+                print(self.style.ERROR(f"❌ MusicBrainz fetch failed for {name}"))
+                return artist_data
+
+            mb_artist = match_search_results(name, r2)
 
-        data = r2.json()
         found_mb_data = []
-
-        for mb_artist in data.get("artists", []):
-            if name.lower() == mb_artist["name"].lower():
-                birth_date = mb_artist.get("life-span", {}).get("begin")
-                if birth_date and self.is_valid_date(birth_date):
-                    artist_data["birth_date"] = birth_date
-                    found_mb_data.append(f"🎂 Birthday: {birth_date}")
-
-                birth_city = mb_artist.get("begin-area", {}).get("name", "")
-                birth_country = mb_artist.get("area", {}).get("name", "")
-                if birth_city or birth_country:
-                    location = ", ".join(filter(None, [birth_city, birth_country]))
-                    artist_data["birth_location"] = location
-                    coords = get_coords(location)
-                    if coords:
-                        artist_data["birth_latitude"] = coords[0]
-                        artist_data["birth_longitude"] = coords[1]
-                        found_mb_data.append(f"📍 Location: {location} (coords: {coords})")
-                    else:
-                        found_mb_data.append(f"📍 Location: {location} (coords not found)")
-                break
+        if mb_artist:
+            birth_date = mb_artist.get("life-span", {}).get("begin")
+            if birth_date and self.is_valid_date(birth_date):
+                artist_data["birth_date"] = birth_date
+                found_mb_data.append(f"🎂 Birthday: {birth_date}")
+
+            birth_city = mb_artist.get("begin-area", {}).get("name", "")
+            birth_country = mb_artist.get("area", {}).get("name", "")
+            if birth_city or birth_country:
+                location = ", ".join(filter(None, [birth_city, birth_country]))
+                artist_data["birth_location"] = location
+                coords = get_coords(location)
+                if coords:
+                    artist_data["birth_latitude"] = coords[0]
+                    artist_data["birth_longitude"] = coords[1]
+                    found_mb_data.append(f"📍 Location: {location} (coords: {coords})")
+                else:
+                    found_mb_data.append(f"📍 Location: {location} (coords not found)")
 
         if found_mb_data:
             print(self.style.SUCCESS(f"🔎 MusicBrainz for {name}: {' | '.join(found_mb_data)}"))
@@ -113,18 +194,28 @@ class Command(BaseCommand):
 
         return artist_data
 
-    def store_artist(self, artist_data):
-        Artists.objects.update_or_create(
-            spotify_id=artist_data["spotify_id"],
-            defaults={
-                "name": artist_data["name"],
-                "birth_latitude": artist_data.get("birth_latitude"),
-                "birth_longitude": artist_data.get("birth_longitude"),
-                "birth_date": artist_data.get("birth_date"),
-                "birth_location": artist_data.get("birth_location"),
-                "complete_artist_json": artist_data.get("spotify_info"),
-            },
-        )
+    def store_artists(self, artists_data):
+        artists = []
+        for artist_data in artists_data:
+            artist = Artists(
+                spotify_id=artist_data["spotify_id"],
+                name=artist_data["name"],
+                birth_latitude=artist_data.get("birth_latitude"),
+                birth_longitude=artist_data.get("birth_longitude"),
+                birth_date=artist_data.get("birth_date"),
+                birth_location=artist_data.get("birth_location"),
+                complete_artist_json=artist_data.get("spotify_info"),
+                refreshed_at=timezone.now(),
+            )
+            # Bulk writes skip save(), which normally does this
+            artist.update_display_fields()
+            artist.update_geohash()
+            artists.append(artist)
+
+        with transaction.atomic():
+            bulk_upsert(Artists, artists, unique_fields=["spotify_id"], update_fields=ARTIST_FIELDS)
+        # Cards for users' top artists not found before only have a name
+        forget_cards([artist.spotify_id for artist in artists])
 
     def is_valid_date(self, date_str):
         try:
@@ -1,15 +1,49 @@
 import csv
 import json
+import time
 from django.core.management.base import BaseCommand
-from spotify_map.models import Artists  # Adjust if needed
+from django.db import DataError, IntegrityError, transaction
+from spotify_map.artist_cards import forget_cards
+from spotify_map.bulk import bulk_upsert
+from spotify_map.models import Artists, Coordinates, get_photo  # Adjust if needed
 from spotify_map.coordinates import get_coords
+from spotify_map.zodiac import astrological_signs, parse_date
+
+DEFAULT_CSV_PATH = '/home/evanfantozzi/spotify_map/spotify_map/spotify_map_artists_updater.csv'
+
+# Columns a --bulk import overwrites on existing artists; JSON_FIELDS only
+# from rows with complete_artist_json
+UPDATE_FIELDS = ['name', 'birth_latitude', 'birth_longitude', 'geohash', 'birth_date', 'birth_location', 'zodiac_sign']
+JSON_FIELDS = ['complete_artist_json', 'photo_url']
 
 
 class Command(BaseCommand):
     help = 'Import artist data from CSV to the database'
 
-    def handle(self, *args, **kwargs):
-        csv_file_path = '/home/evanfantozzi/spotify_map/spotify_map/spotify_map_artists_updater.csv'
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'csv_path',
+            nargs='?',
+            default=DEFAULT_CSV_PATH,
+            help='Optional: Path to the CSV file (default: spotify_map_artists_updater.csv)'
+        )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Stream the file and write it in batches (much faster for large files)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows written per transaction in --bulk mode (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        if options['bulk']:
+            return self.handle_bulk(options['csv_path'], options['batch_size'])
+
+        csv_file_path = options['csv_path']
 
         with open(csv_file_path, mode='r', encoding='utf-8') as file:
             reader = csv.DictReader(file)
@@ -46,6 +80,7 @@ class Command(BaseCommand):
                         spotify_id=row['spotify_id'],
                         defaults=defaults
                     )
+                    forget_cards([row['spotify_id']])
 
                     action = "Created" if created else "Updated"
                     self.stdout.write(self.style.SUCCESS(f"{action} artist: {row['name']}"))
@@ -54,3 +89,113 @@ class Command(BaseCommand):
                     self.stdout.write(self.style.ERROR(
                         f"Error processing artist {row.get('name', 'UNKNOWN')}: {str(e)}"
                     ))
+
+    def handle_bulk(self, csv_file_path, batch_size):
+        start = time.monotonic()
+        self.coords = {}  # location -> coordinates (or None), for the whole file
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'errors': 0, 'locations': 0, 'unresolved': 0}
+
+        with open(csv_file_path, mode='r', encoding='utf-8', newline='') as file:
+            reader = csv.DictReader(file)
+
+            batch = []
+            for row in reader:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self.write_batch(batch)
+                    batch = []
+            if batch:
+                self.write_batch(batch)
+
+        elapsed = time.monotonic() - start
+        stats = self.stats
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Done! {stats['rows']} rows in {elapsed:.1f}s ({stats['rows'] / max(elapsed, 1e-9):.0f} rows/s): "
+            f"{stats['created']} created, {stats['updated']} updated, {stats['errors']} errors. "
+            f"{stats['locations']} distinct locations geocoded, {stats['unresolved']} not found."
+        ))
+
+    def write_batch(self, rows):
+        self.stats['rows'] += len(rows)
+        self.geocode_locations({row.get('birth_location') for row in rows} - set(self.coords) - {'', None})
+
+        artists = {}
+        for row in rows:
+            try:
+                birth_date = parse_date(row['birth_date']) if row['birth_date'] else None
+                if row['birth_date'] and not birth_date:
+                    raise ValueError(f"invalid birth date {row['birth_date']!r}")
+
+                complete_json_raw = row.get('complete_artist_json')
+                birth_location = row.get('birth_location', '')
+                coords = self.coords.get(birth_location)
+
+                # Later rows for the same artist win, as with update_or_create
+                artists[row['spotify_id']] = Artists(
+                    spotify_id=row['spotify_id'],
+                    name=row['name'],
+                    birth_latitude=float(coords[0]) if coords else None,
+                    birth_longitude=float(coords[1]) if coords else None,
+                    birth_date=birth_date,
+                    birth_location=birth_location,
+                    complete_artist_json=json.loads(complete_json_raw) if complete_json_raw else None,
+                )
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.stdout.write(self.style.ERROR(
+                    f"Error processing artist {row.get('name', 'UNKNOWN')}: {str(e)}"
+                ))
+
+        # Display columns are normally kept in sync by save(), which bulk writes skip
+        objs = list(artists.values())
+        for artist, sign in zip(objs, astrological_signs([artist.birth_date for artist in objs])):
+            artist.zodiac_sign = sign
+            artist.update_geohash()
+            if artist.complete_artist_json:
+                artist.photo_url = get_photo(artist.complete_artist_json)
+
+        try:
+            self.upsert(objs)
+        except (IntegrityError, DataError) as e:
+            # One bad row fails the whole batch; write it row by row instead,
+            # so only the bad rows are lost
+            self.stdout.write(self.style.WARNING(f"⚠ Batch failed ({e}), writing it row by row"))
+            for artist in objs:
+                try:
+                    self.upsert([artist])
+                except (IntegrityError, DataError) as e:
+                    self.stats['errors'] += 1
+                    self.stdout.write(self.style.ERROR(f"Error processing artist {artist.name}: {str(e)}"))
+        forget_cards(artists)
+        self.stdout.write(f"✔ {self.stats['rows']} rows processed")
+
+    def upsert(self, objs):
+        # As in row mode, the stored Spotify JSON is only overwritten by rows
+        # that have it
+        with_json = [artist for artist in objs if artist.complete_artist_json]
+        without_json = [artist for artist in objs if not artist.complete_artist_json]
+
+        with transaction.atomic():
+            existing = Artists.objects.filter(spotify_id__in=[artist.spotify_id for artist in objs]).count()
+            if with_json:
+                bulk_upsert(Artists, with_json, unique_fields=['spotify_id'], update_fields=UPDATE_FIELDS + JSON_FIELDS)
+            if without_json:
+                bulk_upsert(Artists, without_json, unique_fields=['spotify_id'], update_fields=UPDATE_FIELDS)
+
+        self.stats['created'] += len(objs) - existing
+        self.stats['updated'] += existing
+
+    def geocode_locations(self, locations):
+        if not locations:
+            return
+
+        # Locations already in the coordinates database, in one query
+        for location, lat, lon in Coordinates.objects.filter(location__in=locations).values_list('location', 'latitude', 'longitude'):
+            self.coords[location] = (lat, lon)
+
+        for location in locations - set(self.coords):
+            self.coords[location] = get_coords(location)
+            if self.coords[location] is None:
+                self.stats['unresolved'] += 1
+
+        self.stats['locations'] += len(locations)
@@ -1,15 +1,27 @@
+from datetime import timedelta
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from spotify_map.models import Artists
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-import time
+from django.db.models import Q
+from django.utils import timezone
+from spotify_map.artist_cards import forget_cards
+from spotify_map.models import Artists, get_photo
+from spotify_map.spotify_utils import SPOTIFY_BATCH_SIZE, get_app_spotify_client
 
 
 class Command(BaseCommand):
-    help = "Refresh Spotify raw JSON for all artists in the database."
+    help = "Refresh Spotify raw JSON for artists that haven't been refreshed recently."
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age",
+            type=float,
+            default=7,
+            help="Refresh artists last refreshed more than this many days ago (default: 7)"
+        )
+        parser.add_argument("--all", action="store_true", help="Refresh every artist, however recently refreshed")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows read from the database at a time (default: 2000)")
+
+    def handle(self, *args, **options):
         client_id = settings.SPOTIPY_CLIENT_ID
         client_secret = settings.SPOTIPY_CLIENT_SECRET
 
@@ -17,25 +29,45 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR("❌ Spotify credentials not found in environment variables."))
             return
 
-        sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-            client_id=client_id,
-            client_secret=client_secret
-        ))
+        sp = get_app_spotify_client()
 
-        updated = 0
-        for artist in Artists.objects.all()[1:]:
-            time.sleep(.5)
-            if not artist.spotify_id:
-                self.stdout.write(self.style.WARNING(f"⚠ No Spotify ID for {artist.name}, skipping."))
-                continue
+        artists = Artists.objects.exclude(spotify_id="")
+        if not options["all"]:
+            stale_before = timezone.now() - timedelta(days=options["max_age"])
+            artists = artists.filter(Q(refreshed_at__isnull=True) | Q(refreshed_at__lt=stale_before))
+
+        self.updated = 0
+        batch = []
+        for artist in artists.only("spotify_id", "name").order_by("spotify_id").iterator(chunk_size=options["chunk_size"]):
+            batch.append(artist)
+            if len(batch) == SPOTIFY_BATCH_SIZE:
+                self.refresh_batch(sp, batch)
+                batch = []
+        if batch:
+            self.refresh_batch(sp, batch)
+
+        self.stdout.write(self.style.SUCCESS(f"🎉 Done! {self.updated} artists updated."))
 
-            try:
-                data = sp.artist(artist.spotify_id)
-                artist.complete_artist_json = data
-                artist.save(update_fields=['complete_artist_json'])
-                self.stdout.write(self.style.SUCCESS(f"✔ Updated: {artist.name}"))
-                updated += 1
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"❌ Error for {artist.name}: {e}"))
+    def refresh_batch(self, sp, batch):
+        try:
+            results = sp.artists([artist.spotify_id for artist in batch])["artists"]
+        except Exception as e:
+            self.stderr.write(self.style.ERROR(f"❌ Error for {batch[0].name} … {batch[-1].name}: {e}"))
+            return
+
+        # Results come back in request order, with None for unknown IDs
+        now = timezone.now()
+        refreshed = []
+        for artist, data in zip(batch, results):
+            if data is None:
+                self.stdout.write(self.style.WARNING(f"⚠ Not found on Spotify: {artist.name}, skipping."))
+                continue
+            artist.complete_artist_json = data
+            artist.photo_url = get_photo(data)
+            artist.refreshed_at = artist.updated_at = now
+            refreshed.append(artist)
 
-        self.stdout.write(self.style.SUCCESS(f"🎉 Done! {updated} artists updated."))
+        Artists.objects.bulk_update(refreshed, ["complete_artist_json", "photo_url", "refreshed_at", "updated_at"])
+        forget_cards([artist.spotify_id for artist in refreshed])  # Their photos may have changed
+        self.updated += len(refreshed)
+        self.stdout.write(self.style.SUCCESS(f"✔ {self.updated} artists updated"))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from spotify_map.backups import restore_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Restores Artists and Coordinates from `manage.py backup_database` backups: the latest full "
+        "backup, then every incremental backup after it. Existing rows are updated in place."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backup-dir",
+            default=str(settings.BACKUP_DIR),
+            help="Directory holding the backups (default: settings.BACKUP_DIR)",
+        )
+        parser.add_argument("--until", help="Name of the last backup to restore (default: the most recent)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows written per query (default: 1000)")
+
+    def handle(self, *args, **options):
+        try:
+            restored = restore_database(options["backup_dir"], until=options["until"], batch_size=options["batch_size"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for backup in restored:
+            counts = ", ".join(f"{rows} {table}" for table, rows in backup["restored"].items())
+            self.stdout.write(f"✔ {backup['name']}: {counts}")
+        self.stdout.write(self.style.SUCCESS(f"🎉 Done! {len(restored)} backup(s) restored."))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from spotify_map.artist_cards import forget_cards
+from spotify_map.models import UnmatchedArtists
+from spotify_map.musicbrainz import enrich_new_artists, store_artist_in_db, unmatched_retry_after
+
+
+class Command(BaseCommand):
+    help = (
+        "Searches MusicBrainz again for artists it couldn't match before, once their retry time has "
+        "passed. Run it periodically (e.g. daily from cron); each miss doubles the wait before the next try."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=500, help="Most artists retried per run (default: 500)")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        due = list(
+            UnmatchedArtists.objects.filter(retry_after__lte=now).order_by("retry_after")[:options["limit"]]
+        )
+        if not due:
+            self.stdout.write("⏭️ No unmatched artists due for a retry.")
+            return
+
+        self.stdout.write(f"🔍 Retrying {len(due)} unmatched artists...")
+        results = enrich_new_artists([{"spotify_id": artist.spotify_id, "name": artist.name} for artist in due])
+
+        found = []
+        still_unmatched = []
+        for artist in due:
+            # Left out if MusicBrainz was unavailable; it stays due for next run
+            if artist.spotify_id not in results:
+                continue
+
+            new_artist = results[artist.spotify_id]
+            if new_artist:
+                store_artist_in_db({**new_artist, "spotify_id": artist.spotify_id, "spotify_info": artist.spotify_info})
+                found.append(artist.spotify_id)
+                self.stdout.write(self.style.SUCCESS(f"✔ Found {artist.name}"))
+            else:
+                artist.attempts += 1
+                artist.last_attempt = now
+                artist.retry_after = unmatched_retry_after(artist.attempts, now)
+                still_unmatched.append(artist)
+
+        UnmatchedArtists.objects.filter(spotify_id__in=found).delete()
+        UnmatchedArtists.objects.bulk_update(still_unmatched, ["attempts", "last_attempt", "retry_after"])
+
+        # Cached cards for the found artists only have a name (users' cached
+        # results are filled in when next read, see get_cached_result)
+        forget_cards(found)
+
+        skipped = len(due) - len(found) - len(still_unmatched)
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"⚠ {skipped} artists skipped, MusicBrainz unavailable."))
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Done! {len(found)} artists found, {len(still_unmatched)} still unmatched."
+        ))
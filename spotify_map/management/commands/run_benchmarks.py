@@ -0,0 +1,147 @@
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.utils import timezone
+from spotify_map.benchmarks import Benchmarks, compare, results_document
+from spotify_map.stub_upstreams import StubCatalog, StubUpstreams
+
+
+def format_ms(ms: float) -> str:
+    # Memory hits take microseconds
+    return f"{ms:.3f}" if ms < 1 else f"{ms:.1f}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Times artist loading, geocoding, the import commands and the main views against local stub "
+        "Spotify, MusicBrainz and Nominatim servers, in a separate test database, and saves the results "
+        "as JSON so runs can be compared. The stubs aren't rate limited, so the timings are the app's own "
+        "plus the simulated latency. On SQLite, which allows one writer at a time, fetch_top_artists and "
+        "the views' setup load artists on a single thread."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark (default: 5)")
+        parser.add_argument("--artists", type=int, default=100, help="Artists in the stub catalog (default: 100)")
+        parser.add_argument("--import-rows", type=int, default=500, help="Rows in the import benchmarks' CSV (default: 500)")
+        parser.add_argument("--latency-ms", type=float, default=50, help="Delay of every stub response (default: 50)")
+        for upstream in ("spotify", "musicbrainz", "nominatim"):
+            parser.add_argument(f"--{upstream}-latency-ms", type=float, help=f"Delay of {upstream} responses (default: --latency-ms)")
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            metavar="NAME",
+            help="Only run benchmarks whose names start with one of these, e.g. get_coords view.map",
+        )
+        parser.add_argument(
+            "--output",
+            help="Where to save the results (default: a new file in settings.BENCHMARK_DIR)",
+        )
+        parser.add_argument(
+            "--compare",
+            nargs="?",
+            const="latest",
+            metavar="RESULTS",
+            help="Compare with an earlier results file (default: the latest in settings.BENCHMARK_DIR)",
+        )
+        parser.add_argument("--keepdb", action="store_true", help="Keep the test database between runs")
+
+    def handle(self, *args, **options):
+        previous = self.load_previous(options["compare"]) if options["compare"] else None
+
+        latency_ms = {
+            upstream: options[f"{upstream}_latency_ms"] if options[f"{upstream}_latency_ms"] is not None else options["latency_ms"]
+            for upstream in ("spotify", "musicbrainz", "nominatim")
+        }
+        config = {
+            "repeat": options["repeat"],
+            "artists": options["artists"],
+            "import_rows": options["import_rows"],
+            "latency_ms": latency_ms,
+        }
+
+        # A throwaway database, as for tests, since every benchmark empties
+        # the artist tables
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options["keepdb"])
+        try:
+            catalog = StubCatalog(options["artists"])
+            with StubUpstreams(
+                catalog,
+                spotify_latency=latency_ms["spotify"] / 1000,
+                musicbrainz_latency=latency_ms["musicbrainz"] / 1000,
+                nominatim_latency=latency_ms["nominatim"] / 1000,
+            ) as upstreams, override_settings(**upstreams.settings()):
+                self.stdout.write(f"⏱️ Running benchmarks ({options['repeat']} runs each)...")
+                benchmarks = Benchmarks(upstreams, options["repeat"], options["import_rows"], log=self.log_result)
+                results = benchmarks.run(options["only"])
+                document = results_document(results, config)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        if not results:
+            raise CommandError("No benchmarks matched --only.")
+
+        output = options["output"] or self.default_output(document)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(document, file, indent=2)
+
+        if previous:
+            self.print_comparison(previous, document)
+        self.stdout.write(self.style.SUCCESS(f"🎉 Done! {len(results)} benchmarks saved to {output}."))
+
+    def log_result(self, name, summary):
+        requests = ", ".join(
+            f"{upstream} {count:g}" for upstream, count in summary["upstream_requests"].items() if count
+        )
+        self.stdout.write(
+            f"✔ {name}: median {format_ms(summary['median_ms'])} ms "
+            f"(min {format_ms(summary['min_ms'])}, max {format_ms(summary['max_ms'])}, {summary['runs']} runs)"
+            + (f"; upstream requests per run: {requests}" if requests else "")
+        )
+
+    def default_output(self, document):
+        stamp = timezone.now().strftime("%Y%m%dT%H%M%SZ")
+        commit = (document["git_commit"] or "unknown")[:7]
+        return os.path.join(settings.BENCHMARK_DIR, f"{stamp}-{commit}.json")
+
+    def load_previous(self, path):
+        if path == "latest":
+            try:
+                names = sorted(name for name in os.listdir(settings.BENCHMARK_DIR) if name.endswith(".json"))
+            except FileNotFoundError:
+                names = []
+            if not names:
+                raise CommandError(f"No earlier results in {settings.BENCHMARK_DIR} to compare with.")
+            path = os.path.join(settings.BENCHMARK_DIR, names[-1])
+
+        try:
+            with open(path, encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Couldn't read {path}: {e}")
+
+    def print_comparison(self, previous, document):
+        rows = compare(previous, document)
+        if not rows:
+            self.stdout.write(self.style.WARNING("⚠ Nothing to compare with (different benchmarks or results format)."))
+            return
+
+        self.stdout.write(f"📊 Compared with {(previous.get('git_commit') or 'unknown')[:7]} ({previous.get('created_at')}):")
+        for name, before, after, change in rows:
+            line = f"  {name}: {format_ms(before)} → {format_ms(after)} ms ({change:+.1f}%)"
+            if change >= 10:
+                line = self.style.ERROR(line)
+            elif change <= -10:
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from spotify_map.http_client import async_client_scope
+from spotify_map.jobs import JOB_HEARTBEAT_INTERVAL, arun_loading_job, claim_next_job, clean_up_jobs, run_loading_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued /start-loading/ jobs. Use with LOADING_JOBS_IN_PROCESS = False "
+        "to keep the loads out of the web workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Jobs to run at once (default: 4)")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between queue checks when idle")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+        parser.add_argument(
+            "--async",
+            action="store_true",
+            dest="use_async",
+            help="Run jobs as tasks on one event loop instead of threads, so --workers can be in the hundreds",
+        )
+
+    def handle(self, *args, **options):
+        if options["use_async"]:
+            asyncio.run(self.run_async(options))
+            self.stdout.write(self.style.SUCCESS("🎉 Done!"))
+            return
+
+        workers = options["workers"]
+        self.stdout.write(self.style.SUCCESS(f"👷 Running loading jobs with {workers} worker(s)"))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            running = set()
+            last_cleanup = None
+            while True:
+                running = {future for future in running if not future.done()}
+                close_old_connections()
+
+                # Fail jobs whose worker died, and delete old ones
+                if last_cleanup is None or time.monotonic() - last_cleanup >= JOB_HEARTBEAT_INTERVAL:
+                    clean_up_jobs()
+                    last_cleanup = time.monotonic()
+
+                job = claim_next_job() if len(running) < workers else None
+                if job:
+                    self.stdout.write(f"▶️ Starting job {job.pk}")
+                    running.add(executor.submit(self.run_job, job))
+                    continue
+
+                if options["once"] and not running:
+                    break
+                time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS("🎉 Done!"))
+
+    def run_job(self, job):
+        try:
+            run_loading_job(job)
+        finally:
+            connection.close()
+
+    async def run_async(self, options):
+        workers = options["workers"]
+        self.stdout.write(self.style.SUCCESS(f"👷 Running up to {workers} loading job(s) at once on the event loop"))
+
+        running = set()
+        last_cleanup = None
+        # The loop (and so its async HTTP client) is gone once asyncio.run returns
+        async with async_client_scope():
+            while True:
+                running = {task for task in running if not task.done()}
+
+                if last_cleanup is None or time.monotonic() - last_cleanup >= JOB_HEARTBEAT_INTERVAL:
+                    await sync_to_async(clean_up_jobs)()
+                    last_cleanup = time.monotonic()
+
+                job = await sync_to_async(claim_next_job)() if len(running) < workers else None
+                if job:
+                    self.stdout.write(f"▶️ Starting job {job.pk}")
+                    running.add(asyncio.create_task(arun_loading_job(job)))
+                    continue
+
+                if options["once"] and not running:
+                    break
+                await asyncio.sleep(options["interval"])
@@ -0,0 +1,96 @@
+import hashlib
+import json
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # Optional: responses fall back to gzip without it
+    brotli = None
+
+GEOJSON_CONTENT_TYPE = "application/geo+json"
+
+
+def artists_geojson(artists: list) -> dict:
+    """
+    Builds a GeoJSON FeatureCollection of the artists with known birthplaces,
+    from ranked artist dictionaries like the ones hydrate() returns.
+    """
+    features = []
+    for artist in artists:
+        if artist.get("birth_latitude") is None or artist.get("birth_longitude") is None:
+            continue
+        features.append({
+            "type": "Feature",
+            # GeoJSON positions are [longitude, latitude]
+            "geometry": {"type": "Point", "coordinates": [artist["birth_longitude"], artist["birth_latitude"]]},
+            "properties": {
+                "id": artist["spotify_id"],
+                "name": artist["name"],
+                "location": artist.get("birth_location"),
+                "rank": artist.get("rank"),
+            },
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def encode_geojson(data: dict) -> bytes:
+    # Compact, with sorted keys so equal data always encodes the same way
+    return json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
+
+
+def _pick_encoding(accept_encoding: str) -> str | None:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, *params = [param.strip() for param in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if quality > 0:
+            accepted.add(coding.lower())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def geojson_response(request, data: dict) -> HttpResponse:
+    """
+    Serves GeoJSON with a strong ETag (answering If-None-Match with a 304)
+    and brotli or gzip compression when the client accepts it.
+
+    Each encoding gets its own ETag, derived from the uncompressed body, and
+    any of them matches on revalidation.
+    """
+    body = encode_geojson(data)
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    encoding = _pick_encoding(request.headers.get("Accept-Encoding", ""))
+    etag = quote_etag(f"{digest}-{encoding}" if encoding else digest)
+
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    if "*" in if_none_match or any(tag.strip('"').split("-")[0] == digest for tag in if_none_match):
+        response = HttpResponseNotModified()
+    else:
+        if encoding == "br":
+            body = brotli.compress(body)
+        elif encoding == "gzip":
+            body = compress_string(body)
+        response = HttpResponse(body, content_type=GEOJSON_CONTENT_TYPE)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+
+    response.headers["ETag"] = etag
+    # Per-user data: the browser keeps it but checks back (cheaply, via the
+    # ETag) in case the user has logged in again since
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Accept-Encoding", "Cookie"])
+    return response
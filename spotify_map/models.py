@@ -1,4 +1,15 @@
 from django.db import models
+from .geohash import encode_or_none
+from .zodiac import astrological_sign
+
+def get_photo(spotify_info: dict):
+    """
+    Returns the URL of the first image in a Spotify artist object, if any.
+    """
+    if spotify_info and spotify_info.get("images"):
+        return spotify_info["images"][0]["url"]
+    return None
+
 class Artists(models.Model):
     spotify_id = models.CharField(max_length=255, primary_key=True)  # Set spotify_id as the primary key
     name = models.CharField(max_length=255)
@@ -6,12 +17,127 @@ class Artists(models.Model):
     birth_longitude = models.FloatField(null=True, blank=True)
     birth_date = models.DateField(null=True, blank=True)
     birth_location = models.CharField(max_length=255, null=True, blank=True)
+    # Of the birth coordinates, for radius/nearest queries (see catalog.py);
+    # kept in sync by save() and update_geohash()
+    geohash = models.CharField(max_length=12, null=True, blank=True, db_index=True)
     complete_artist_json = models.JSONField(null=True, blank=True)
 
+    # Denormalized from complete_artist_json/birth_date so displaying an artist
+    # never loads the JSON (kept in sync by save(); see update_display_fields)
+    photo_url = models.URLField(max_length=500, null=True, blank=True)
+    zodiac_sign = models.CharField(max_length=16, null=True, blank=True)
+
+    # When complete_artist_json was last fetched from Spotify (see refresh_json)
+    refreshed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    # Last write of any kind, for incremental backups (see backups.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Fields needed to display an artist, for use with .only()
+    DISPLAY_FIELDS = [
+        'spotify_id', 'name', 'birth_latitude', 'birth_longitude', 'birth_date',
+        'birth_location', 'photo_url', 'zodiac_sign',
+    ]
+
+    class Meta:
+        indexes = [
+            # Bounding-box lookups (see catalog.artists_in_bbox), with
+            # spotify_id so their keyset pagination stays in the index
+            models.Index(fields=['birth_latitude', 'birth_longitude', 'spotify_id'], name='artists_birth_coords_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def update_display_fields(self):
+        """
+        Recomputes photo_url and zodiac_sign. Call this before bulk writes,
+        which skip save().
+        """
+        self.photo_url = get_photo(self.complete_artist_json)
+        self.zodiac_sign = astrological_sign(str(self.birth_date)) if self.birth_date else None
+
+    def update_geohash(self):
+        """
+        Recomputes geohash from the birth coordinates. Call this before bulk
+        writes, which skip save().
+        """
+        self.geohash = encode_or_none(self.birth_latitude, self.birth_longitude)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.update_display_fields()
+            self.update_geohash()
+        elif update_fields:
+            update_fields = set(update_fields) | {'updated_at'}
+            if {'complete_artist_json', 'birth_date'} & update_fields:
+                self.update_display_fields()
+                update_fields |= {'photo_url', 'zodiac_sign'}
+            if {'birth_latitude', 'birth_longitude'} & update_fields:
+                self.update_geohash()
+                update_fields.add('geohash')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+class UnmatchedArtists(models.Model):
+    # Artists MusicBrainz had no match for, so they aren't searched again on
+    # every login; `manage.py retry_unmatched_artists` retries them once
+    # retry_after has passed, backing off after each miss
+    spotify_id = models.CharField(max_length=255, primary_key=True)
+    name = models.CharField(max_length=255)
+    spotify_info = models.JSONField(null=True, blank=True)  # Stored with the artist if a retry finds them
+    attempts = models.PositiveIntegerField(default=1)  # 0 if MusicBrainz was unavailable, so never asked yet
+    last_attempt = models.DateTimeField()
+    retry_after = models.DateTimeField(db_index=True)
+
 class Coordinates(models.Model):
     location = models.CharField(max_length=255, unique=True)
     longitude = models.FloatField(null=True, blank=True)
-    latitude = models.FloatField(null=True, blank=True)
\ No newline at end of file
+    latitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, null=True, blank=True, db_index=True)  # Kept in sync by save()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.geohash = encode_or_none(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
+class UnresolvedLocations(models.Model):
+    # Locations Nominatim couldn't find, so they aren't searched again on
+    # every login (see coordinates.UNRESOLVED_LOCATION_TTL)
+    location = models.CharField(max_length=255, unique=True)
+    attempted_at = models.DateTimeField()
+
+class LoadingJobs(models.Model):
+    # Background load of a user's top artists, started by /start-loading/
+    # and run by spotify_map.jobs (see check_loading_status for progress)
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    token_info = models.JSONField(null=True, blank=True)  # Cleared once the job has run
+    artists_fetched = models.PositiveIntegerField(default=0)  # Distinct top artists from Spotify
+    artists_to_enrich = models.PositiveIntegerField(default=0)  # Of those, not yet in the database
+    artists_enriched = models.PositiveIntegerField(default=0)
+    artists_geocoded = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set on every change and by the running job's heartbeat (queryset
+    # updates skip auto_now, so see jobs.update_job)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def progress(self) -> dict:
+        return {
+            'status': self.status,
+            'artists_fetched': self.artists_fetched,
+            'artists_to_enrich': self.artists_to_enrich,
+            'artists_enriched': self.artists_enriched,
+            'artists_geocoded': self.artists_geocoded,
+        }
@@ -1,209 +1,434 @@
-import httpx
-import time
-from .models import Artists
-from .coordinates import get_coords
-from datetime import datetime
-
-MUSICBRAINZ_URL = "https://musicbrainz.org/ws/2/artist/?query=artist:"
-
-def astrological_sign(birthdate_str: str):
-    if is_valid_date(birthdate_str):
-        date = datetime.strptime(birthdate_str, "%Y-%m-%d")
-        month, day = date.month, date.day
-
-        if (month == 1 and day >= 20) or (month == 2 and day <= 18):
-            return "Aquarius"
-        elif (month == 2 and day >= 19) or (month == 3 and day <= 20):
-            return "Pisces"
-        elif (month == 3 and day >= 21) or (month == 4 and day <= 19):
-            return "Aries"
-        elif (month == 4 and day >= 20) or (month == 5 and day <= 20):
-            return "Taurus"
-        elif (month == 5 and day >= 21) or (month == 6 and day <= 20):
-            return "Gemini"
-        elif (month == 6 and day >= 21) or (month == 7 and day <= 22):
-            return "Cancer"
-        elif (month == 7 and day >= 23) or (month == 8 and day <= 22):
-            return "Leo"
-        elif (month == 8 and day >= 23) or (month == 9 and day <= 22):
-            return "Virgo"
-        elif (month == 9 and day >= 23) or (month == 10 and day <= 22):
-            return "Libra"
-        elif (month == 10 and day >= 23) or (month == 11 and day <= 21):
-            return "Scorpio"
-        elif (month == 11 and day >= 22) or (month == 12 and day <= 21):
-            return "Sagittarius"
-        else:
-            return "Capricorn"
-    else:
-        return None
-
-def is_valid_date(date_string):
-    """
-    Checks if a string is a valid date in the format mm-dd-yyyy.
-
-    Args:
-        date_string: The string to check.
-
-    Returns:
-        True if the string is a valid date, False otherwise.
-    """
-    format_string = "%Y-%m-%d"
-    try:
-        datetime.strptime(date_string, format_string)
-        return True
-    except ValueError:
-        return False
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .artist_cards import existing_artist_info, forget_cards
+from .bulk import bulk_upsert
+from .models import Artists, UnmatchedArtists, get_photo
+from .coordinates import aget_coords, get_coords
+from .http_client import aget, get, UpstreamUnavailable
+from .musicbrainz_index import completeness, get_musicbrainz_index, normalize_name
+from .zodiac import astrological_signs, is_valid_date
+
+# Lookups run on a small pool so geocoding and DB work overlap with the
+# rate-limited MusicBrainz requests (and, in the async path, at most this
+# many at once per load, so one big load doesn't queue ahead of every other
+# load for the rate limit)
+MUSICBRAINZ_MAX_WORKERS = 4
+
+# Artists MusicBrainz can't match are retried after a day, then after twice
+# as long each time, up to every 90 days (see retry_unmatched_artists)
+UNMATCHED_RETRY_BASE = timedelta(days=1)
+UNMATCHED_RETRY_MAX = timedelta(days=90)
+
+def _artist_defaults(new_artist: dict) -> dict:
+    return {
+        'name': new_artist['name'],
+        'birth_latitude': new_artist.get("birth_latitude"),
+        'birth_longitude': new_artist.get("birth_longitude"),
+        'birth_date': new_artist.get("birth_date"),
+        'birth_location': new_artist.get("birth_location"),
+        'complete_artist_json': new_artist.get("spotify_info"),
+        'refreshed_at': timezone.now() if new_artist.get("spotify_info") else None,
+    }
 
 def store_artist_in_db(new_artist: dict):
     # Use update_or_create with 'defaults' to specify the fields to update
     artist, created = Artists.objects.update_or_create(
         spotify_id=new_artist['spotify_id'],  # unique identifier for the artist
-        defaults={
-            'name': new_artist['name'],
-            'birth_latitude': new_artist.get("birth_latitude"),
-            'birth_longitude': new_artist.get("birth_longitude"),
-            'birth_date': new_artist.get("birth_date"),
-            'birth_location': new_artist.get("birth_location"),
-            'complete_artist_json': new_artist.get("spotify_info"),
-        }
+        defaults=_artist_defaults(new_artist)
     )
 
-def get_new_artist_info(name: str):
-    # Search for the artist using the MusicBrainz API
-    time.sleep(1)
-    url = MUSICBRAINZ_URL + f'{name}&fmt=json'
+async def astore_artist_in_db(new_artist: dict):
+    await Artists.objects.aupdate_or_create(
+        spotify_id=new_artist['spotify_id'], defaults=_artist_defaults(new_artist)
+    )
 
-    new_artist = {"name": name}
+def unmatched_retry_after(attempts: int, attempted_at):
+    # Artists not looked up yet (attempts=0) are due straight away
+    if not attempts:
+        return attempted_at
+    return attempted_at + min(UNMATCHED_RETRY_BASE * 2 ** (attempts - 1), UNMATCHED_RETRY_MAX)
+
+def _unmatched_rows(artists: list, attempts: int) -> list:
+    now = timezone.now()
+    return [
+        UnmatchedArtists(
+            spotify_id=artist['spotify_id'],
+            name=artist['name'],
+            spotify_info=artist,
+            attempts=attempts,
+            last_attempt=now,
+            retry_after=unmatched_retry_after(attempts, now),
+        )
+        for artist in artists
+    ]
+
+def _store_unmatched_artists(missed: list, skipped: list):
+    # A miss after a skip replaces its tombstone. bulk_upsert is sync only, so
+    # the async path runs this in a thread
+    bulk_upsert(
+        UnmatchedArtists, _unmatched_rows(missed, 1) + _unmatched_rows(skipped, 0),
+        unique_fields=['spotify_id'], update_fields=['name', 'spotify_info', 'attempts', 'last_attempt', 'retry_after'],
+    )
 
-    with httpx.Client() as client:
-        response = client.get(url)
+def store_new_artists(to_store: list, missed: list, skipped: list):
+    """
+    Stores newly found artists, and tombstones for Spotify artist
+    dictionaries MusicBrainz had no match for (missed) or that weren't
+    looked up because it was unavailable (skipped, with no attempts yet, so
+    they're retried at the next login or by retry_unmatched_artists).
+    """
+    for new_artist in to_store:
+        store_artist_in_db(new_artist)
+    if to_store:
+        # Found now, so no longer waiting for a retry
+        UnmatchedArtists.objects.filter(spotify_id__in=[artist['spotify_id'] for artist in to_store]).delete()
+    _store_unmatched_artists(missed, skipped)
+    forget_cards([artist['spotify_id'] for artist in to_store + missed + skipped])
+
+async def astore_new_artists(to_store: list, missed: list, skipped: list):
+    for new_artist in to_store:
+        await astore_artist_in_db(new_artist)
+    if to_store:
+        await UnmatchedArtists.objects.filter(spotify_id__in=[artist['spotify_id'] for artist in to_store]).adelete()
+    await sync_to_async(_store_unmatched_artists)(missed, skipped)
+    await sync_to_async(forget_cards)([artist['spotify_id'] for artist in to_store + missed + skipped])
+
+def musicbrainz_search_url(name: str) -> str:
+    return f"{settings.MUSICBRAINZ_API_URL}artist/?query=artist:{name}&fmt=json"
+
+def find_musicbrainz_artist(name: str):
+    """
+    Returns the MusicBrainz artist with this name (case-insensitively), from
+    the offline index if there is one and it has them, else from the
+    MusicBrainz API. None if neither has them.
+
+    Raises UpstreamUnavailable if the API is needed but MusicBrainz keeps
+    throttling us.
+    """
+    index = get_musicbrainz_index()
+    if index:
+        artist = index.lookup(name)
+        if artist:
+            return artist
+
+    response = get(musicbrainz_search_url(name))
+    return match_search_results(name, response)
+
+async def afind_musicbrainz_artist(name: str):
+    """
+    Async version of find_musicbrainz_artist().
+    """
+    # The offline index is a local SQLite lookup, quick enough for the event loop
+    index = get_musicbrainz_index()
+    if index:
+        artist = index.lookup(name)
+        if artist:
+            return artist
 
+    response = await aget(musicbrainz_search_url(name))
+    return match_search_results(name, response)
+
+def match_search_results(name: str, response):
+    """
+    Picks the artist named `name` from a MusicBrainz search response: of the
+    results with that name, the most complete one and then the best scored,
+    as the offline index does (see completeness). None if there's none.
+    """
     if response.status_code == 200:
-        data = response.json()
+        matches = [
+            artist for artist in response.json()["artists"]
+            if normalize_name(artist["name"]) == normalize_name(name)
+        ]
+        if matches:
+            return max(matches, key=completeness)
+    return None
+
+def _musicbrainz_details(artist: dict) -> dict:
+    # Birth date and birth location of a MusicBrainz artist, if it has them
+    details = {}
+
+    # Get birthdate
+    birthdate = artist.get('life-span', {}).get('begin', '')
+    if is_valid_date(birthdate):
+        details["birth_date"] = birthdate
+
+    # Get birth location
+    birth_city = artist.get('begin-area', {}).get('name', '')
+    birth_country = artist.get('area', {}).get("name", '')
 
-        for artist in data["artists"]:
-            if name.lower() == artist["name"].lower():
+    if birth_country or birth_city:
+        if birth_country and birth_city:
+            birth_location = birth_city + ", " + birth_country
+        elif birth_country and not birth_city:
+            birth_location = birth_country
+        elif birth_city and not birth_country:
+            birth_location = birth_city
 
-                # Get birthdate
-                birthdate = artist.get('life-span', {}).get('begin', '')
-                if is_valid_date(birthdate):
-                    new_artist["birth_date"] = birthdate
+        details['birth_location'] = birth_location
 
+    return details
 
-                # Get birth location
-                birth_city = artist.get('begin-area', {}).get('name', '')
-                birth_country = artist.get('area', {}).get("name", '')
+def _add_coords(new_artist: dict, coords):
+    if coords:
+        new_artist['birth_latitude'] = coords[0]
+        new_artist['birth_longitude'] = coords[1]
 
-                if birth_country or birth_city:
-                    if birth_country and birth_city:
-                        birth_location = birth_city + ", " + birth_country
-                    elif birth_country and not birth_city:
-                        birth_location = birth_country
-                    elif birth_city and not birth_country:
-                        birth_location = birth_city
+def get_new_artist_info(name: str):
+    # Search for the artist in MusicBrainz (raises UpstreamUnavailable if
+    # MusicBrainz keeps throttling us)
+    new_artist = {"name": name}
 
-                    new_artist['birth_location'] = birth_location
+    artist = find_musicbrainz_artist(name)
+    if artist:
+        new_artist.update(_musicbrainz_details(artist))
 
-                    # Get birth lat/lon
-                    coords = get_coords(birth_location)
-                    if coords:
-                        new_artist['birth_latitude'] = coords[0]
-                        new_artist['birth_longitude'] = coords[1]
+        # Get birth lat/lon
+        if 'birth_location' in new_artist:
+            _add_coords(new_artist, get_coords(new_artist['birth_location']))
 
-                # Store Musicbrainz data
-                new_artist["musicbrainz_data"] = artist
-                return new_artist
+        # Store Musicbrainz data
+        new_artist["musicbrainz_data"] = artist
+        return new_artist
 
     # No artist found
     print(f"Artist {name} not found in Musicbrainz")
     return None
 
-def fetch_artists_info(st_artists: list, mt_artists: list, lt_artists: list) -> dict:
-    # Lists of short-term/medium-term/long-term top artist IDs
-    all_artist_ids = set().union(
-        {artist['spotify_id'] for artist in st_artists},
-        {artist['spotify_id'] for artist in mt_artists},
-        {artist['spotify_id'] for artist in lt_artists}
-    )
+async def aget_new_artist_info(name: str):
+    """
+    Async version of get_new_artist_info().
+    """
+    new_artist = {"name": name}
 
-    # Existing artists in database that match that
-    existing_artists = Artists.objects.in_bulk(all_artist_ids, field_name='spotify_id')
+    artist = await afind_musicbrainz_artist(name)
+    if artist:
+        new_artist.update(_musicbrainz_details(artist))
+        if 'birth_location' in new_artist:
+            _add_coords(new_artist, await aget_coords(new_artist['birth_location']))
+        new_artist["musicbrainz_data"] = artist
+        return new_artist
+
+    print(f"Artist {name} not found in Musicbrainz")
+    return None
+
+def enrich_new_artists(new_artists: list, progress=None) -> dict:
+    """
+    Looks up a batch of artists missing from the database concurrently.
+
+    Each distinct artist is searched once, no matter how many of the user's
+    top lists it appears in. MusicBrainz requests still go through the shared
+    rate limiter, but DB lookups, geocoding and response handling overlap
+    across workers.
+
+    Args:
+        new_artists: Spotify artist dictionaries (with a 'spotify_id' key).
+        progress: Optional callable, called as progress(stage) with stage
+            "enriched" after each lookup and "geocoded" for each artist
+            whose birthplace was located.
 
+    Returns:
+        Dictionary of spotify_id -> new artist dictionary (None if not found).
+        Artists that couldn't be looked up because MusicBrainz was
+        unavailable are left out, so they're retried next time.
+    """
+    new_artists_info = {}
+    if not new_artists:
+        return new_artists_info
+
+    workers = min(MUSICBRAINZ_MAX_WORKERS, len(new_artists))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_lookup_new_artist, artist): artist for artist in new_artists}
+        for future in as_completed(futures):
+            looked_up, new_artist = future.result()
+            if looked_up:
+                new_artists_info[futures[future]["spotify_id"]] = new_artist
+
+            if progress:
+                progress("enriched")
+                if new_artist and "birth_latitude" in new_artist:
+                    progress("geocoded")
+
+    return new_artists_info
+
+async def aenrich_new_artists(new_artists: list, progress=None) -> dict:
+    """
+    Async version of enrich_new_artists(), looking up at most
+    MUSICBRAINZ_MAX_WORKERS artists at once. progress, if given, is an async
+    callable.
+    """
+    new_artists_info = {}
+    semaphore = asyncio.Semaphore(MUSICBRAINZ_MAX_WORKERS)
+
+    async def lookup(artist: dict):
+        new_artist = None
+        async with semaphore:
+            try:
+                new_artist = await aget_new_artist_info(artist["name"])
+                new_artists_info[artist["spotify_id"]] = new_artist
+            except UpstreamUnavailable as e:
+                print(f"Couldn't look up {artist['name']} in Musicbrainz: {e}")
+
+        if progress:
+            await progress("enriched")
+            if new_artist and "birth_latitude" in new_artist:
+                await progress("geocoded")
+
+    await asyncio.gather(*(lookup(artist) for artist in new_artists))
+    return new_artists_info
+
+def _lookup_new_artist(artist: dict):
+    try:
+        return True, get_new_artist_info(artist["name"])
+    except UpstreamUnavailable as e:
+        print(f"Couldn't look up {artist['name']} in Musicbrainz: {e}")
+        return False, None
+    finally:
+        # Worker threads each open their own DB connection; don't leak them
+        connection.close()
+
+def _distinct_artists(top_artist_lists: list) -> dict:
+    # Distinct short-term/medium-term/long-term top artists, keyed by ID
+    all_artists = {}
+    for top_artist_list in top_artist_lists:
+        for artist in top_artist_list:
+            all_artists.setdefault(artist['spotify_id'], artist)
+    return all_artists
+
+def _build_artist_info(all_artists: dict, known_artists: dict, existing_artists: dict, new_artists_info: dict) -> tuple[dict, list]:
+    # One display dictionary per artist, shared by all three lists, and the
+    # newly found artists to store in the database
+
+    # Zodiac signs for all the newly found artists in one pass
+    found_ids = [spotify_id for spotify_id, new_artist in new_artists_info.items() if new_artist]
+    new_signs = dict(zip(found_ids, astrological_signs(
+        [new_artists_info[spotify_id].get("birth_date") for spotify_id in found_ids]
+    )))
+
+    artist_info = {}
+    to_store = []
+    for spotify_id, artist in all_artists.items():
+
+        # If artist already built, reuse it
+        if spotify_id in known_artists:
+            artist_info[spotify_id] = known_artists[spotify_id]
+
+        # If artist in existing database, grab relevant info
+        elif spotify_id in existing_artists:
+            artist_info[spotify_id] = existing_artist_info(existing_artists[spotify_id], artist['name'])
+
+        # If new artist found in MusicBrainz
+        elif new_artists_info.get(spotify_id):
+            new_artist = new_artists_info[spotify_id]
+            new_artist["spotify_id"] = spotify_id
+            new_artist["sign"] = new_signs[spotify_id]
+            del new_artist["musicbrainz_data"] # for now, not including
+
+            # To store in artist database
+            to_store.append({**new_artist, "spotify_info": artist})
+
+            new_artist["photo"] = get_photo(artist)
+            artist_info[spotify_id] = new_artist
+
+        # New artist not found in MusicBrainz (now or before)
+        else:
+            # Only keep the information we have from Spotify
+            artist_info[spotify_id] = {
+                'spotify_id': spotify_id,
+                'name': artist['name'],
+            }
+
+    return artist_info, to_store
+
+def _misses(new_artists: list, new_artists_info: dict) -> tuple[list, list]:
+    # Artists MusicBrainz had no match for, and ones skipped because it was
+    # unavailable (left out of new_artists_info)
+    missed = [artist for artist in new_artists if artist['spotify_id'] in new_artists_info and new_artists_info[artist['spotify_id']] is None]
+    skipped = [artist for artist in new_artists if artist['spotify_id'] not in new_artists_info]
+    return missed, skipped
+
+def _rank(top_artist_lists: list, artist_info: dict) -> dict:
+    # Build the short-term/medium-term/long-term lists of artist dictionaries
     all_artist_data = {}
+    for key, top_artist_list in zip(["st_artists", "mt_artists", "lt_artists"], top_artist_lists):
+        all_artist_data[key] = [
+            {**artist_info[artist['spotify_id']], 'rank': i+1}
+            for i, artist in enumerate(top_artist_list)
+        ]
+    return all_artist_data
+
+def fetch_artists_info(st_artists: list, mt_artists: list, lt_artists: list, progress=None, known_artists=None) -> dict:
+    # progress: optional callable for reporting how far along we are, called
+    # once as progress("to_enrich", count), then as progress(stage) for each
+    # artist (see enrich_new_artists)
+    # known_artists: optional artist dictionaries (keyed by spotify_id) that
+    # are already built, e.g. from the user's last cached result
+    top_artist_lists = [st_artists, mt_artists, lt_artists]
+    known_artists = known_artists or {}
+    all_artists = _distinct_artists(top_artist_lists)
+
+    # Existing artists in database that match that
+    existing_artists = Artists.objects.only(*Artists.DISPLAY_FIELDS).in_bulk(
+        [spotify_id for spotify_id in all_artists if spotify_id not in known_artists],
+        field_name='spotify_id'
+    )
 
-    # Loop through each of short-term, medium-term, long-term ID lists
-    for list_i, top_artist_list in enumerate([st_artists, mt_artists, lt_artists]):
-
-        # Initialize empty list to fill with artist dictionaries
-        artist_dictionaries = []
-
-        # Loop through each of the user's top artists
-        for i, artist in enumerate(top_artist_list):
-
-            # If artist in existing database, grab relevant info and add to list
-            # corresponding to that time period (short-term, medium-term, long-term)
-            if artist['spotify_id'] in existing_artists:
-                existing_artist = existing_artists[artist['spotify_id']]
-                if existing_artist.birth_date:
-                    sign = astrological_sign(existing_artist.birth_date.isoformat())
-                else:
-                    sign = None
-
-                # Look for photo
-                if existing_artist.complete_artist_json:
-                    if existing_artist.complete_artist_json.get("images"):
-                       photo = existing_artist.complete_artist_json["images"][0]["url"]
-                    else: photo = None
-                else:
-                    photo = None
-
-                artist_dictionaries.append({
-                    'rank': i+1,
-                    'spotify_id': artist['spotify_id'],
-                    'name': artist['name'],
-                    'birth_latitude': existing_artist.birth_latitude,
-                    'birth_longitude': existing_artist.birth_longitude,
-                    'birth_date': existing_artist.birth_date.isoformat() if existing_artist.birth_date else None,
-                    'birth_location': existing_artist.birth_location,
-                    'photo': photo,
-                    'sign': sign
-                })
-            else:
-                # Search for new artist dictionary
-                new_artist = get_new_artist_info(artist["name"])
-
-                # If new artist found in MusicBrainz:
-                if new_artist:
-
-                    # Add to list of short-term/medium-term/long-term artists
-                    new_artist["rank"] = i+1
-                    new_artist["spotify_id"] = artist["spotify_id"]
-                    new_artist["sign"] = astrological_sign(new_artist.get("birth_date",""))
-                    del new_artist["musicbrainz_data"] # for now, not including
-                    artist_dictionaries.append(new_artist)
-
-                    # Store in artist database
-                    new_artist["spotify_info"] = artist
-                    store_artist_in_db(new_artist)
-
-                # New artist not found in MusicBrainz
-                else:
-                    # Only append the information we have from Spotify
-                    artist_dictionaries.append({
-                        'rank': i+1,
-                        'spotify_id': artist['spotify_id'],
-                        'name': artist['name'],
-                    })
-
-        # Add list of short-term/medium-term/long-term artist dictionaries to
-        # the all artist data dictionary
-        if list_i == 0:
-            all_artist_data["st_artists"] = artist_dictionaries
-        elif list_i == 1:
-            all_artist_data["mt_artists"] = artist_dictionaries
-        elif list_i == 2:
-            all_artist_data["lt_artists"] = artist_dictionaries
+    # Artists MusicBrainz couldn't match before aren't searched for again
+    # here (see retry_unmatched_artists), but ones skipped while it was
+    # unavailable are
+    unmatched_artists = UnmatchedArtists.objects.filter(attempts__gt=0).only('spotify_id').in_bulk([
+        spotify_id for spotify_id in all_artists
+        if spotify_id not in known_artists and spotify_id not in existing_artists
+    ])
+
+    # Search for each artist not in the database once, concurrently
+    new_artists = [
+        artist for spotify_id, artist in all_artists.items()
+        if spotify_id not in existing_artists and spotify_id not in known_artists
+        and spotify_id not in unmatched_artists
+    ]
+    if progress:
+        progress("to_enrich", len(new_artists))
+    new_artists_info = enrich_new_artists(new_artists, progress)
+
+    artist_info, to_store = _build_artist_info(all_artists, known_artists, existing_artists, new_artists_info)
+    store_new_artists(to_store, *_misses(new_artists, new_artists_info))
 
     # Return dictionary of 3 lists of dictionaries
-    return all_artist_data
\ No newline at end of file
+    return _rank(top_artist_lists, artist_info)
+
+async def afetch_artists_info(st_artists: list, mt_artists: list, lt_artists: list, progress=None, known_artists=None) -> dict:
+    """
+    Async version of fetch_artists_info(), using the async ORM and
+    aenrich_new_artists. progress, if given, is an async callable.
+    """
+    top_artist_lists = [st_artists, mt_artists, lt_artists]
+    known_artists = known_artists or {}
+    all_artists = _distinct_artists(top_artist_lists)
+
+    existing_artists = await Artists.objects.only(*Artists.DISPLAY_FIELDS).ain_bulk(
+        [spotify_id for spotify_id in all_artists if spotify_id not in known_artists],
+        field_name='spotify_id'
+    )
+    unmatched_artists = await UnmatchedArtists.objects.filter(attempts__gt=0).only('spotify_id').ain_bulk([
+        spotify_id for spotify_id in all_artists
+        if spotify_id not in known_artists and spotify_id not in existing_artists
+    ])
+
+    new_artists = [
+        artist for spotify_id, artist in all_artists.items()
+        if spotify_id not in existing_artists and spotify_id not in known_artists
+        and spotify_id not in unmatched_artists
+    ]
+    if progress:
+        await progress("to_enrich", len(new_artists))
+    new_artists_info = await aenrich_new_artists(new_artists, progress)
+
+    artist_info, to_store = _build_artist_info(all_artists, known_artists, existing_artists, new_artists_info)
+    await astore_new_artists(to_store, *_misses(new_artists, new_artists_info))
+
+    return _rank(top_artist_lists, artist_info)
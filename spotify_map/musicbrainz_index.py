@@ -0,0 +1,100 @@
+import sqlite3
+import threading
+from django.conf import settings
+
+# Value of the index's "format" metadata; bump it if the schema changes
+INDEX_FORMAT = "spotify_map_musicbrainz 1"
+
+_index = None
+_index_loaded = False
+
+
+def normalize_name(name: str) -> str:
+    """
+    Index key for an artist name. Matches the case-insensitive comparison
+    used on MusicBrainz search results.
+    """
+    return name.strip().lower()
+
+
+def completeness(artist: dict) -> int:
+    """
+    How many of the fields get_new_artist_info uses (life-span begin,
+    begin-area and area) a MusicBrainz artist has. When several artists
+    share a name, the most complete one is picked, by the index and the API
+    path alike.
+    """
+    values = (
+        (artist.get("life-span") or {}).get("begin"),
+        (artist.get("begin-area") or {}).get("name"),
+        (artist.get("area") or {}).get("name"),
+    )
+    return sum(1 for value in values if value)
+
+
+class MusicBrainzIndex:
+    """
+    Read-only SQLite index of MusicBrainz artists, keeping only what
+    get_new_artist_info uses: name, life-span begin, begin-area and area.
+    Build one from a JSON dump with `manage.py build_musicbrainz_index`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()  # SQLite connections are per-thread
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # mode=ro also stops sqlite3 from creating a missing file
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            try:
+                row = connection.execute("SELECT value FROM metadata WHERE key = 'format'").fetchone()
+            except sqlite3.DatabaseError:
+                row = None
+            if not row or row[0] != INDEX_FORMAT:
+                connection.close()
+                raise ValueError(f"{self.path} is not a MusicBrainz index")
+            self._local.connection = connection
+        return connection
+
+    def lookup(self, name: str) -> dict | None:
+        """
+        Returns the artist with this name, shaped like a MusicBrainz search
+        result, or None if there's no such artist in the index. When several
+        artists share a name, the most complete one wins (see completeness),
+        and then the first in the dump.
+        """
+        row = self._connection().execute(
+            "SELECT name, begin, begin_area, area FROM artists WHERE name_key = ? "
+            "ORDER BY completeness DESC, rowid LIMIT 1",
+            (normalize_name(name),),
+        ).fetchone()
+        if row is None:
+            return None
+
+        name, begin, begin_area, area = row
+        artist = {"name": name}
+        if begin:
+            artist["life-span"] = {"begin": begin}
+        if begin_area:
+            artist["begin-area"] = {"name": begin_area}
+        if area:
+            artist["area"] = {"name": area}
+        return artist
+
+
+def get_musicbrainz_index() -> MusicBrainzIndex | None:
+    """
+    Returns the offline MusicBrainz index, or None if none has been built.
+    """
+    global _index, _index_loaded
+    if not _index_loaded:
+        try:
+            _index = MusicBrainzIndex(settings.MUSICBRAINZ_INDEX_PATH)
+        except (sqlite3.OperationalError, ValueError) as e:
+            print(f"Offline MusicBrainz index not available ({e}) - using the MusicBrainz API only")
+            _index = None
+        _index_loaded = True
+    return _index
@@ -0,0 +1,91 @@
+import asyncio
+import math
+import time
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+
+# Cache alias shared by every web worker and management command
+RATE_LIMIT_CACHE = "shared"
+
+
+class RateLimiter:
+    """
+    Spaces requests to one upstream host at least `1 / rate` seconds apart,
+    across processes, through the Django cache.
+
+    The cache holds the earliest time the next request may go out. A caller
+    takes that time (or now, if it has passed) and pushes it on by one
+    interval, under a short lock so no two callers get the same time, then
+    sleeps until its turn. Unlike per-second windows, two requests can't land
+    either side of a window boundary a few milliseconds apart.
+
+    `capacity` allows bursts: up to that many requests may go out back to
+    back after a quiet period, but never more than `rate` per second on
+    average.
+    """
+
+    # How long the lock may be held before it's treated as abandoned (e.g.
+    # by a killed process)
+    LOCK_TIMEOUT = 5
+    LOCK_POLL = 0.005
+
+    def __init__(self, name: str, rate: float, capacity: int = 1):
+        self.name = name
+        self.capacity = capacity
+        self.interval = 1 / rate
+
+    def _key(self, suffix) -> str:
+        return f"rate_limit:{self.name}:{suffix}"
+
+    def _lock(self, cache):
+        # cache.add() is atomic, so only one caller gets the lock key
+        while not cache.add(self._key("lock"), 1, self.LOCK_TIMEOUT):
+            time.sleep(self.LOCK_POLL)
+
+    def reserve(self) -> float:
+        """
+        Claims the next free request time.
+
+        Returns:
+            Number of seconds to wait before the request may be sent.
+        """
+        cache = caches[RATE_LIMIT_CACHE]
+        self._lock(cache)
+        try:
+            now = time.time()
+            # A burst of `capacity` requests may start `capacity - 1`
+            # intervals before the next free time
+            next_free = cache.get(self._key("next"), now)
+            start = max(now, next_free - (self.capacity - 1) * self.interval)
+            next_free = max(now, next_free) + self.interval
+            cache.set(self._key("next"), next_free, math.ceil(next_free - now) + 1)
+        finally:
+            cache.delete(self._key("lock"))
+        return start - now
+
+    def acquire(self):
+        """
+        Blocks until a request to this host is allowed.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        """
+        Async version of acquire(), which doesn't block the event loop.
+        """
+        wait = await sync_to_async(self.reserve, thread_sensitive=False)()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# MusicBrainz and Nominatim both allow one request per second
+MUSICBRAINZ_LIMITER = RateLimiter("musicbrainz.org", rate=1)
+NOMINATIM_LIMITER = RateLimiter("nominatim.openstreetmap.org", rate=1)
+
+# Limiters applied automatically by spotify_map.http_client, by host name
+LIMITERS = {
+    MUSICBRAINZ_LIMITER.name: MUSICBRAINZ_LIMITER,
+    NOMINATIM_LIMITER.name: NOMINATIM_LIMITER,
+}
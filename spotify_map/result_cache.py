@@ -0,0 +1,90 @@
+import hashlib
+from django.core.cache import caches
+from .models import Artists
+from .artist_cards import existing_artist_info
+
+# Results are kept in a cache shared by all web workers, so a returning user
+# hits it whichever worker serves them. It has its own table (see
+# settings.CACHES), so culling results never drops other shared entries
+RESULT_CACHE = "results"
+RESULT_TTL = 60 * 60 * 24 * 7  # 1 week
+
+# Keys of an artist dictionary with nothing beyond what Spotify gave us
+BARE_ARTIST_KEYS = {"spotify_id", "name", "rank"}
+
+
+def top_artists_fingerprint(st_artists: list, mt_artists: list, lt_artists: list) -> str:
+    """
+    Hash of the user's ranked short/medium/long-term top artist IDs.
+    """
+    ranked_ids = "|".join(
+        ",".join(artist["spotify_id"] for artist in top_artist_list)
+        for top_artist_list in [st_artists, mt_artists, lt_artists]
+    )
+    return hashlib.sha256(ranked_ids.encode()).hexdigest()
+
+
+def _key(user_id: str) -> str:
+    return f"top_artists:{user_id}"
+
+
+def get_cached_result(user_id: str, fingerprint: str) -> tuple[dict | None, dict]:
+    """
+    Looks up the last result built for a Spotify user.
+
+    Returns:
+        (result, known_artists): the cached fetch_artists_info result if the
+        user's top artists haven't changed (with any artists matched in
+        MusicBrainz since filled in), else None; and the artist
+        dictionaries from their last result (keyed by spotify_id, without
+        ranks) so that only new or incomplete entries need recomputing.
+    """
+    cached = caches[RESULT_CACHE].get(_key(user_id))
+    if not cached:
+        return None, {}
+    if cached["fingerprint"] == fingerprint:
+        if _refresh_bare_artists(cached["result"]):
+            cache_result(user_id, fingerprint, cached["result"])
+        return cached["result"], {}
+
+    known_artists = {}
+    for artist_list in cached["result"].values():
+        for artist in artist_list:
+            if set(artist) - BARE_ARTIST_KEYS:
+                known_artists[artist["spotify_id"]] = {k: v for k, v in artist.items() if k != "rank"}
+    return None, known_artists
+
+
+def _refresh_bare_artists(result: dict) -> bool:
+    # Artists MusicBrainz couldn't match when the result was built may have
+    # been matched since (see retry_unmatched_artists). Swaps their bare
+    # entries for the stored details, returning whether any were found
+    bare_ids = {
+        artist["spotify_id"]
+        for artist_list in result.values()
+        for artist in artist_list
+        if not set(artist) - BARE_ARTIST_KEYS
+    }
+    if not bare_ids:
+        return False
+
+    found = {
+        artist.spotify_id: artist
+        for artist in Artists.objects.only(*Artists.DISPLAY_FIELDS).filter(spotify_id__in=bare_ids)
+    }
+    if not found:
+        return False
+
+    for time_range, artist_list in result.items():
+        result[time_range] = [
+            {**existing_artist_info(found[artist["spotify_id"]], artist["name"]), "rank": artist["rank"]}
+            if artist["spotify_id"] in found else artist
+            for artist in artist_list
+        ]
+    return True
+
+
+def cache_result(user_id: str, fingerprint: str, result: dict):
+    caches[RESULT_CACHE].set(
+        _key(user_id), {"fingerprint": fingerprint, "result": result}, RESULT_TTL
+    )
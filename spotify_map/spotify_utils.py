@@ -1,8 +1,23 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
 import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+from spotipy.cache_handler import MemoryCacheHandler
+from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
 from django.conf import settings
+from urllib3.util.retry import Retry
 from spotify_map.models import Artists
 
+# Most artists the Spotify Web API returns per "Get Several Artists" call
+SPOTIFY_BATCH_SIZE = 50
+
+# Connections kept open to Spotify per process, shared by every user's client
+# (a loading job makes four requests at once, and several jobs run at once)
+SPOTIFY_POOL_SIZE = 20
+
+_session = None
+_session_lock = threading.Lock()
+
 # Spotify OAuth setup
 sp_oauth = SpotifyOAuth(
     client_id=settings.SPOTIPY_CLIENT_ID,
@@ -12,11 +27,59 @@ sp_oauth = SpotifyOAuth(
     cache_path=None
 )
 
+class PooledSpotify(spotipy.Spotify):
+    # spotipy closes its session when a client is garbage collected, which
+    # would drop the shared session's pooled connections
+    def __del__(self):
+        pass
+
+def get_spotify_session():
+    """
+    Returns the process-wide HTTP session for Spotify, creating it on first
+    use, with spotipy's default retries.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=3,
+                    connect=None,
+                    read=False,
+                    allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+                    status=3,
+                    backoff_factor=0.3,
+                    status_forcelist=spotipy.Spotify.default_retry_codes,
+                )
+                adapter = requests.adapters.HTTPAdapter(pool_maxsize=SPOTIFY_POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
 def get_spotify_client(token_info):
     """
-    Returns a Spotipy client instance.
+    Returns a Spotipy client instance, on the shared pooled session.
     """
-    return spotipy.Spotify(auth=token_info['access_token'])
+    sp = PooledSpotify(auth=token_info['access_token'], requests_session=get_spotify_session())
+    sp.prefix = settings.SPOTIFY_API_URL
+    return sp
+
+def get_app_spotify_client():
+    """
+    Returns a Spotipy client authenticated as the app itself (no user), for
+    management commands.
+    """
+    auth_manager = SpotifyClientCredentials(
+        client_id=settings.SPOTIPY_CLIENT_ID,
+        client_secret=settings.SPOTIPY_CLIENT_SECRET,
+        cache_handler=MemoryCacheHandler(),  # Not a .cache file shared with other runs (or hosts)
+    )
+    auth_manager.OAUTH_TOKEN_URL = settings.SPOTIFY_TOKEN_URL
+    sp = PooledSpotify(auth_manager=auth_manager, requests_session=get_spotify_session())
+    sp.prefix = settings.SPOTIFY_API_URL
+    return sp
 
 def fetch_top_spotify_artists(sp, time_range="long_term"):
     """
@@ -43,6 +106,49 @@ def fetch_top_spotify_artists(sp, time_range="long_term"):
     # Return them
     return results["items"]
 
+# Time range of each list in a fetch_artists_info result
+TOP_ARTIST_TIME_RANGES = {"st_artists": "short_term", "mt_artists": "medium_term", "lt_artists": "long_term"}
+
+def fetch_all_top_artists(sp):
+    """
+    Fetch the user's ID and top artists for all three time ranges at once.
+
+    The four requests run concurrently, sharing the client's HTTP session
+    (and so its pooled connections to Spotify, see get_spotify_session), so
+    this takes about as long as the slowest of them rather than all four in
+    turn.
+
+    Args:
+        sp: Spotify client instance.
+
+    Returns:
+        (user_id, artists, rankings): the user's Spotify ID, the distinct top
+        artists keyed by spotify_id, and for each time range (st_artists,
+        mt_artists, lt_artists) its top artists in rank order, as the same
+        dictionaries.
+    """
+    with ThreadPoolExecutor(max_workers=len(TOP_ARTIST_TIME_RANGES) + 1) as executor:
+        user_id = executor.submit(get_spotify_user_id, sp)
+        futures = {
+            key: executor.submit(fetch_top_spotify_artists, sp, time_range)
+            for key, time_range in TOP_ARTIST_TIME_RANGES.items()
+        }
+        rankings = {key: future.result() for key, future in futures.items()}
+        user_id = user_id.result()
+
+    # Artists in several ranges share one dictionary
+    artists = {}
+    for key, top_artists in rankings.items():
+        rankings[key] = [artists.setdefault(artist["spotify_id"], artist) for artist in top_artists]
+
+    return user_id, artists, rankings
+
+def get_spotify_user_id(sp):
+    """
+    Returns the Spotify user ID of the logged-in user.
+    """
+    return sp.current_user()["id"]
+
 def get_authorize_url():
     """
     Returns the authorization URL for logging in to Spotify.
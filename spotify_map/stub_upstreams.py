@@ -0,0 +1,205 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-ins for Spotify, MusicBrainz and Nominatim, serving a made-up
+# catalog after a configurable delay, so `manage.py run_benchmarks` times the
+# app rather than the real APIs (and doesn't use up their rate limits)
+
+# Birthplaces of the made-up artists, with coordinates for the Nominatim stub
+CITIES = {
+    ("Paris", "France"): (48.8566, 2.3522),
+    ("Lagos", "Nigeria"): (6.5244, 3.3792),
+    ("Seoul", "South Korea"): (37.5665, 126.9780),
+    ("Atlanta", "United States"): (33.7490, -84.3880),
+    ("Toronto", "Canada"): (43.6532, -79.3832),
+    ("Kingston", "Jamaica"): (17.9712, -76.7936),
+    ("Reykjavík", "Iceland"): (64.1466, -21.9426),
+    ("Melbourne", "Australia"): (-37.8136, 144.9631),
+    ("San Juan", "Puerto Rico"): (18.4655, -66.1057),
+    ("Manchester", "United Kingdom"): (53.4808, -2.2426),
+    ("Bogotá", "Colombia"): (4.7110, -74.0721),
+    ("Stockholm", "Sweden"): (59.3293, 18.0686),
+}
+
+# Every MUSICBRAINZ_MISS_EVERY-th artist isn't in the MusicBrainz stub, and
+# every LOCATION_MISS_EVERY-th is born somewhere Nominatim can't find
+MUSICBRAINZ_MISS_EVERY = 10
+LOCATION_MISS_EVERY = 7
+
+# Spotify's per-request maximum for top artists
+TOP_ARTISTS_LIMIT = 50
+
+
+class StubCatalog:
+    """
+    A made-up catalog of `size` artists, as each upstream would describe them.
+    """
+
+    def __init__(self, size: int):
+        self.artists = [self.spotify_artist(i) for i in range(size)]
+        self.by_id = {artist["id"]: artist for artist in self.artists}
+        self.by_name = {artist["name"].lower(): i for i, artist in enumerate(self.artists)}
+
+    def spotify_artist(self, i: int) -> dict:
+        return {
+            "id": f"stub{i:06d}",
+            "name": f"Stub Artist {i}",
+            "type": "artist",
+            "popularity": 100 - i % 100,
+            "followers": {"total": 1000 * (i + 1)},
+            "genres": ["benchmark"],
+            "images": [{"url": f"https://example.com/stub{i:06d}.jpg", "height": 640, "width": 640}],
+        }
+
+    def birthplace(self, i: int) -> tuple[str, str]:
+        if i % LOCATION_MISS_EVERY == LOCATION_MISS_EVERY - 1:
+            return f"Nowhere {i}", "Atlantis"
+        return list(CITIES)[i % len(CITIES)]
+
+    def top_artists(self, time_range: str) -> list:
+        # The three time ranges overlap by half, like real listening does
+        start = {"short_term": 0, "medium_term": TOP_ARTISTS_LIMIT // 2, "long_term": TOP_ARTISTS_LIMIT}[time_range]
+        return self.artists[start:start + TOP_ARTISTS_LIMIT]
+
+    def musicbrainz_search(self, name: str) -> list:
+        i = self.by_name.get(name.lower())
+        if i is None or i % MUSICBRAINZ_MISS_EVERY == MUSICBRAINZ_MISS_EVERY - 1:
+            return []
+        city, country = self.birthplace(i)
+        return [{
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "name": self.artists[i]["name"],
+            "life-span": {"begin": f"{1950 + i % 50}-{1 + i % 12:02d}-{1 + i % 28:02d}"},
+            "begin-area": {"name": city},
+            "area": {"name": country},
+        }]
+
+    def nominatim_search(self, query: str) -> list:
+        parts = [part.strip() for part in query.split(",")]
+        for (city, country), (lat, lon) in CITIES.items():
+            if parts in ([city, country], [country]):
+                return [{"lat": str(lat), "lon": str(lon), "display_name": f"{city}, {country}"}]
+        return []
+
+
+class StubServer:
+    """
+    One upstream, served from a background thread on a free local port.
+    `route(method, path, query)` returns (status, JSON payload).
+    """
+
+    def __init__(self, name: str, route, latency: float):
+        self.name = name
+        self.route = route
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so pooled connections get reused
+            disable_nagle_algorithm = True  # Headers and body go out separately; don't hold the body back
+
+            def do_GET(self):
+                self.respond()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self.respond()
+
+            def respond(self):
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency)
+                url = urlsplit(self.path)
+                path = url.path.rstrip("/") or "/"  # Clients differ on trailing slashes
+                status, payload = server.route(self.command, path, parse_qs(url.query))
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=f"stub-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StubUpstreams:
+    """
+    Starts stubs for all three upstreams. Use as a context manager, and
+    point the app at them with `settings()` (e.g. via override_settings).
+
+    Latencies are in seconds, per request.
+    """
+
+    def __init__(self, catalog: StubCatalog, spotify_latency: float, musicbrainz_latency: float, nominatim_latency: float):
+        self.catalog = catalog
+        self.spotify = StubServer("spotify", self._spotify, spotify_latency)
+        self.musicbrainz = StubServer("musicbrainz", self._musicbrainz, musicbrainz_latency)
+        self.nominatim = StubServer("nominatim", self._nominatim, nominatim_latency)
+        self.servers = [self.spotify, self.musicbrainz, self.nominatim]
+
+    def __enter__(self):
+        for server in self.servers:
+            server.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for server in self.servers:
+            server.stop()
+
+    def settings(self) -> dict:
+        return {
+            "SPOTIFY_API_URL": f"{self.spotify.url}/v1/",
+            "SPOTIFY_TOKEN_URL": f"{self.spotify.url}/api/token",
+            "MUSICBRAINZ_API_URL": f"{self.musicbrainz.url}/ws/2/",
+            "NOMINATIM_URL": self.nominatim.url,
+            "SPOTIPY_CLIENT_ID": "stub",
+            "SPOTIPY_CLIENT_SECRET": "stub",
+        }
+
+    def request_counts(self) -> dict:
+        return {server.name: server.requests for server in self.servers}
+
+    def _spotify(self, method, path, query):
+        if path == "/api/token":
+            return 200, {"access_token": "stub", "token_type": "Bearer", "expires_in": 3600}
+        if path == "/v1/me":
+            return 200, {"id": "stub-user", "display_name": "Stub User"}
+        if path == "/v1/me/top/artists":
+            time_range = query.get("time_range", ["medium_term"])[0]
+            items = self.catalog.top_artists(time_range)
+            return 200, {"items": items, "total": len(items), "limit": TOP_ARTISTS_LIMIT, "offset": 0}
+        if path == "/v1/artists":
+            ids = query.get("ids", [""])[0].split(",")
+            return 200, {"artists": [self.catalog.by_id.get(spotify_id) for spotify_id in ids]}
+        return 404, {"error": {"status": 404, "message": "Not found"}}
+
+    def _musicbrainz(self, method, path, query):
+        if path != "/ws/2/artist":
+            return 404, {"error": "Not found"}
+        name = query.get("query", [""])[0].removeprefix("artist:")
+        artists = self.catalog.musicbrainz_search(name)
+        return 200, {"count": len(artists), "offset": 0, "artists": artists}
+
+    def _nominatim(self, method, path, query):
+        if path != "/search":
+            return 404, {"error": "Not found"}
+        return 200, self.catalog.nominatim_search(query.get("q", [""])[0])
@@ -0,0 +1,6 @@
+# Caches for tests that shouldn't depend on the database cache tables
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-default"},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-shared"},
+    "results": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-results"},
+}
@@ -0,0 +1,76 @@
+import io
+from unittest import mock
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from spotify_map.artist_cards import forget_cards, get_cards, hydrate, ranked_ids
+from spotify_map.models import Artists, UnmatchedArtists
+from spotify_map.tests import LOCMEM_CACHES
+
+
+def photo(url: str) -> dict:
+    return {"images": [{"url": url}]}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ArtistCardTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        Artists.objects.create(
+            spotify_id="alpha", name="Alpha", birth_date="1990-07-23", birth_location="Chicago",
+            birth_latitude=41.85, birth_longitude=-87.65, complete_artist_json=photo("https://example.com/alpha.jpg"),
+        )
+        now = timezone.now()
+        UnmatchedArtists.objects.create(spotify_id="bravo", name="Bravo", last_attempt=now, retry_after=now)
+        # Skipped while MusicBrainz was unavailable
+        UnmatchedArtists.objects.create(spotify_id="charlie", name="Charlie", attempts=0, last_attempt=now, retry_after=now)
+
+    def test_cards_are_built_from_the_database(self):
+        cards = get_cards(["alpha", "bravo", "charlie", "unknown"])
+        self.assertEqual(cards["alpha"], {
+            "spotify_id": "alpha", "name": "Alpha", "birth_latitude": 41.85, "birth_longitude": -87.65,
+            "birth_date": "1990-07-23", "birth_location": "Chicago", "photo": "https://example.com/alpha.jpg", "sign": "Leo",
+        })
+        self.assertEqual(cards["bravo"], {"spotify_id": "bravo", "name": "Bravo"})
+        self.assertEqual(cards["charlie"], {"spotify_id": "charlie", "name": "Charlie"})
+        self.assertNotIn("unknown", cards)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cards(["alpha", "bravo"]), {key: cards[key] for key in ["alpha", "bravo"]})
+
+    def test_forget_cards(self):
+        get_cards(["alpha"])
+        Artists.objects.filter(spotify_id="alpha").update(name="Alpha!")
+        self.assertEqual(get_cards(["alpha"])["alpha"]["name"], "Alpha")
+        forget_cards(["alpha"])
+        self.assertEqual(get_cards(["alpha"])["alpha"]["name"], "Alpha!")
+
+    def test_hydrate(self):
+        result = {
+            "st_artists": [{"spotify_id": "charlie"}, {"spotify_id": "alpha"}],
+            "mt_artists": [{"spotify_id": "bravo"}],
+            "lt_artists": [],
+        }
+        session_artists = ranked_ids(result)
+        self.assertEqual(session_artists, {"st_artists": ["charlie", "alpha"], "mt_artists": ["bravo"], "lt_artists": []})
+
+        hydrated = hydrate(session_artists)
+        self.assertEqual([(artist["spotify_id"], artist["rank"]) for artist in hydrated["st_artists"]], [("charlie", 1), ("alpha", 2)])
+        self.assertEqual(hydrated["mt_artists"], [{"spotify_id": "bravo", "name": "Bravo", "rank": 1}])
+        self.assertEqual(hydrate(session_artists, ["lt_artists"]), {"lt_artists": []})
+
+    def test_backfill_display_fields_forgets_cards(self):
+        get_cards(["alpha"])
+        Artists.objects.filter(spotify_id="alpha").update(birth_date="1990-01-01")
+        call_command("backfill_display_fields", stdout=io.StringIO())
+        self.assertEqual(get_cards(["alpha"])["alpha"]["sign"], "Capricorn")
+
+    @override_settings(SPOTIPY_CLIENT_ID="id", SPOTIPY_CLIENT_SECRET="secret")
+    def test_refresh_json_forgets_cards(self):
+        get_cards(["alpha"])
+        sp = mock.Mock()
+        sp.artists.return_value = {"artists": [photo("https://example.com/new.jpg")]}
+        with mock.patch("spotify_map.management.commands.refresh_json.get_app_spotify_client", return_value=sp):
+            call_command("refresh_json", "--all", stdout=io.StringIO())
+        self.assertEqual(get_cards(["alpha"])["alpha"]["photo"], "https://example.com/new.jpg")
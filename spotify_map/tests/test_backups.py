@@ -0,0 +1,87 @@
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from unittest import mock, skipUnless
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from spotify_map.backups import backup_database, load_manifest, restore_database
+from spotify_map.models import Artists, Coordinates
+from spotify_map.tests import LOCMEM_CACHES
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BackupRestoreTests(TransactionTestCase):
+    # Backups read and restore each table on its own thread and connection,
+    # so the rows have to be committed
+
+    def setUp(self):
+        backup_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(backup_dir.cleanup)
+        self.backup_dir = backup_dir.name
+
+    def create_rows(self):
+        Artists.objects.create(
+            spotify_id="a1", name="First", birth_latitude=41.85, birth_longitude=-87.65,
+            birth_date=date(1990, 7, 23), birth_location="Chicago, Illinois",
+            complete_artist_json={"images": [{"url": "https://example.com/a1.jpg"}]},
+        )
+        Artists.objects.create(spotify_id="a2", name="Second")
+        Coordinates.objects.create(location="Chicago, Illinois", latitude=41.85, longitude=-87.65)
+
+    def snapshot(self):
+        return (
+            list(Artists.objects.order_by("spotify_id").values()),
+            list(Coordinates.objects.order_by("location").values("location", "latitude", "longitude", "geohash", "updated_at")),
+        )
+
+    def test_round_trip(self):
+        self.create_rows()
+        before = self.snapshot()
+        entry = backup_database(self.backup_dir, rows_per_file=1, chunk_size=1)
+        self.assertEqual(entry["kind"], "full")
+        self.assertEqual(entry["tables"]["artists"]["rows"], 2)
+        self.assertEqual(len(entry["tables"]["artists"]["files"]), 2)
+
+        Artists.objects.all().delete()
+        Coordinates.objects.all().delete()
+        restored = restore_database(self.backup_dir)
+        self.assertEqual(restored[0]["restored"], {"artists": 2, "coordinates": 1})
+        # Including updated_at, so restored rows aren't backed up again
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(backup_database(self.backup_dir, incremental=True)["tables"]["artists"]["rows"], 0)
+
+    def test_incremental_round_trip(self):
+        self.create_rows()
+        backup_database(self.backup_dir)
+        artist = Artists.objects.get(spotify_id="a2")
+        artist.birth_date = date(1985, 1, 1)
+        artist.save()
+        entry = backup_database(self.backup_dir, incremental=True)
+        self.assertEqual(entry["kind"], "incremental")
+        self.assertEqual(entry["tables"]["artists"]["rows"], 1)
+        self.assertEqual(entry["tables"]["coordinates"]["rows"], 0)
+        before = self.snapshot()
+
+        Artists.objects.all().delete()
+        Coordinates.objects.all().delete()
+        restored = restore_database(self.backup_dir)
+        self.assertEqual(len(restored), 2)
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(Artists.objects.get(spotify_id="a2").zodiac_sign, "Capricorn")
+
+    def test_backups_in_the_same_second(self):
+        self.create_rows()
+        first = backup_database(self.backup_dir)
+        second = backup_database(self.backup_dir)
+        self.assertNotEqual(first["name"], second["name"])
+        self.assertEqual([backup["name"] for backup in load_manifest(Path(self.backup_dir))["backups"]], [first["name"], second["name"]])
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite only")
+    def test_sqlite_restores_one_table_at_a_time(self):
+        self.create_rows()
+        backup_database(self.backup_dir)
+        with mock.patch("spotify_map.backups.ThreadPoolExecutor", wraps=ThreadPoolExecutor) as executor:
+            restore_database(self.backup_dir)
+        self.assertEqual(executor.call_args.kwargs["max_workers"], 1)
+
@@ -0,0 +1,150 @@
+import random
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from spotify_map import catalog, geohash
+from spotify_map.catalog import InvalidQuery, artists_in_bbox
+from spotify_map.models import Artists, Coordinates
+
+
+class ArtistsInBboxTests(TestCase):
+    # (spotify_id, latitude, longitude)
+    ARTISTS = [
+        ("east", 10.0, 179.9),
+        ("west", 10.0, -179.9),
+        ("far_west", 10.0, -178.0),
+        ("elsewhere", 10.0, 0.0),
+        ("same_place_a", 41.85, -87.65),
+        ("same_place_b", 41.85, -87.65),
+        ("same_place_c", 41.85, -87.65),
+        ("north", 42.0, -87.7),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        for spotify_id, lat, lon in cls.ARTISTS:
+            Artists.objects.create(spotify_id=spotify_id, name=spotify_id, birth_latitude=lat, birth_longitude=lon)
+        Artists.objects.create(spotify_id="nowhere", name="nowhere")
+
+    def ids(self, artists: list) -> list:
+        return [artist["spotify_id"] for artist in artists]
+
+    def test_across_the_antimeridian(self):
+        artists, cursor = artists_in_bbox(5, 179, 15, -179)
+        self.assertEqual(self.ids(artists), ["west", "east"])
+        self.assertIsNone(cursor)
+
+    def test_pages(self):
+        # Ties on the coordinates are broken by spotify_id
+        pages = []
+        cursor = None
+        while True:
+            artists, cursor = artists_in_bbox(40, -90, 45, -85, limit=2, cursor=cursor)
+            pages.append(self.ids(artists))
+            if cursor is None:
+                break
+        self.assertEqual(pages, [["same_place_a", "same_place_b"], ["same_place_c", "north"]])
+
+    def test_invalid_queries(self):
+        with self.assertRaises(InvalidQuery):
+            artists_in_bbox(15, 0, 5, 10)
+        with self.assertRaises(InvalidQuery):
+            artists_in_bbox(0, 0, 10, 181)
+        with self.assertRaises(InvalidQuery):
+            artists_in_bbox(0, 0, 10, 10, limit=catalog.MAX_BBOX_RESULTS + 1)
+        with self.assertRaisesMessage(InvalidQuery, "Invalid cursor"):
+            artists_in_bbox(0, 0, 10, 10, cursor="not a cursor")
+
+
+class ArtistsInViewportTests(TestCase):
+    def setUp(self):
+        Artists.objects.create(spotify_id="chicago", name="Chicago", birth_latitude=41.85, birth_longitude=-87.65)
+        Artists.objects.create(spotify_id="evanston", name="Evanston", birth_latitude=42.05, birth_longitude=-87.69)
+        session = self.client.session
+        session["artists"] = {"st_artists": [], "mt_artists": [], "lt_artists": []}
+        session.save()
+        self.url = reverse("artists_in_viewport")
+
+    def test_pages(self):
+        bbox = {"south": 40, "west": -90, "north": 45, "east": -85}
+        first = self.client.get(self.url, {**bbox, "limit": 1}).json()
+        self.assertEqual([artist["name"] for artist in first["artists"]], ["Chicago"])
+        second = self.client.get(self.url, {**bbox, "limit": 1, "cursor": first["next"]}).json()
+        self.assertEqual([artist["name"] for artist in second["artists"]], ["Evanston"])
+        self.assertIsNone(second["next"])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(self.url, {"south": 40, "west": -90, "north": 45}).json(), {"error": "Missing parameter east"})
+        self.assertEqual(self.client.get(self.url, {"south": "x", "west": -90, "north": 45, "east": 0}).json(), {"error": "Invalid parameter"})
+        self.assertEqual(self.client.get(self.url, {"south": 50, "west": -90, "north": 45, "east": 0}).status_code, 400)
+
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get(self.url, {"south": 40, "west": -90, "north": 45, "east": 0}).status_code, 403)
+
+
+class RadiusSearchTests(TestCase):
+    # (spotify_id, latitude, longitude)
+    ARTISTS = [
+        ("east", 10.0, 179.9),
+        ("west", 10.0, -179.9),
+        ("far_west", 10.0, -178.0),
+        ("elsewhere", 10.0, 0.0),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        for spotify_id, lat, lon in cls.ARTISTS:
+            Artists.objects.create(spotify_id=spotify_id, name=spotify_id, birth_latitude=lat, birth_longitude=lon)
+            Coordinates.objects.create(location=spotify_id, latitude=lat, longitude=lon)
+
+    def brute_force(self, lat, lon):
+        return sorted((geohash.distance_km(lat, lon, a_lat, a_lon), spotify_id) for spotify_id, a_lat, a_lon in self.ARTISTS)
+
+    def test_artists_near(self):
+        for max_cells in [1, 4, catalog.COVERING_CELLS]:
+            with self.subTest(max_cells=max_cells):
+                artists = catalog.artists_near(10, 179.99, 100, max_cells=max_cells)
+                self.assertEqual([artist["spotify_id"] for artist in artists], ["east", "west"])
+                expected = [round(distance, 3) for distance, _ in self.brute_force(10, 179.99)[:2]]
+                self.assertEqual([artist["distance_km"] for artist in artists], expected)
+
+    def test_nearest_artists(self):
+        expected = [spotify_id for _, spotify_id in self.brute_force(10, -179.99)[:3]]
+        artists = catalog.nearest_artists(10, -179.99, 3)
+        self.assertEqual([artist["spotify_id"] for artist in artists], expected)
+
+    def test_nearest_coordinates(self):
+        hits = catalog.nearest_coordinates(10, 179.99, 2)
+        self.assertEqual([coordinates.location for coordinates, _ in hits], ["east", "west"])
+
+    def test_artists_near_limit(self):
+        artists = catalog.artists_near(10, 179.99, 1000, limit=2)
+        self.assertEqual([artist["spotify_id"] for artist in artists], ["east", "west"])
+
+
+class RadiusSearchLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        cls.points = [(f"artist{i:03}", rng.uniform(45, 55), rng.uniform(-5, 10)) for i in range(300)]
+        Artists.objects.bulk_create([
+            Artists(spotify_id=spotify_id, name=spotify_id, birth_latitude=lat, birth_longitude=lon, geohash=geohash.encode(lat, lon))
+            for spotify_id, lat, lon in cls.points
+        ])
+
+    def test_nearest_match_brute_force(self):
+        for lat, lon, k in [(50, 2, 1), (48.85, 2.35, 10), (52, 8, 25)]:
+            with self.subTest(lat=lat, lon=lon, k=k):
+                expected = sorted((geohash.distance_km(lat, lon, a_lat, a_lon), spotify_id) for spotify_id, a_lat, a_lon in self.points)[:k]
+                artists = catalog.nearest_artists(lat, lon, k)
+                self.assertEqual([artist["spotify_id"] for artist in artists], [spotify_id for _, spotify_id in expected])
+
+    def test_only_the_nearest_candidates_are_read(self):
+        limit = 5
+        with CaptureQueriesContext(connection) as queries:
+            hits = catalog._within_radius(Artists, "birth_latitude", "birth_longitude", 50, 2, 1000, catalog.COVERING_CELLS, limit)
+        self.assertEqual(len(hits), limit)
+        self.assertIn(f"LIMIT {limit * catalog.RADIUS_CANDIDATE_FACTOR + catalog.RADIUS_CANDIDATE_SLACK}", queries[0]["sql"])
+        expected = sorted(geohash.distance_km(50, 2, lat, lon) for _, lat, lon in self.points if geohash.distance_km(50, 2, lat, lon) <= 1000)[:limit]
+        self.assertEqual([distance for distance, _ in hits], expected)
@@ -0,0 +1,105 @@
+import json
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from spotify_map.clustering import MAX_ZOOM, cluster_points, clusters_at_zoom
+from spotify_map.models import Artists
+from spotify_map.tests import LOCMEM_CACHES
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ClusteringTests(SimpleTestCase):
+    # (name, rank, latitude, longitude)
+    ARTISTS = [
+        ("chicago", 3, 41.8781, -87.6298),
+        ("evanston", 1, 42.0451, -87.6877),
+        ("chicago_too", None, 41.8781, -87.6298),
+        ("milwaukee", 2, 43.0389, -87.9065),
+        ("london", 4, 51.5072, -0.1276),
+    ]
+
+    def points(self):
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                    "properties": {"name": name, "rank": rank},
+                }
+                for name, rank, lat, lon in self.ARTISTS
+            ],
+        }
+
+    def groups(self, clusters):
+        return sorted(sorted(artist["name"] for artist in feature["properties"]["artists"]) for feature in clusters["features"])
+
+    def test_clusters_per_zoom(self):
+        points = self.points()
+        self.assertEqual(self.groups(clusters_at_zoom(points, 0)), [
+            ["chicago", "chicago_too", "evanston", "milwaukee"], ["london"],
+        ])
+        self.assertEqual(self.groups(clusters_at_zoom(points, 6)), [
+            ["chicago", "chicago_too", "evanston"], ["london"], ["milwaukee"],
+        ])
+        self.assertEqual(self.groups(clusters_at_zoom(points, 10)), [
+            ["chicago", "chicago_too"], ["evanston"], ["london"], ["milwaukee"],
+        ])
+        self.assertEqual(self.groups(clusters_at_zoom(points, MAX_ZOOM)), [
+            ["chicago", "chicago_too"], ["evanston"], ["london"], ["milwaukee"],
+        ])
+
+    def test_every_zoom_keeps_every_artist(self):
+        points = self.points()
+        previous = 0
+        for zoom in range(MAX_ZOOM + 1):
+            with self.subTest(zoom=zoom):
+                features = clusters_at_zoom(points, zoom)["features"]
+                self.assertEqual(sum(feature["properties"]["count"] for feature in features), len(self.ARTISTS))
+                self.assertGreaterEqual(len(features), previous)
+                previous = len(features)
+
+    def test_cluster_properties(self):
+        clusters = cluster_points(self.points(), 0)
+        # Best ranked cluster first, and best ranked artists first within it
+        first = clusters["features"][0]["properties"]
+        self.assertEqual(first["count"], 4)
+        self.assertEqual([artist["name"] for artist in first["artists"]], ["evanston", "milwaukee", "chicago", "chicago_too"])
+        lon, lat = clusters["features"][0]["geometry"]["coordinates"]
+        self.assertTrue(41.8 < lat < 43.1 and -88 < lon < -87.6)
+
+    def test_zoom_is_clamped(self):
+        points = self.points()
+        self.assertEqual(clusters_at_zoom(points, -1), cluster_points(points, 0))
+        self.assertEqual(clusters_at_zoom(points, MAX_ZOOM + 5), cluster_points(points, MAX_ZOOM))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MapClustersViewTests(TestCase):
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        Artists.objects.create(spotify_id="chicago", name="Chicago", birth_latitude=41.8781, birth_longitude=-87.6298)
+        Artists.objects.create(spotify_id="evanston", name="Evanston", birth_latitude=42.0451, birth_longitude=-87.6877)
+        Artists.objects.create(spotify_id="london", name="London", birth_latitude=51.5072, birth_longitude=-0.1276)
+        session = self.client.session
+        session["artists"] = {"st_artists": ["london", "chicago", "evanston"], "mt_artists": [], "lt_artists": []}
+        session.save()
+
+    def counts(self, zoom: int) -> list:
+        response = self.client.get(reverse("map_clusters", args=["short", zoom]))
+        self.assertEqual(response["Content-Type"], "application/geo+json")
+        return sorted(feature["properties"]["count"] for feature in json.loads(response.content)["features"])
+
+    def test_clusters(self):
+        self.assertEqual(self.counts(0), [1, 2])
+        self.assertEqual(self.counts(MAX_ZOOM), [1, 1, 1])
+
+    def test_same_points_as_the_unclustered_geojson(self):
+        points = json.loads(self.client.get(reverse("map_geojson", args=["short"])).content)
+        clusters = json.loads(self.client.get(reverse("map_clusters", args=["short", 4])).content)
+        self.assertEqual(clusters, clusters_at_zoom(points, 4))
+
+    def test_not_logged_in(self):
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get(reverse("map_clusters", args=["short", 0])).status_code, 403)
@@ -0,0 +1,71 @@
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from spotify_map import coordinates
+from spotify_map.coordinates import UNRESOLVED_LOCATION_TTL, LRUCache, get_coords
+from spotify_map.models import Coordinates, UnresolvedLocations
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+
+class GetCoordsTests(TestCase):
+    def setUp(self):
+        coordinates._coords_cache.clear()
+        self.addCleanup(coordinates._coords_cache.clear)
+        patcher = mock.patch("spotify_map.coordinates.search_location")
+        self.search = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_found_locations_are_stored_and_remembered(self):
+        self.search.return_value = (41.85, -87.65)
+        self.assertEqual(get_coords("Chicago, Illinois"), (41.85, -87.65))
+        self.assertTrue(Coordinates.objects.filter(location="Chicago, Illinois").exists())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_coords("Chicago, Illinois"), (41.85, -87.65))
+        self.search.assert_called_once()
+
+    def test_stored_locations_are_remembered(self):
+        Coordinates.objects.create(location="Paris, France", latitude=48.85, longitude=2.35)
+        self.assertEqual(get_coords("Paris, France"), (48.85, 2.35))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_coords("Paris, France"), (48.85, 2.35))
+        self.search.assert_not_called()
+
+    def test_misses_are_remembered(self):
+        self.search.return_value = None
+        self.assertIsNone(get_coords("Nowhere"))
+        self.assertTrue(UnresolvedLocations.objects.filter(location="Nowhere").exists())
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_coords("Nowhere"))
+
+        # Other processes skip it too, from the database
+        coordinates._coords_cache.clear()
+        self.assertIsNone(get_coords("Nowhere"))
+        self.search.assert_called_once()
+
+    def test_misses_are_retried_once_expired(self):
+        UnresolvedLocations.objects.create(location="Atlantis", attempted_at=timezone.now() - UNRESOLVED_LOCATION_TTL * 2)
+        self.search.return_value = (0.0, 0.0)
+        self.assertEqual(get_coords("Atlantis"), (0.0, 0.0))
+        self.search.assert_called_once()
+        # Found now, so no longer unresolved
+        self.assertFalse(UnresolvedLocations.objects.filter(location="Atlantis").exists())
+
+    def test_remembered_misses_expire(self):
+        self.search.return_value = None
+        get_coords("Nowhere")
+        later = coordinates.time.monotonic() + UNRESOLVED_LOCATION_TTL.total_seconds() + 1
+        with mock.patch("spotify_map.coordinates.time.monotonic", return_value=later):
+            hit, _ = coordinates._cached_coords("Nowhere")
+        self.assertFalse(hit)
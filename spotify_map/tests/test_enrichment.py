@@ -0,0 +1,115 @@
+import threading
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from spotify_map.http_client import UpstreamUnavailable
+from spotify_map.models import Artists, UnmatchedArtists
+from spotify_map.musicbrainz import MUSICBRAINZ_MAX_WORKERS, enrich_new_artists, fetch_artists_info
+
+
+def spotify_artist(spotify_id: str) -> dict:
+    return {"spotify_id": spotify_id, "name": spotify_id.title(), "images": [{"url": f"https://example.com/{spotify_id}.jpg"}]}
+
+
+def musicbrainz_artist(name: str) -> dict:
+    return {
+        "name": name,
+        "life-span": {"begin": "1990-07-23"},
+        "begin-area": {"name": "Chicago"},
+        "area": {"name": "United States"},
+    }
+
+
+class EnrichmentTests(TestCase):
+    def setUp(self):
+        self.found = {"Alpha", "Bravo", "Charlie"}
+        patcher = mock.patch("spotify_map.musicbrainz.find_musicbrainz_artist", side_effect=self.find)
+        self.find_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("spotify_map.musicbrainz.get_coords", return_value=(41.85, -87.65))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def find(self, name):
+        return musicbrainz_artist(name) if name in self.found else None
+
+    def looked_up(self) -> list:
+        return sorted(call.args[0] for call in self.find_mock.call_args_list)
+
+    def test_each_distinct_artist_is_looked_up_once(self):
+        alpha, bravo, charlie, delta = [spotify_artist(i) for i in ["alpha", "bravo", "charlie", "delta"]]
+        result = fetch_artists_info([alpha, bravo], [bravo, charlie], [alpha, charlie, delta])
+
+        self.assertEqual(self.looked_up(), ["Alpha", "Bravo", "Charlie", "Delta"])
+        self.assertEqual([artist["spotify_id"] for artist in result["lt_artists"]], ["alpha", "charlie", "delta"])
+        self.assertEqual([artist["rank"] for artist in result["lt_artists"]], [1, 2, 3])
+        self.assertEqual(result["st_artists"][0], {**result["lt_artists"][0], "rank": 1})
+
+        alpha_info = result["st_artists"][0]
+        self.assertEqual(alpha_info["birth_location"], "Chicago, United States")
+        self.assertEqual(alpha_info["sign"], "Leo")
+        self.assertEqual(alpha_info["photo"], "https://example.com/alpha.jpg")
+        self.assertEqual(result["lt_artists"][2], {"spotify_id": "delta", "name": "Delta", "rank": 3})
+
+        self.assertEqual(set(Artists.objects.values_list("spotify_id", flat=True)), {"alpha", "bravo", "charlie"})
+        self.assertEqual(list(UnmatchedArtists.objects.values_list("spotify_id", flat=True)), ["delta"])
+
+    def test_stored_and_known_artists_are_not_looked_up(self):
+        Artists.objects.create(spotify_id="alpha", name="Alpha")
+        UnmatchedArtists.objects.create(spotify_id="delta", name="Delta", last_attempt="2026-01-01T00:00Z", retry_after="2026-01-02T00:00Z")
+        known = {"bravo": {"spotify_id": "bravo", "name": "Bravo", "sign": "Leo"}}
+
+        result = fetch_artists_info(
+            [spotify_artist("alpha"), spotify_artist("bravo")], [spotify_artist("charlie")], [spotify_artist("delta")],
+            known_artists=known,
+        )
+        self.assertEqual(self.looked_up(), ["Charlie"])
+        self.assertEqual(result["st_artists"][1], {**known["bravo"], "rank": 2})
+
+    def test_unavailable_artists_are_tried_again_next_time(self):
+        def find(name):
+            if name == "Bravo":
+                raise UpstreamUnavailable("musicbrainz.org unavailable (503)")
+            return self.find(name)
+        self.find_mock.side_effect = find
+
+        result = fetch_artists_info([spotify_artist("alpha"), spotify_artist("bravo")], [], [])
+        self.assertEqual(result["st_artists"][1], {"spotify_id": "bravo", "name": "Bravo", "rank": 2})
+        # Not stored, but remembered (with no attempts yet) so it's still shown
+        self.assertFalse(Artists.objects.filter(spotify_id="bravo").exists())
+        skipped = UnmatchedArtists.objects.get()
+        self.assertEqual((skipped.spotify_id, skipped.attempts), ("bravo", 0))
+        self.assertLessEqual(skipped.retry_after, timezone.now())
+
+        self.find_mock.side_effect = self.find
+        self.find_mock.reset_mock()
+        fetch_artists_info([spotify_artist("alpha"), spotify_artist("bravo")], [], [])
+        self.assertEqual(self.looked_up(), ["Bravo"])
+        self.assertTrue(Artists.objects.filter(spotify_id="bravo").exists())
+        self.assertFalse(UnmatchedArtists.objects.exists())
+
+    def test_miss_after_unavailable(self):
+        UnmatchedArtists.objects.create(spotify_id="delta", name="Delta", attempts=0, last_attempt=timezone.now(), retry_after=timezone.now())
+        fetch_artists_info([spotify_artist("delta")], [], [])
+        self.assertEqual(self.looked_up(), ["Delta"])
+        self.assertEqual(UnmatchedArtists.objects.get().attempts, 1)
+
+    def test_progress(self):
+        progress = mock.Mock()
+        fetch_artists_info([spotify_artist("alpha"), spotify_artist("bravo")], [spotify_artist("delta")], [], progress=progress)
+        calls = [call.args for call in progress.call_args_list]
+        self.assertEqual(calls[0], ("to_enrich", 3))
+        self.assertEqual(calls.count(("enriched",)), 3)
+        self.assertEqual(calls.count(("geocoded",)), 2)
+
+    def test_lookups_run_concurrently(self):
+        # Each lookup waits for the others; one at a time, they'd time out
+        barrier = threading.Barrier(MUSICBRAINZ_MAX_WORKERS, timeout=5)
+
+        def find(name):
+            barrier.wait()
+            return self.find(name)
+        self.find_mock.side_effect = find
+
+        artists = [spotify_artist(f"artist{i}") for i in range(MUSICBRAINZ_MAX_WORKERS)]
+        self.assertEqual(enrich_new_artists(artists), {artist["spotify_id"]: None for artist in artists})
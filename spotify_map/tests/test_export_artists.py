@@ -0,0 +1,69 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest import skipIf
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from spotify_map.management.commands import export_artists_to_csv
+from spotify_map.models import Artists
+
+
+class ExportArtistsTests(TestCase):
+    def setUp(self):
+        Artists.objects.create(
+            spotify_id="alpha", name="Alpha", birth_date="1990-07-23", birth_location="Paris",
+            birth_latitude=48.85, birth_longitude=2.35, complete_artist_json={"images": [{"url": "https://example.com/a.jpg"}]},
+        )
+        Artists.objects.create(spotify_id="bravo", name="Bravo", birth_location="Chicago")
+        Artists.objects.create(spotify_id="charlie", name="Charlie Alpha")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def export(self, *args, filename: str = "artists.csv") -> tuple[str, str]:
+        path = os.path.join(self.directory, filename)
+        out = io.StringIO()
+        call_command("export_artists_to_csv", *args, output=path, stdout=out)
+        return path, out.getvalue()
+
+    def read_csv(self, path: str, compressed: bool = False) -> list:
+        with (gzip.open(path, "rt", encoding="utf-8", newline="") if compressed else open(path, encoding="utf-8", newline="")) as file:
+            return list(csv.reader(file))
+
+    def test_default_columns_sorted_by_location(self):
+        path, out = self.export()
+        self.assertIn("Exported 3 artist(s)", out)
+        self.assertEqual(self.read_csv(path), [
+            ["spotify_id", "name", "birth_date", "birth_location"],
+            ["charlie", "Charlie Alpha", "", ""],
+            ["bravo", "Bravo", "", "Chicago"],
+            ["alpha", "Alpha", "1990-07-23", "Paris"],
+        ])
+
+    def test_name_filter_columns_and_gzip(self):
+        path, _ = self.export("alpha", "--gzip", "--columns=spotify_id,coordinates,complete_artist_json", filename="artists.csv.gz")
+        rows = self.read_csv(path, compressed=True)
+        self.assertEqual(rows[0], ["spotify_id", "birth_latitude", "birth_longitude", "complete_artist_json"])
+        self.assertEqual([row[0] for row in rows[1:]], ["charlie", "alpha"])
+        self.assertEqual(rows[2][1:3], ["48.85", "2.35"])
+        self.assertEqual(json.loads(rows[2][3]), {"images": [{"url": "https://example.com/a.jpg"}]})
+
+    def test_no_match(self):
+        path, out = self.export("nobody")
+        self.assertIn("No artists found matching 'nobody'", out)
+        self.assertFalse(os.path.exists(path))
+
+    def test_unknown_column(self):
+        with self.assertRaisesMessage(CommandError, "Unknown column 'password'"):
+            self.export("--columns=name,password")
+
+    @skipIf(export_artists_to_csv.pq is None, "pyarrow isn't installed")
+    def test_parquet(self):
+        path, _ = self.export("--format=parquet", "--columns=spotify_id,birth_date,birth_latitude", "--chunk-size=2", filename="artists.parquet")
+        table = export_artists_to_csv.pq.read_table(path)
+        self.assertEqual(table.column_names, ["spotify_id", "birth_date", "birth_latitude"])
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column("birth_latitude").to_pylist(), [None, None, 48.85])
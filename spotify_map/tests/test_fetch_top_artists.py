@@ -0,0 +1,67 @@
+import io
+import os
+import tempfile
+from unittest import mock
+import httpx
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from spotify_map.models import Artists
+from spotify_map.tests import LOCMEM_CACHES
+
+COMMAND = "spotify_map.management.commands.fetch_top_artists"
+
+
+def spotify_artist(spotify_id: str) -> dict:
+    return {"id": spotify_id, "name": spotify_id.title(), "images": [], "followers": {"total": 10}, "popularity": 50}
+
+
+def musicbrainz_response(name: str) -> httpx.Response:
+    return httpx.Response(200, json={"artists": [
+        {"name": name, "life-span": {"begin": "1990-07-23"}, "begin-area": {"name": "Chicago"}},
+    ]})
+
+
+# Worker threads use their own database connections
+@override_settings(CACHES=LOCMEM_CACHES, SPOTIPY_CLIENT_ID="id", SPOTIPY_CLIENT_SECRET="secret")
+class FetchTopArtistsTests(TransactionTestCase):
+    def setUp(self):
+        self.sp = mock.Mock()
+        self.sp.artists.side_effect = lambda ids: {"artists": [spotify_artist(spotify_id) for spotify_id in ids]}
+        for name, value in [
+            ("get_app_spotify_client", mock.Mock(return_value=self.sp)),
+            ("get_musicbrainz_index", mock.Mock(return_value=None)),
+            ("get_coords", mock.Mock(return_value=(41.85, -87.65))),
+            ("get", mock.Mock(side_effect=self.get)),
+        ]:
+            patcher = mock.patch(f"{COMMAND}.{name}", value)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def get(self, url):
+        if "Bravo" in url:
+            raise RuntimeError("boom")
+        return musicbrainz_response(url.split("artist:")[1].split("&")[0])
+
+    def run_command(self, spotify_ids: list, *args) -> str:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "top.csv")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write("id,name,followers,popularity\n")
+                file.writelines(f"{spotify_id},{spotify_id.title()},10,50\n" for spotify_id in spotify_ids)
+            out = io.StringIO()
+            with mock.patch("builtins.print"):
+                call_command("fetch_top_artists", path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_failed_artists_dont_stop_the_rest(self):
+        out = self.run_command(["alpha", "bravo", "charlie", "delta"], "--workers=2", "--flush-size=1")
+        self.assertIn("3 new artists added, 1 failed", out)
+        self.assertEqual(set(Artists.objects.values_list("spotify_id", flat=True)), {"alpha", "charlie", "delta"})
+        alpha = Artists.objects.get(spotify_id="alpha")
+        self.assertEqual((alpha.birth_location, alpha.zodiac_sign), ("Chicago", "Leo"))
+
+    def test_existing_artists_are_skipped(self):
+        Artists.objects.create(spotify_id="alpha", name="Alpha")
+        out = self.run_command(["alpha", "charlie"])
+        self.assertIn("1 new artists added, 0 failed. 1 were already in the database", out)
+        self.sp.artists.assert_called_once_with(["charlie"])
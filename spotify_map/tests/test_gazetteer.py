@@ -0,0 +1,129 @@
+import io
+import os
+import tempfile
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from spotify_map.gazetteer import INDEX_HEADER, Gazetteer
+
+
+class GazetteerTests(SimpleTestCase):
+    PLACES = {
+        "chicago|illinois": (41.85003, -87.65005),
+        "paris": (48.85341, 2.3488),
+        "paris|france": (48.85341, 2.3488),
+        "paris|texas": (33.66094, -95.55551),
+        "sao paulo": (-23.5475, -46.63611),
+        "zurich": (47.36667, 8.55),
+        # Non-ASCII keys sort after ASCII ones as UTF-8 bytes
+        "東京": (35.6895, 139.69171),
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        places = dict(cls.PLACES)
+        # Enough filler for the search to take several steps
+        for i in range(500):
+            places[f"town {i:03d}"] = (i / 10, -i / 10)
+        cls.places = places
+
+        fd, cls.path = tempfile.mkstemp(suffix=".idx")
+        with os.fdopen(fd, "wb") as file:
+            file.write(INDEX_HEADER)
+            lines = sorted((key.encode("utf-8"), b"%r\t%r" % coords) for key, coords in places.items())
+            file.writelines(b"%s\t%s\n" % line for line in lines)
+        cls.gazetteer = Gazetteer(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.gazetteer._mm.close()
+        os.remove(cls.path)
+        super().tearDownClass()
+
+    def test_every_key_is_found(self):
+        for key, coords in self.places.items():
+            with self.subTest(key=key):
+                self.assertEqual(self.gazetteer._find(key.encode("utf-8")).split(b"\t", 1)[0], key.encode("utf-8"))
+                self.assertEqual(self.gazetteer.lookup(key.replace("|", ", ")), coords)
+
+    def test_lookup_normalizes_names(self):
+        self.assertEqual(self.gazetteer.lookup("São Paulo"), self.PLACES["sao paulo"])
+        self.assertEqual(self.gazetteer.lookup("Paris,  TEXAS"), self.PLACES["paris|texas"])
+        self.assertEqual(self.gazetteer.lookup("Zürich"), self.PLACES["zurich"])
+
+    def test_missing_keys(self):
+        # Before the first key, between keys, a prefix of a key and after the last
+        for location in ["aaa", "paris, ontario", "pari", "town 0005", "zzz", "東京都", ""]:
+            with self.subTest(location=location):
+                self.assertIsNone(self.gazetteer.lookup(location))
+
+    def test_rejects_other_files(self):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as file:
+            file.write(b"paris\t48.85\t2.35\n")
+        self.addCleanup(os.remove, path)
+        with self.assertRaises(ValueError):
+            Gazetteer(path)
+
+
+def geonames_row(name, lat, lon, feature_class, feature_code, country, admin1, population):
+    return "\t".join([
+        "1", name, name, "", str(lat), str(lon), feature_class, feature_code, country, "", admin1, "", "", "", str(population),
+    ])
+
+
+class BuildGazetteerTests(SimpleTestCase):
+    PLACES = [
+        geonames_row("Paris", 48.85341, 2.3488, "P", "PPLC", "FR", "11", 2138551),
+        geonames_row("Paris", 33.66094, -95.55551, "P", "PPLA2", "US", "TX", 24782),
+        geonames_row("France", 46.0, 2.0, "A", "PCLI", "FR", "00", 66987244),
+        geonames_row("Texas", 31.25044, -99.25061, "A", "ADM1", "US", "TX", 22875689),
+        geonames_row("Georgia", 32.75042, -83.50018, "A", "ADM1", "US", "GA", 10519475),
+        geonames_row("Georgia", 42.0, 43.5, "A", "PCLI", "GE", "00", 3731000),
+        geonames_row("Zürich", 47.36667, 8.55, "P", "PPLA", "CH", "25", 341730),
+        # Not a place we index (a stream)
+        geonames_row("Paris Creek", 40.0, -90.0, "H", "STM", "US", "IL", 0),
+    ]
+    COUNTRIES = ["#ISO\tISO3\tISO-Numeric\tfips\tCountry", "FR\tFRA\t250\tFR\tFrance", "US\tUSA\t840\tUS\tUnited States",
+                 "GE\tGEO\t268\tGG\tGeorgia", "CH\tCHE\t756\tSZ\tSwitzerland"]
+    ADMIN1 = ["FR.11\tÎle-de-France\tIle-de-France\t3012874", "US.TX\tTexas\tTexas\t4736286", "US.GA\tGeorgia\tGeorgia\t4197000",
+              "CH.25\tZurich\tZurich\t2657895"]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.paths = {}
+        for name, lines in [("places", self.PLACES), ("countries", self.COUNTRIES), ("admin1", self.ADMIN1)]:
+            self.paths[name] = os.path.join(self.directory, f"{name}.txt")
+            with open(self.paths[name], "w", encoding="utf-8") as file:
+                file.write("\n".join(lines) + "\n")
+
+    def build(self, chunk_size) -> str:
+        output = os.path.join(self.directory, f"gazetteer-{chunk_size}.idx")
+        call_command(
+            "build_gazetteer", self.paths["places"], country_info=self.paths["countries"], admin1=self.paths["admin1"],
+            output=output, chunk_size=chunk_size, stdout=io.StringIO(),
+        )
+        return output
+
+    def test_lookups(self):
+        gazetteer = Gazetteer(self.build(1000))
+        self.addCleanup(gazetteer._mm.close)
+        # The most populous city, unless it's a country or state name
+        self.assertEqual(gazetteer.lookup("Paris"), (48.8534, 2.3488))
+        self.assertEqual(gazetteer.lookup("Paris, Texas"), (33.6609, -95.5555))
+        self.assertEqual(gazetteer.lookup("Paris, Texas, United States"), (33.6609, -95.5555))
+        self.assertEqual(gazetteer.lookup("Georgia"), (42.0, 43.5))
+        self.assertEqual(gazetteer.lookup("Georgia, United States"), (32.7504, -83.5002))
+        self.assertEqual(gazetteer.lookup("Zurich, Switzerland"), (47.3667, 8.55))
+        self.assertIsNone(gazetteer.lookup("Paris Creek"))
+
+    def test_external_sort_matches_in_memory_build(self):
+        # With two keys per run, every key is merged from several runs
+        with open(self.build(1000), "rb") as in_memory, open(self.build(2), "rb") as external:
+            self.assertEqual(in_memory.read(), external.read())
+        # Run files are cleaned up
+        self.assertEqual(sorted(os.listdir(self.directory)), [
+            "admin1.txt", "countries.txt", "gazetteer-1000.idx", "gazetteer-2.idx", "places.txt",
+        ])
@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase
+from spotify_map import geohash
+
+
+class GeohashTests(SimpleTestCase):
+    def test_radius_bbox_across_antimeridian(self):
+        south, west, north, east = geohash.radius_bbox(10, 179.9, 100)
+        self.assertGreater(west, east)
+        self.assertLess(west, 179.9)
+        self.assertGreater(east, -180)
+        self.assertLess(south, 10)
+        self.assertGreater(north, 10)
+
+    def test_covering_cells_across_antimeridian(self):
+        bbox = geohash.radius_bbox(10, 179.9, 100)
+        cells = geohash.covering_cells(*bbox, max_cells=16)
+        self.assertLessEqual(len(cells), 16)
+        # Points on both sides of the antimeridian, and in each corner, are
+        # inside a covering cell
+        south, west, north, east = bbox
+        for lat, lon in [(10, 179.95), (10, -179.95), (south, west), (south, east), (north, west), (north, east)]:
+            with self.subTest(lat=lat, lon=lon):
+                point = geohash.encode(lat, lon)
+                self.assertTrue(any(point.startswith(cell) for cell in cells))
+
+    def test_covering_cells_too_big(self):
+        self.assertIsNone(geohash.covering_cells(-80, -170, 80, 170, max_cells=4))
+
+    def test_cell_range(self):
+        self.assertEqual(geohash.cell_range("dp3"), ("dp3", "dp4"))
+        self.assertEqual(geohash.cell_range("dpz"), ("dpz", "dq"))
+        self.assertEqual(geohash.cell_range("zz"), ("zz", None))
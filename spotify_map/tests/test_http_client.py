@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest import mock
+import httpx
+from django.test import SimpleTestCase
+from spotify_map import http_client
+from spotify_map.http_client import (
+    MAX_RETRIES, MAX_RETRY_WAIT, UpstreamUnavailable, aget, async_client_scope, get, get_async_client, retry_delay,
+)
+
+URL = "https://api.example.com/artists"
+
+
+class HttpClientTests(SimpleTestCase):
+    def setUp(self):
+        self.responses = []
+        self.requests = []
+        transport = httpx.MockTransport(self.handle)
+        patcher = mock.patch("spotify_map.http_client.get_client", return_value=httpx.Client(transport=transport))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("spotify_map.http_client.time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        http_client.reset_latency_stats()
+
+    def handle(self, request):
+        self.requests.append(request)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def sleeps(self) -> list:
+        return [call.args[0] for call in self.sleep.call_args_list]
+
+    def test_success(self):
+        self.responses = [httpx.Response(200, json={"ok": True})]
+        self.assertEqual(get(URL).json(), {"ok": True})
+        self.assertEqual(self.sleeps(), [])
+        self.assertEqual(http_client.latency_stats()["api.example.com"]["count"], 1)
+
+    def test_client_errors_are_not_retried(self):
+        self.responses = [httpx.Response(404)]
+        self.assertEqual(get(URL).status_code, 404)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_failures_are_retried_with_backoff(self):
+        self.responses = [httpx.Response(503), httpx.Response(502), httpx.ConnectError("refused"), httpx.Response(200)]
+        self.assertEqual(get(URL).status_code, 200)
+        self.assertEqual(self.sleeps(), [0.5, 1.0, 2.0])
+
+    def test_retry_after_seconds(self):
+        self.responses = [httpx.Response(429, headers={"Retry-After": "3"}), httpx.Response(200)]
+        self.assertEqual(get(URL).status_code, 200)
+        self.assertEqual(self.sleeps(), [3.0])
+
+    def test_retry_after_date(self):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=10)
+        self.responses = [httpx.Response(503, headers={"Retry-After": format_datetime(retry_at, usegmt=True)}), httpx.Response(200)]
+        get(URL)
+        self.assertAlmostEqual(self.sleeps()[0], 10, delta=1.5)
+
+    def test_long_retry_after_gives_up(self):
+        self.responses = [httpx.Response(429, headers={"Retry-After": str(MAX_RETRY_WAIT + 1)})]
+        with self.assertRaises(UpstreamUnavailable):
+            get(URL)
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.sleeps(), [])
+
+    def test_gives_up_after_max_retries(self):
+        self.responses = [httpx.Response(503)] * (MAX_RETRIES + 1)
+        with self.assertRaisesMessage(UpstreamUnavailable, "api.example.com unavailable (503)"):
+            get(URL)
+        self.assertEqual(len(self.requests), MAX_RETRIES + 1)
+        self.assertEqual(self.sleeps(), [0.5, 1.0, 2.0, 4.0])
+
+    def test_retry_delay(self):
+        self.assertEqual(retry_delay(None, 2), 2.0)
+        self.assertEqual(retry_delay(httpx.Response(503, headers={"Retry-After": "-5"}), 0), 0.0)
+        self.assertEqual(retry_delay(httpx.Response(503, headers={"Retry-After": "soon"}), 1), 1.0)
+
+
+
+
+class AsyncHttpClientTests(SimpleTestCase):
+    def setUp(self):
+        self.responses = []
+        patcher = mock.patch("spotify_map.http_client.asyncio.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def handle(self, request):
+        return self.responses.pop(0)
+
+    def aget(self, url):
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(self.handle)) as client:
+                with mock.patch("spotify_map.http_client.get_async_client", return_value=client):
+                    return await aget(url)
+        return asyncio.run(run())
+
+    def test_retry_after(self):
+        self.responses = [httpx.Response(429, headers={"Retry-After": "2"}), httpx.Response(503), httpx.Response(200)]
+        self.assertEqual(self.aget(URL).status_code, 200)
+        self.assertEqual([call.args[0] for call in self.sleep.call_args_list], [2.0, 1.0])
+
+    def test_gives_up_after_max_retries(self):
+        self.responses = [httpx.Response(500)] * (MAX_RETRIES + 1)
+        with self.assertRaises(UpstreamUnavailable):
+            self.aget(URL)
+        self.assertEqual(self.responses, [])
+
+
+class AsyncClientScopeTests(SimpleTestCase):
+    def test_client_is_closed_with_its_loop(self):
+        async def run():
+            async with async_client_scope():
+                client = get_async_client()
+                self.assertIs(get_async_client(), client)
+            self.assertTrue(client.is_closed)
+            # A new one if the loop carries on
+            self.assertIsNot(get_async_client(), client)
+            async with async_client_scope():
+                pass
+            return client
+
+        asyncio.run(run())
+        self.assertEqual(len(http_client._async_clients), 0)
+
+    def test_no_client(self):
+        async def run():
+            async with async_client_scope():
+                pass
+        asyncio.run(run())
+
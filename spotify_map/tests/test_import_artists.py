@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from spotify_map.bulk import bulk_upsert
+from spotify_map.models import Artists, Coordinates
+from spotify_map.tests import LOCMEM_CACHES
+
+COLUMNS = ["spotify_id", "name", "birth_date", "birth_location", "complete_artist_json"]
+
+
+def row(spotify_id: str, birth_date: str = "", birth_location: str = "", photo: str = None) -> list:
+    artist_json = json.dumps({"images": [{"url": photo}]}) if photo else ""
+    return [spotify_id, spotify_id.title(), birth_date, birth_location, artist_json]
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkImportTests(TestCase):
+    def setUp(self):
+        Coordinates.objects.create(location="Chicago", latitude=41.85, longitude=-87.65)
+        patcher = mock.patch("spotify_map.management.commands.import_artists_from_csv.get_coords", return_value=None)
+        self.get_coords = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def import_rows(self, rows: list, batch_size: int = 1000) -> str:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "artists.csv")
+            with open(path, "w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                writer.writerow(COLUMNS)
+                writer.writerows(rows)
+            out = io.StringIO()
+            call_command("import_artists_from_csv", path, "--bulk", f"--batch-size={batch_size}", stdout=out)
+        return out.getvalue()
+
+    def test_creates_and_updates(self):
+        Artists.objects.create(spotify_id="alpha", name="Old name")
+        out = self.import_rows([
+            row("alpha", "1990-07-23", "Chicago", photo="https://example.com/alpha.jpg"),
+            row("bravo", "1990-01-01", "Nowhere"),
+            row("charlie", "1990-02-30"),
+        ], batch_size=2)
+        self.assertIn("1 created, 1 updated, 1 errors", out)
+        self.assertIn("2 distinct locations geocoded, 1 not found", out)
+        self.get_coords.assert_called_once_with("Nowhere")
+
+        alpha = Artists.objects.get(spotify_id="alpha")
+        self.assertEqual(alpha.name, "Alpha")
+        self.assertEqual((alpha.birth_latitude, alpha.birth_longitude), (41.85, -87.65))
+        self.assertEqual(alpha.zodiac_sign, "Leo")
+        self.assertEqual(alpha.photo_url, "https://example.com/alpha.jpg")
+        self.assertIsNotNone(alpha.geohash)
+        self.assertFalse(Artists.objects.filter(spotify_id="charlie").exists())
+
+    def test_rows_without_json_keep_the_stored_json(self):
+        Artists.objects.create(spotify_id="alpha", name="Alpha", complete_artist_json={"images": [{"url": "https://example.com/alpha.jpg"}]})
+        self.import_rows([row("alpha", "1990-07-23")])
+        alpha = Artists.objects.get(spotify_id="alpha")
+        self.assertEqual(alpha.complete_artist_json, {"images": [{"url": "https://example.com/alpha.jpg"}]})
+        self.assertEqual(alpha.photo_url, "https://example.com/alpha.jpg")
+        self.assertEqual(alpha.zodiac_sign, "Leo")
+
+    def test_failed_batch_is_written_row_by_row(self):
+        def upsert(model, objs, *args, **kwargs):
+            if any(artist.spotify_id == "bravo" for artist in objs):
+                raise IntegrityError("bad row")
+            return bulk_upsert(model, objs, *args, **kwargs)
+
+        with mock.patch("spotify_map.management.commands.import_artists_from_csv.bulk_upsert", side_effect=upsert):
+            out = self.import_rows([row("alpha"), row("bravo"), row("charlie")])
+        self.assertIn("writing it row by row", out)
+        self.assertIn("2 created, 0 updated, 1 errors", out)
+        self.assertEqual(set(Artists.objects.values_list("spotify_id", flat=True)), {"alpha", "charlie"})
@@ -0,0 +1,179 @@
+import time
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from spotify_map import jobs
+from spotify_map.jobs import (
+    JOB_QUEUE_TIMEOUT, JOB_RETENTION, JOB_STALE_AFTER, STALE_JOB_ERROR, claim_job, claim_next_job, clean_up_jobs,
+    enqueue_loading_job, expire_stale_jobs, is_stale, run_loading_job,
+)
+from spotify_map.models import LoadingJobs
+from spotify_map.tests import LOCMEM_CACHES
+
+
+def ago(seconds: float):
+    return timezone.now() - timedelta(seconds=seconds)
+
+
+def set_updated_at(job: LoadingJobs, seconds_ago: float):
+    # updated_at is auto_now, so save() can't set it
+    LoadingJobs.objects.filter(pk=job.pk).update(updated_at=ago(seconds_ago))
+
+
+RANKINGS = {
+    "st_artists": [{"spotify_id": "alpha", "name": "Alpha"}, {"spotify_id": "bravo", "name": "Bravo"}],
+    "mt_artists": [{"spotify_id": "bravo", "name": "Bravo"}],
+    "lt_artists": [],
+}
+
+
+def fake_fetch_artists_info(st_artists, mt_artists, lt_artists, progress=None, known_artists=None):
+    progress("to_enrich", 2)
+    progress("enriched")
+    progress("enriched")
+    progress("geocoded")
+    return {
+        key: [{"spotify_id": artist["spotify_id"], "name": artist["name"], "sign": "Leo", "rank": i + 1} for i, artist in enumerate(artists)]
+        for key, artists in [("st_artists", st_artists), ("mt_artists", mt_artists), ("lt_artists", lt_artists)]
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RunLoadingJobTests(TestCase):
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        for name, value in [
+            ("get_spotify_client", mock.Mock()),
+            ("fetch_all_top_artists", mock.Mock(return_value=("user1", {"alpha": {}, "bravo": {}}, RANKINGS))),
+            ("fetch_artists_info", mock.Mock(side_effect=fake_fetch_artists_info)),
+            # It would close the test's connection, which is in a transaction
+            ("close_old_connections", mock.Mock()),
+        ]:
+            patcher = mock.patch(f"spotify_map.jobs.{name}", value)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def new_job(self) -> LoadingJobs:
+        job = LoadingJobs.objects.create(token_info={"access_token": "token"})
+        self.assertTrue(claim_job(job.pk))
+        return LoadingJobs.objects.get(pk=job.pk)
+
+    def test_done(self):
+        job = self.new_job()
+        run_loading_job(job)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, LoadingJobs.DONE)
+        self.assertIsNone(job.token_info)
+        self.assertEqual(job.result, {"st_artists": ["alpha", "bravo"], "mt_artists": ["bravo"], "lt_artists": []})
+        self.assertEqual(job.progress(), {
+            "status": LoadingJobs.DONE, "artists_fetched": 2, "artists_to_enrich": 2, "artists_enriched": 2, "artists_geocoded": 1,
+        })
+
+    def test_failed(self):
+        self.fetch_all_top_artists.side_effect = RuntimeError("Spotify is down")
+        job = self.new_job()
+        with mock.patch("traceback.print_exc"):
+            run_loading_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, LoadingJobs.FAILED)
+        self.assertIn("Spotify is down", job.error)
+        self.assertIsNone(job.token_info)
+
+
+class JobQueueTests(TestCase):
+    @override_settings(LOADING_JOBS_IN_PROCESS=False)
+    def test_enqueue_and_claim(self):
+        first = enqueue_loading_job({"access_token": "first"})
+        second = enqueue_loading_job({"access_token": "second"})
+        self.assertEqual(first.status, LoadingJobs.QUEUED)
+
+        self.assertEqual(claim_next_job().pk, first.pk)
+        self.assertFalse(claim_job(first.pk))
+        self.assertEqual(claim_next_job().pk, second.pk)
+        self.assertIsNone(claim_next_job())
+
+    def test_is_stale(self):
+        self.assertFalse(is_stale(LoadingJobs.RUNNING, ago(JOB_STALE_AFTER - 10)))
+        self.assertTrue(is_stale(LoadingJobs.RUNNING, ago(JOB_STALE_AFTER + 10)))
+        self.assertFalse(is_stale(LoadingJobs.QUEUED, ago(JOB_STALE_AFTER + 10)))
+        self.assertTrue(is_stale(LoadingJobs.QUEUED, ago(JOB_QUEUE_TIMEOUT + 10)))
+        self.assertFalse(is_stale(LoadingJobs.DONE, ago(JOB_RETENTION)))
+
+    def test_expire_stale_jobs(self):
+        running = LoadingJobs.objects.create(status=LoadingJobs.RUNNING, token_info={"access_token": "token"})
+        alive = LoadingJobs.objects.create(status=LoadingJobs.RUNNING)
+        queued = LoadingJobs.objects.create(status=LoadingJobs.QUEUED)
+        lost = LoadingJobs.objects.create(status=LoadingJobs.QUEUED)
+        set_updated_at(running, JOB_STALE_AFTER + 10)
+        set_updated_at(queued, JOB_STALE_AFTER + 10)
+        set_updated_at(lost, JOB_QUEUE_TIMEOUT + 10)
+
+        self.assertEqual(expire_stale_jobs(alive.pk), 0)
+        self.assertEqual(expire_stale_jobs(), 2)
+        statuses = dict(LoadingJobs.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {
+            running.pk: LoadingJobs.FAILED, alive.pk: LoadingJobs.RUNNING,
+            queued.pk: LoadingJobs.QUEUED, lost.pk: LoadingJobs.FAILED,
+        })
+        running.refresh_from_db()
+        self.assertEqual(running.error, STALE_JOB_ERROR)
+        self.assertIsNone(running.token_info)
+
+    def test_clean_up_jobs(self):
+        old = LoadingJobs.objects.create(status=LoadingJobs.DONE)
+        recent = LoadingJobs.objects.create(status=LoadingJobs.FAILED)
+        set_updated_at(old, JOB_RETENTION + 10)
+        clean_up_jobs()
+        self.assertEqual(list(LoadingJobs.objects.values_list("pk", flat=True)), [recent.pk])
+
+
+class HeartbeatTests(SimpleTestCase):
+    @mock.patch("spotify_map.jobs.JOB_HEARTBEAT_INTERVAL", 0.01)
+    @mock.patch("spotify_map.jobs.update_job")
+    def test_touches_the_job_until_done(self, update_job):
+        with jobs._heartbeat(42):
+            time.sleep(0.1)
+        time.sleep(0.02)
+        beats = update_job.call_count
+        self.assertGreater(beats, 2)
+        update_job.assert_called_with(42)
+
+        time.sleep(0.05)
+        self.assertEqual(update_job.call_count, beats)
+
+
+class CheckLoadingStatusTests(TestCase):
+    def start(self, job: LoadingJobs):
+        session = self.client.session
+        session["loading_job"] = job.pk
+        session.save()
+
+    def test_progress(self):
+        job = LoadingJobs.objects.create(status=LoadingJobs.RUNNING, artists_fetched=10)
+        self.start(job)
+        response = self.client.get(reverse("check_loading_status")).json()
+        self.assertFalse(response["loading_complete"])
+        self.assertEqual(response["progress"]["artists_fetched"], 10)
+
+    def test_done(self):
+        result = {"st_artists": ["alpha"], "mt_artists": [], "lt_artists": []}
+        job = LoadingJobs.objects.create(status=LoadingJobs.DONE, result=result)
+        self.start(job)
+        self.assertEqual(self.client.get(reverse("check_loading_status")).json(), {"loading_complete": True})
+        self.assertEqual(self.client.session["artists"], result)
+        self.assertFalse(LoadingJobs.objects.exists())
+
+    def test_stale_job_fails(self):
+        job = LoadingJobs.objects.create(status=LoadingJobs.RUNNING)
+        set_updated_at(job, JOB_STALE_AFTER + 10)
+        self.start(job)
+        response = self.client.get(reverse("check_loading_status")).json()
+        self.assertFalse(response["loading_complete"])
+        self.assertIn("error", response)
+        job.refresh_from_db()
+        self.assertEqual(job.status, LoadingJobs.FAILED)
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from spotify_map.jobs import JOB_STALE_AFTER, STALE_JOB_ERROR
+from spotify_map.models import LoadingJobs
+
+RESULT = {"st_artists": ["alpha"], "mt_artists": [], "lt_artists": []}
+
+
+@mock.patch("spotify_map.views.LOADING_EVENTS_INTERVAL", 0)
+class LoadingEventsTests(TestCase):
+    async def start(self, job: LoadingJobs = None, **values):
+        session = await self.async_client.asession()
+        if job:
+            session["loading_job"] = job.pk
+        session.update(values)
+        await session.asave()
+
+    async def events(self) -> list:
+        response = await self.async_client.get(reverse("loading_events"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        if response.streaming:
+            body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        else:
+            body = response.content.decode()
+        return [message.splitlines()[0].removeprefix("event: ") for message in body.split("\n\n") if message]
+
+    async def test_progress_then_complete(self):
+        job = await LoadingJobs.objects.acreate(status=LoadingJobs.RUNNING, artists_fetched=10)
+        await self.start(job)
+        updates = iter([
+            {"artists_enriched": 1},
+            {},  # Unchanged, so no event
+            {"status": LoadingJobs.DONE, "result": RESULT},
+        ])
+
+        async def sleep(seconds):
+            update = next(updates)
+            if update:
+                await LoadingJobs.objects.filter(pk=job.pk).aupdate(updated_at=timezone.now(), **update)
+
+        with mock.patch("spotify_map.views.asyncio.sleep", side_effect=sleep):
+            self.assertEqual(await self.events(), ["progress", "progress", "complete"])
+
+        session = await self.async_client.asession()
+        self.assertEqual(await session.aget("artists"), RESULT)
+        self.assertIsNone(await session.aget("loading_job"))
+        self.assertFalse(await LoadingJobs.objects.aexists())
+
+    async def test_failed(self):
+        job = await LoadingJobs.objects.acreate(status=LoadingJobs.FAILED, error="Spotify is down")
+        await self.start(job)
+        self.assertEqual(await self.events(), ["failed"])
+
+    async def test_stale_job_fails(self):
+        job = await LoadingJobs.objects.acreate(status=LoadingJobs.RUNNING)
+        await self.start(job)
+        await LoadingJobs.objects.filter(pk=job.pk).aupdate(updated_at=timezone.now() - timedelta(seconds=JOB_STALE_AFTER + 10))
+        self.assertEqual(await self.events(), ["failed"])
+        await job.arefresh_from_db()
+        self.assertEqual(job.error, STALE_JOB_ERROR)
+
+    async def test_already_complete(self):
+        await self.start(loading_complete=True)
+        self.assertEqual(await self.events(), ["complete"])
+
+    async def test_no_job(self):
+        response = await self.async_client.get(reverse("loading_events"))
+        self.assertEqual(response.status_code, 404)
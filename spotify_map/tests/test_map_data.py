@@ -0,0 +1,83 @@
+import gzip
+import json
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from spotify_map import map_data
+from spotify_map.map_data import _pick_encoding, artists_geojson
+from spotify_map.models import Artists, UnmatchedArtists
+from spotify_map.tests import LOCMEM_CACHES
+
+
+class PickEncodingTests(SimpleTestCase):
+    def test_pick_encoding(self):
+        self.assertEqual(_pick_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(_pick_encoding("gzip;q=0, identity"))
+        self.assertIsNone(_pick_encoding(""))
+        expected = "br" if map_data.brotli else "gzip"
+        self.assertEqual(_pick_encoding("gzip;q=0.5, br"), expected)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MapGeojsonTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        Artists.objects.create(spotify_id="alpha", name="Alpha", birth_latitude=41.85, birth_longitude=-87.65, birth_location="Chicago")
+        Artists.objects.create(spotify_id="bravo", name="Bravo")
+        UnmatchedArtists.objects.create(spotify_id="charlie", name="Charlie", last_attempt="2026-01-01T00:00Z", retry_after="2026-01-02T00:00Z")
+        session = self.client.session
+        session["artists"] = {"st_artists": ["bravo", "alpha", "charlie"], "mt_artists": [], "lt_artists": []}
+        session.save()
+        self.url = reverse("map_geojson", args=["short"])
+
+    def test_features(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/geo+json")
+        self.assertEqual(json.loads(response.content), {"type": "FeatureCollection", "features": [{
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [-87.65, 41.85]},
+            "properties": {"id": "alpha", "name": "Alpha", "location": "Chicago", "rank": 2},
+        }]})
+        self.assertEqual(json.loads(self.client.get(reverse("map_geojson", args=["long"])).content)["features"], [])
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+        etag = response["ETag"]
+
+        not_modified = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], etag)
+
+        # A different birthplace changes the data, so the ETag no longer matches
+        Artists.objects.filter(spotify_id="alpha").update(birth_latitude=48.85)
+        caches["shared"].clear()
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": etag}).status_code, 200)
+
+    def test_gzip(self):
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        # An ETag for one encoding revalidates the other
+        etag = response["ETag"]
+        self.assertNotEqual(etag, plain["ETag"])
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": etag}).status_code, 304)
+
+    def test_not_logged_in_and_unknown_time_range(self):
+        self.assertEqual(self.client.get(reverse("map_geojson", args=["forever"])).status_code, 404)
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class ArtistsGeojsonTests(SimpleTestCase):
+    def test_skips_artists_without_coordinates(self):
+        geojson = artists_geojson([
+            {"spotify_id": "alpha", "name": "Alpha", "birth_latitude": 0.0, "birth_longitude": 0.0, "rank": 1},
+            {"spotify_id": "bravo", "name": "Bravo", "birth_latitude": 10.0, "rank": 2},
+        ])
+        self.assertEqual([feature["properties"]["id"] for feature in geojson["features"]], ["alpha"])
+        self.assertIsNone(geojson["features"][0]["properties"]["location"])
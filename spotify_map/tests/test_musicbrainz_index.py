@@ -0,0 +1,78 @@
+import gzip
+import io
+import json
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+import httpx
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from spotify_map.musicbrainz import find_musicbrainz_artist, match_search_results
+from spotify_map.musicbrainz_index import MusicBrainzIndex, completeness
+
+BARE = {"name": "Prince"}
+BORN = {"name": "Prince", "life-span": {"begin": "1958-06-07"}}
+FULL = {"name": "Prince", "life-span": {"begin": "1958-06-07"}, "begin-area": {"name": "Minneapolis"}, "area": {"name": "United States"}}
+FULL_TOO = {**FULL, "begin-area": {"name": "St. Paul"}}
+
+
+class MatchSearchResultsTests(SimpleTestCase):
+    def match(self, name: str, artists: list, status: int = 200):
+        return match_search_results(name, httpx.Response(status, json={"artists": artists}))
+
+    def test_completeness(self):
+        self.assertEqual(completeness(BARE), 0)
+        self.assertEqual(completeness(BORN), 1)
+        self.assertEqual(completeness(FULL), 3)
+        self.assertEqual(completeness({"name": "Prince", "life-span": None, "area": {"name": ""}}), 0)
+
+    def test_most_complete_match_wins(self):
+        # Results come best scored first; that only breaks ties
+        self.assertEqual(self.match("prince", [BARE, BORN, FULL, FULL_TOO]), FULL)
+        self.assertEqual(self.match("Prince", [{**FULL, "name": "Princess"}, BORN]), BORN)
+
+    def test_no_match(self):
+        self.assertIsNone(self.match("Prince", [{"name": "Princess"}]))
+        self.assertIsNone(self.match("Prince", [FULL], status=503))
+
+
+class MusicBrainzIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        dump = os.path.join(cls.directory.name, "artist.gz")
+        with gzip.open(dump, "wt", encoding="utf-8") as file:
+            for artist in [BARE, BORN, FULL, FULL_TOO, {"name": "Other", "area": {"name": "France"}}]:
+                file.write(json.dumps(artist) + "\n")
+            file.write("not json\n")
+        cls.path = os.path.join(cls.directory.name, "index.sqlite3")
+        call_command("build_musicbrainz_index", dump, output=cls.path, batch_size=2, stdout=io.StringIO())
+        cls.index = MusicBrainzIndex(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def test_lookup_picks_the_most_complete_then_the_first(self):
+        self.assertEqual(self.index.lookup(" PRINCE "), FULL)
+        self.assertEqual(self.index.lookup("other"), {"name": "Other", "area": {"name": "France"}})
+        self.assertIsNone(self.index.lookup("Nobody"))
+
+    def test_rejects_other_files(self):
+        other = os.path.join(self.directory.name, "other.sqlite3")
+        sqlite3.connect(other).close()
+        with self.assertRaises(ValueError):
+            MusicBrainzIndex(other)
+
+    def test_index_is_checked_before_the_api(self):
+        with mock.patch("spotify_map.musicbrainz.get_musicbrainz_index", return_value=self.index), \
+                mock.patch("spotify_map.musicbrainz.get") as get:
+            self.assertEqual(find_musicbrainz_artist("Prince"), FULL)
+            get.assert_not_called()
+
+            get.return_value = httpx.Response(200, json={"artists": [{"name": "Nobody", "area": {"name": "Peru"}}]})
+            self.assertEqual(find_musicbrainz_artist("Nobody"), {"name": "Nobody", "area": {"name": "Peru"}})
+            get.assert_called_once()
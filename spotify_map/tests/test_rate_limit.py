@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from spotify_map.rate_limit import RateLimiter
+from spotify_map.tests import LOCMEM_CACHES
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("spotify_map.rate_limit.time")
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reserve_at(self, limiter, now):
+        self.time.time.return_value = now
+        return limiter.reserve()
+
+    def test_requests_are_spaced(self):
+        limiter = RateLimiter("spacing.test", rate=1)
+        self.assertEqual(self.reserve_at(limiter, 1000.0), 0)
+        self.assertAlmostEqual(self.reserve_at(limiter, 1000.0), 1.0)
+        self.assertAlmostEqual(self.reserve_at(limiter, 1000.5), 1.5)
+        # Once the queue has drained, the next request goes straight out
+        self.assertEqual(self.reserve_at(limiter, 1010.0), 0)
+
+    def test_no_burst_across_second_boundary(self):
+        limiter = RateLimiter("boundary.test", rate=1)
+        self.assertEqual(self.reserve_at(limiter, 1000.999), 0)
+        self.assertAlmostEqual(self.reserve_at(limiter, 1001.001), 0.998)
+
+    def test_capacity_allows_bursts(self):
+        limiter = RateLimiter("burst.test", rate=2, capacity=3)
+        waits = [self.reserve_at(limiter, 1000.0) for _ in range(5)]
+        for wait, expected in zip(waits, [0, 0, 0, 0.5, 1.0]):
+            self.assertAlmostEqual(wait, expected)
+
+    def test_limiters_are_independent(self):
+        first = RateLimiter("first.test", rate=1)
+        second = RateLimiter("second.test", rate=1)
+        self.assertEqual(self.reserve_at(first, 1000.0), 0)
+        self.assertEqual(self.reserve_at(second, 1000.0), 0)
+
+    def test_acquire_sleeps_for_its_turn(self):
+        limiter = RateLimiter("acquire.test", rate=4)
+        self.time.time.return_value = 1000.0
+        limiter.acquire()
+        limiter.acquire()
+        self.time.sleep.assert_called_once()
+        self.assertAlmostEqual(self.time.sleep.call_args.args[0], 0.25)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RateLimiterConcurrencyTests(SimpleTestCase):
+    @mock.patch("spotify_map.rate_limit.time.time", return_value=1000.0)
+    def test_concurrent_callers_get_their_own_times(self, _):
+        limiter = RateLimiter("concurrency.test", rate=100)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            waits = sorted(executor.map(lambda _: limiter.reserve(), range(32)))
+        # One caller per 10ms slot, however the threads interleave
+        for i, wait in enumerate(waits):
+            self.assertAlmostEqual(wait, i * 0.01)
@@ -0,0 +1,66 @@
+import io
+from datetime import timedelta
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from spotify_map.models import Artists
+from spotify_map.spotify_utils import SPOTIFY_BATCH_SIZE
+from spotify_map.tests import LOCMEM_CACHES
+
+
+def spotify_artist(spotify_id: str) -> dict:
+    return {"id": spotify_id, "images": [{"url": f"https://example.com/{spotify_id}.jpg"}]}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SPOTIPY_CLIENT_ID="id", SPOTIPY_CLIENT_SECRET="secret")
+class RefreshJsonTests(TestCase):
+    def setUp(self):
+        self.sp = mock.Mock()
+        self.sp.artists.side_effect = lambda ids: {"artists": [spotify_artist(spotify_id) for spotify_id in ids]}
+        patcher = mock.patch("spotify_map.management.commands.refresh_json.get_app_spotify_client", return_value=self.sp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def refresh(self, *args) -> str:
+        out = io.StringIO()
+        call_command("refresh_json", *args, stdout=out, stderr=out)
+        return out.getvalue()
+
+    def test_refreshes_in_batches(self):
+        Artists.objects.bulk_create([Artists(spotify_id=f"artist{i:03}", name=f"Artist {i}") for i in range(SPOTIFY_BATCH_SIZE * 2 + 5)])
+        out = self.refresh()
+        self.assertEqual([len(call.args[0]) for call in self.sp.artists.call_args_list], [SPOTIFY_BATCH_SIZE, SPOTIFY_BATCH_SIZE, 5])
+        self.assertIn(f"{SPOTIFY_BATCH_SIZE * 2 + 5} artists updated", out)
+
+        artist = Artists.objects.get(spotify_id="artist000")
+        self.assertEqual(artist.complete_artist_json, spotify_artist("artist000"))
+        self.assertEqual(artist.photo_url, "https://example.com/artist000.jpg")
+        self.assertIsNotNone(artist.refreshed_at)
+
+    def test_unknown_artists_are_skipped(self):
+        Artists.objects.create(spotify_id="alpha", name="Alpha")
+        Artists.objects.create(spotify_id="gone", name="Gone")
+        self.sp.artists.side_effect = lambda ids: {"artists": [None if spotify_id == "gone" else spotify_artist(spotify_id) for spotify_id in ids]}
+        self.refresh()
+        self.assertIsNotNone(Artists.objects.get(spotify_id="alpha").refreshed_at)
+        self.assertIsNone(Artists.objects.get(spotify_id="gone").refreshed_at)
+
+    def test_only_stale_artists_are_refreshed(self):
+        now = timezone.now()
+        Artists.objects.create(spotify_id="fresh", name="Fresh", refreshed_at=now - timedelta(days=1))
+        Artists.objects.create(spotify_id="stale", name="Stale", refreshed_at=now - timedelta(days=30))
+        Artists.objects.create(spotify_id="never", name="Never")
+        self.refresh()
+        self.sp.artists.assert_called_once_with(["never", "stale"])
+
+        self.sp.artists.reset_mock()
+        self.refresh("--all")
+        self.sp.artists.assert_called_once_with(["fresh", "never", "stale"])
+
+    def test_failed_batches_are_skipped(self):
+        Artists.objects.bulk_create([Artists(spotify_id=f"artist{i:03}", name=f"Artist {i}") for i in range(SPOTIFY_BATCH_SIZE + 1)])
+        self.sp.artists.side_effect = [RuntimeError("Spotify is down"), {"artists": [spotify_artist(f"artist{SPOTIFY_BATCH_SIZE:03}")]}]
+        out = self.refresh()
+        self.assertIn("Spotify is down", out)
+        self.assertEqual(list(Artists.objects.filter(refreshed_at__isnull=False).values_list("spotify_id", flat=True)), [f"artist{SPOTIFY_BATCH_SIZE:03}"])
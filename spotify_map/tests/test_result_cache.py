@@ -0,0 +1,85 @@
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from spotify_map.jobs import claim_job, run_loading_job
+from spotify_map.models import LoadingJobs
+from spotify_map.result_cache import RESULT_CACHE, cache_result, get_cached_result, top_artists_fingerprint
+from spotify_map.tests import LOCMEM_CACHES
+
+
+def ranked(*spotify_ids) -> list:
+    return [{"spotify_id": spotify_id, "name": spotify_id.title()} for spotify_id in spotify_ids]
+
+
+RESULT = {
+    "st_artists": [
+        {"spotify_id": "alpha", "name": "Alpha", "sign": "Leo", "rank": 1},
+        {"spotify_id": "bravo", "name": "Bravo", "rank": 2},
+    ],
+    "mt_artists": [],
+    "lt_artists": [],
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        caches[RESULT_CACHE].clear()
+
+    def test_fingerprint(self):
+        fingerprint = top_artists_fingerprint(ranked("alpha", "bravo"), ranked("bravo"), [])
+        self.assertEqual(fingerprint, top_artists_fingerprint(ranked("alpha", "bravo"), ranked("bravo"), []))
+        # Order and time range both matter
+        self.assertNotEqual(fingerprint, top_artists_fingerprint(ranked("bravo", "alpha"), ranked("bravo"), []))
+        self.assertNotEqual(fingerprint, top_artists_fingerprint(ranked("alpha", "bravo"), [], ranked("bravo")))
+
+    def test_unchanged_top_artists(self):
+        cache_result("user1", "fingerprint", RESULT)
+        self.assertEqual(get_cached_result("user1", "fingerprint"), (RESULT, {}))
+        self.assertEqual(get_cached_result("user2", "fingerprint"), (None, {}))
+
+    def test_changed_top_artists(self):
+        # Only artists with more than a name are reused
+        cache_result("user1", "fingerprint", RESULT)
+        self.assertEqual(get_cached_result("user1", "other"), (None, {
+            "alpha": {"spotify_id": "alpha", "name": "Alpha", "sign": "Leo"},
+        }))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReturningUserTests(TestCase):
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.rankings = {"st_artists": ranked("alpha", "bravo"), "mt_artists": [], "lt_artists": []}
+        for name, value in [
+            ("get_spotify_client", mock.Mock()),
+            ("fetch_all_top_artists", mock.Mock(side_effect=lambda sp: ("user1", {}, self.rankings))),
+            ("fetch_artists_info", mock.Mock(return_value=RESULT)),
+        ]:
+            patcher = mock.patch(f"spotify_map.jobs.{name}", value)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def run_job(self) -> LoadingJobs:
+        job = LoadingJobs.objects.create(token_info={"access_token": "token"})
+        claim_job(job.pk)
+        run_loading_job(LoadingJobs.objects.get(pk=job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, LoadingJobs.DONE)
+        return job
+
+    def test_unchanged_top_artists_skip_enrichment(self):
+        self.run_job()
+        job = self.run_job()
+        self.fetch_artists_info.assert_called_once()
+        self.assertEqual(job.result["st_artists"], ["alpha", "bravo"])
+
+    def test_changed_top_artists_reuse_known_artists(self):
+        self.run_job()
+        self.rankings = {"st_artists": ranked("alpha", "charlie"), "mt_artists": [], "lt_artists": []}
+        self.run_job()
+        self.assertEqual(self.fetch_artists_info.call_count, 2)
+        self.assertEqual(self.fetch_artists_info.call_args.kwargs["known_artists"], {
+            "alpha": {"spotify_id": "alpha", "name": "Alpha", "sign": "Leo"},
+        })
@@ -0,0 +1,63 @@
+import threading
+from unittest import mock
+from django.test import SimpleTestCase
+from spotify_map.spotify_utils import (
+    TOP_ARTIST_TIME_RANGES, fetch_all_top_artists, fetch_top_spotify_artists, get_spotify_client, get_spotify_session,
+)
+
+TOP_ARTISTS = {
+    "short_term": ["alpha", "bravo"],
+    "medium_term": ["bravo", "charlie"],
+    "long_term": ["charlie", "alpha", "delta"],
+}
+
+
+def fake_spotify(barrier: threading.Barrier = None) -> mock.Mock:
+    def wait():
+        if barrier:
+            barrier.wait()
+
+    def current_user():
+        wait()
+        return {"id": "user1"}
+
+    def current_user_top_artists(time_range, limit):
+        wait()
+        return {"items": [{"id": spotify_id, "name": spotify_id.title()} for spotify_id in TOP_ARTISTS[time_range]]}
+
+    sp = mock.Mock()
+    sp.current_user.side_effect = current_user
+    sp.current_user_top_artists.side_effect = current_user_top_artists
+    return sp
+
+
+class FetchAllTopArtistsTests(SimpleTestCase):
+    def test_result(self):
+        user_id, artists, rankings = fetch_all_top_artists(fake_spotify())
+        self.assertEqual(user_id, "user1")
+        self.assertEqual(set(artists), {"alpha", "bravo", "charlie", "delta"})
+        self.assertEqual(
+            {key: [artist["spotify_id"] for artist in top_artists] for key, top_artists in rankings.items()},
+            {key: TOP_ARTISTS[time_range] for key, time_range in TOP_ARTIST_TIME_RANGES.items()},
+        )
+        # Artists in several ranges are the same dictionary
+        self.assertIs(rankings["st_artists"][1], rankings["mt_artists"][0])
+        self.assertIs(rankings["lt_artists"][1], artists["alpha"])
+
+    def test_requests_run_concurrently(self):
+        # Each request waits for the other three; one at a time, they'd time out
+        barrier = threading.Barrier(len(TOP_ARTIST_TIME_RANGES) + 1, timeout=5)
+        user_id, _, _ = fetch_all_top_artists(fake_spotify(barrier))
+        self.assertEqual(user_id, "user1")
+
+    def test_invalid_time_range(self):
+        with self.assertRaises(ValueError):
+            fetch_top_spotify_artists(fake_spotify(), "forever")
+
+
+class SpotifyClientTests(SimpleTestCase):
+    def test_clients_share_one_session(self):
+        first = get_spotify_client({"access_token": "first"})
+        second = get_spotify_client({"access_token": "second"})
+        self.assertIs(first._session, get_spotify_session())
+        self.assertIs(second._session, first._session)
@@ -0,0 +1,103 @@
+import io
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from spotify_map.artist_cards import get_cards
+from spotify_map.models import Artists, UnmatchedArtists
+from spotify_map.musicbrainz import UNMATCHED_RETRY_BASE, UNMATCHED_RETRY_MAX, unmatched_retry_after
+from spotify_map.result_cache import cache_result, get_cached_result
+from spotify_map.tests import LOCMEM_CACHES
+
+
+class UnmatchedRetryAfterTests(SimpleTestCase):
+    def test_backoff(self):
+        now = timezone.now()
+        self.assertEqual(unmatched_retry_after(0, now), now)
+        self.assertEqual(unmatched_retry_after(1, now), now + UNMATCHED_RETRY_BASE)
+        self.assertEqual(unmatched_retry_after(3, now), now + UNMATCHED_RETRY_BASE * 4)
+        self.assertEqual(unmatched_retry_after(20, now), now + UNMATCHED_RETRY_MAX)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RetryUnmatchedArtistsTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        self.now = timezone.now()
+        for spotify_id, attempts, due_in in [("found", 2, -1), ("missed", 2, -2), ("skipped", 0, -3), ("unavailable", 1, -4), ("later", 1, 1)]:
+            UnmatchedArtists.objects.create(
+                spotify_id=spotify_id, name=spotify_id.title(), spotify_info={"images": [{"url": f"https://example.com/{spotify_id}.jpg"}]},
+                attempts=attempts, last_attempt=self.now - timedelta(days=7), retry_after=self.now + timedelta(hours=due_in),
+            )
+        patcher = mock.patch(
+            "spotify_map.management.commands.retry_unmatched_artists.enrich_new_artists",
+            side_effect=lambda artists: {
+                artist["spotify_id"]: {"name": artist["name"], "birth_date": "1990-07-23"} if artist["spotify_id"] == "found" else None
+                for artist in artists if artist["spotify_id"] != "unavailable"
+            },
+        )
+        self.enrich = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def retry(self, *args) -> str:
+        out = io.StringIO()
+        call_command("retry_unmatched_artists", *args, stdout=out)
+        return out.getvalue()
+
+    def test_retry(self):
+        self.assertEqual(get_cards(["found"])["found"], {"spotify_id": "found", "name": "Found"})
+        out = self.retry()
+        self.assertIn("1 artists found, 2 still unmatched", out)
+        self.assertIn("1 artists skipped", out)
+        # Oldest due first, and not the ones that aren't due yet
+        self.assertEqual([artist["spotify_id"] for artist in self.enrich.call_args.args[0]], ["unavailable", "skipped", "missed", "found"])
+
+        found = Artists.objects.get(spotify_id="found")
+        self.assertEqual(found.zodiac_sign, "Leo")
+        self.assertEqual(found.photo_url, "https://example.com/found.jpg")
+        self.assertEqual(get_cards(["found"])["found"]["sign"], "Leo")
+
+        unmatched = {artist.spotify_id: artist for artist in UnmatchedArtists.objects.all()}
+        self.assertEqual(set(unmatched), {"missed", "skipped", "unavailable", "later"})
+        self.assertEqual(unmatched["missed"].attempts, 3)
+        self.assertGreaterEqual(unmatched["missed"].retry_after, self.now + UNMATCHED_RETRY_BASE * 4)
+        self.assertEqual(unmatched["skipped"].attempts, 1)
+        self.assertGreaterEqual(unmatched["skipped"].retry_after, self.now + UNMATCHED_RETRY_BASE)
+        # Still due
+        self.assertEqual(unmatched["unavailable"].attempts, 1)
+        self.assertLess(unmatched["unavailable"].retry_after, self.now)
+
+    def test_limit(self):
+        self.retry("--limit=1")
+        self.assertEqual([artist["spotify_id"] for artist in self.enrich.call_args.args[0]], ["unavailable"])
+
+    def test_nothing_due(self):
+        UnmatchedArtists.objects.exclude(spotify_id="later").delete()
+        self.assertIn("No unmatched artists due", self.retry())
+        self.enrich.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RefreshBareArtistsTests(TestCase):
+    def setUp(self):
+        caches["results"].clear()
+
+    def test_artists_matched_since_are_filled_in(self):
+        result = {
+            "st_artists": [{"spotify_id": "alpha", "name": "Alpha", "rank": 1}, {"spotify_id": "bravo", "name": "Bravo", "rank": 2}],
+            "mt_artists": [{"spotify_id": "alpha", "name": "Alpha", "rank": 1}],
+            "lt_artists": [],
+        }
+        cache_result("user1", "fingerprint", result)
+        Artists.objects.create(spotify_id="alpha", name="Alpha", birth_date="1990-07-23")
+
+        cached, _ = get_cached_result("user1", "fingerprint")
+        self.assertEqual(cached["st_artists"][0]["sign"], "Leo")
+        self.assertEqual(cached["st_artists"][0]["rank"], 1)
+        self.assertEqual(cached["mt_artists"][0]["sign"], "Leo")
+        self.assertEqual(cached["st_artists"][1], {"spotify_id": "bravo", "name": "Bravo", "rank": 2})
+
+        # Written back to the cache
+        self.assertEqual(caches["results"].get("top_artists:user1")["result"], cached)
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+from django.test import SimpleTestCase
+from spotify_map.zodiac import astrological_sign, astrological_signs
+
+
+def old_astrological_sign(month: int, day: int) -> str:
+    # The if/elif chain the day table replaced
+    if (month == 1 and day >= 20) or (month == 2 and day <= 18):
+        return "Aquarius"
+    elif (month == 2 and day >= 19) or (month == 3 and day <= 20):
+        return "Pisces"
+    elif (month == 3 and day >= 21) or (month == 4 and day <= 19):
+        return "Aries"
+    elif (month == 4 and day >= 20) or (month == 5 and day <= 20):
+        return "Taurus"
+    elif (month == 5 and day >= 21) or (month == 6 and day <= 20):
+        return "Gemini"
+    elif (month == 6 and day >= 21) or (month == 7 and day <= 22):
+        return "Cancer"
+    elif (month == 7 and day >= 23) or (month == 8 and day <= 22):
+        return "Leo"
+    elif (month == 8 and day >= 23) or (month == 9 and day <= 22):
+        return "Virgo"
+    elif (month == 9 and day >= 23) or (month == 10 and day <= 22):
+        return "Libra"
+    elif (month == 10 and day >= 23) or (month == 11 and day <= 21):
+        return "Scorpio"
+    elif (month == 11 and day >= 22) or (month == 12 and day <= 21):
+        return "Sagittarius"
+    else:
+        return "Capricorn"
+
+
+class ZodiacTests(SimpleTestCase):
+    # 2024 is a leap year, so this is every day there is
+    DAYS = [date(2024, 1, 1) + timedelta(days=i) for i in range(366)]
+
+    def test_day_table_matches_old_logic(self):
+        for day in self.DAYS:
+            with self.subTest(day=day):
+                self.assertEqual(astrological_sign(day.isoformat()), old_astrological_sign(day.month, day.day))
+
+    def test_batch_matches_old_logic(self):
+        expected = [old_astrological_sign(day.month, day.day) for day in self.DAYS]
+        self.assertEqual(astrological_signs([day.isoformat() for day in self.DAYS]), expected)
+        self.assertEqual(astrological_signs(self.DAYS), expected)
+
+    def test_unpadded_dates(self):
+        self.assertEqual(astrological_sign("1990-7-3"), "Cancer")
+        self.assertEqual(astrological_signs(["1990-7-23"]), ["Leo"])
+
+    def test_invalid_dates(self):
+        self.assertIsNone(astrological_sign("2023-02-29"))
+        self.assertIsNone(astrological_sign("not a date"))
+        self.assertIsNone(astrological_sign(None))
+        self.assertEqual(astrological_signs(["1990-07-23", "", None]), ["Leo", None, None])
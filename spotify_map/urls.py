@@ -11,7 +11,12 @@ urlpatterns = [
     path('loading/', views.loading_page, name='loading_page'),
     path('check_loading_status', views.check_loading_status, name='check_loading_status'),
     path('start-loading/', views.start_loading, name='start_loading'),
+    path('loading-events/', views.loading_events, name='loading_events'),
     path('top-artists/<str:time_range>/', views.top_artists, name='top_artists'),
+    path('api/map/<str:time_range>.geojson', views.map_geojson, name='map_geojson'),
+    path('api/map/<str:time_range>/clusters/<int:zoom>.geojson', views.map_clusters, name='map_clusters'),
+    path('api/artists/bbox/', views.artists_in_viewport, name='artists_in_viewport'),
+    path('api/artists/near/', views.artists_nearby, name='artists_nearby'),
     path('zodiac/', views.zodiac_breakdown, name='zodiac'),
     path('logout/', views.logout, name='logout'),
     path('logout_redirect/', views.logout_redirect, name='logout_redirect'),
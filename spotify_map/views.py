@@ -1,13 +1,30 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import logout as auth_logout
-from .musicbrainz import fetch_artists_info
-from .spotify_utils import get_authorize_url, get_access_token, fetch_top_spotify_artists, get_spotify_client
+from .artist_cards import TIME_RANGE_KEYS, hydrate
+from .catalog import DEFAULT_BBOX_RESULTS, MAX_RADIUS_RESULTS, InvalidQuery, artists_in_bbox, artists_near, nearest_artists
+from .clustering import clusters_at_zoom
+from .jobs import aenqueue_loading_job, expire_stale_jobs, is_stale
+from .map_data import artists_geojson, geojson_response
+from .models import LoadingJobs
+from .spotify_utils import get_authorize_url, get_access_token
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.http import HttpResponseRedirect
 from django.core.cache import cache
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+import asyncio
+import json
 import time
 
+# How often the loading progress stream checks whether the job has changed
+# (no more often than loading.html polls check_loading_status), how often it
+# sends a comment to keep quiet connections open, and how long one stream
+# lasts before the browser reconnects (EventSource does that by itself)
+LOADING_EVENTS_INTERVAL = 1.5
+LOADING_EVENTS_KEEPALIVE = 15
+LOADING_EVENTS_MAX_SECONDS = 120
+
 # --- Landing Route (Pre-login) ---
 def landing(request):
     """
@@ -34,7 +51,7 @@ def home(request):
     if 'artists' not in request.session:
         return redirect('login')  # Redirect to login if no artists are available
 
-    # Get the full artist data (the dictionary of 3 lists: st_artists, mt_artists, lt_artists)
+    # Get the ranked artist IDs (the dictionary of 3 lists: st_artists, mt_artists, lt_artists)
     artists_data = request.session.get('artists', None)
 
     return render(request, 'home.html', {'artists_data': artists_data})
@@ -62,40 +79,130 @@ def login_callback(request):
 
 def loading_page(request):
     """
-    Renders the loading screen. JS will poll `start_loading`.
+    Renders the loading screen. JS will call `start_loading` and then follow
+    `loading_events` until the data is ready, or poll `check_loading_status`
+    when the app isn't served over ASGI (where responses can't be streamed).
     """
-    return render(request, 'loading.html')
+    return render(request, 'loading.html', {'stream_progress': isinstance(request, ASGIRequest)})
 
-def start_loading(request):
+async def start_loading(request):
     """
-    Actually loads artist data and returns a status update.
+    Queues a background job to load artist data and returns right away.
+    Under ASGI the job runs on the server's event loop (see
+    aenqueue_loading_job).
     """
-    token_info = request.session.get('token_info', None)
+    token_info = await request.session.aget('token_info', None)
     if not token_info:
         return JsonResponse({'error': 'No token'}, status=403)
 
-    sp = get_spotify_client(token_info)
-
-    # Fetch artist data
-    st_artists = fetch_top_spotify_artists(sp, "short_term")
-    mt_artists = fetch_top_spotify_artists(sp, "medium_term")
-    lt_artists = fetch_top_spotify_artists(sp, "long_term")
-    all_artists = fetch_artists_info(st_artists, mt_artists, lt_artists)
+    job = await aenqueue_loading_job(token_info, on_event_loop=isinstance(request, ASGIRequest))
 
     # Store in session
-    request.session['artists'] = all_artists
-    request.session['loading_complete'] = True
-    request.session.modified = True
+    await request.session.aset('loading_job', job.pk)
+    await request.session.aset('loading_complete', False)
 
     return JsonResponse({'success': True})
 
 def check_loading_status(request):
     """
-    Checks if the artist loading process is complete.
-    Returns a JSON response with the loading status.
+    Checks how far along the artist loading job is.
+    Returns a JSON response with the loading status and per-stage progress.
+    """
+    if request.session.get('loading_complete', False):
+        return JsonResponse({'loading_complete': True})
+
+    job_id = request.session.get('loading_job', None)
+    job = LoadingJobs.objects.filter(pk=job_id).first() if job_id else None
+    if not job:
+        return JsonResponse({'loading_complete': False, 'error': 'No loading job'}, status=404)
+
+    # Its worker may have died (see jobs.JOB_STALE_AFTER)
+    if is_stale(job.status, job.updated_at) and expire_stale_jobs(job.pk):
+        job.refresh_from_db()
+
+    if job.status == LoadingJobs.DONE:
+        # Move the ranked artist IDs into the session, and we no longer need the job
+        request.session['artists'] = job.result
+        request.session['loading_complete'] = True
+        del request.session['loading_job']
+        job.delete()
+        return JsonResponse({'loading_complete': True})
+
+    response = {'loading_complete': False, 'progress': job.progress()}
+    if job.status == LoadingJobs.FAILED:
+        response['error'] = 'There was an error loading your data.'
+    return JsonResponse(response)
+
+async def loading_events(request):
     """
-    loading_complete = request.session.get('loading_complete', False)
-    return JsonResponse({'loading_complete': loading_complete})
+    Streams the loading job's progress as server-sent events: `progress`
+    (the same counts check_loading_status returns) whenever it changes, then
+    `complete` once the artists are in the session, or `failed`.
+    """
+    if await request.session.aget('loading_complete', False):
+        return HttpResponse(_server_sent_event('complete', {'loading_complete': True}), content_type='text/event-stream')
+
+    job_id = await request.session.aget('loading_job', None)
+    if not job_id:
+        return JsonResponse({'loading_complete': False, 'error': 'No loading job'}, status=404)
+
+    response = StreamingHttpResponse(_loading_event_stream(request, job_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop proxies (e.g. nginx) from holding events back
+    return response
+
+def _server_sent_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _loading_event_stream(request, job_id):
+    # Django stops iterating this (raising CancelledError at the next await)
+    # if the client disconnects
+    started = last_sent = time.monotonic()
+    last_updated = None
+    while time.monotonic() - started < LOADING_EVENTS_MAX_SECONDS:
+        # Only updated_at is read each time; jobs.update_job sets it on every
+        # change, so the whole row is only loaded when there's news
+        status, updated_at = await LoadingJobs.objects.filter(pk=job_id).values_list('status', 'updated_at').afirst() or (None, None)
+        if updated_at is None:
+            # Finished by another request (e.g. a check_loading_status poll)
+            if await request.session.aget('loading_complete', False):
+                yield _server_sent_event('complete', {'loading_complete': True})
+            else:
+                yield _server_sent_event('failed', {'error': 'No loading job'})
+            return
+
+        if is_stale(status, updated_at):
+            # Its worker may have died; failing it changes updated_at, so
+            # it's reported next time round
+            await sync_to_async(expire_stale_jobs)(job_id)
+        elif updated_at != last_updated:
+            last_updated = updated_at
+            job = await LoadingJobs.objects.filter(pk=job_id).afirst()
+            if job is None:
+                continue
+
+            if job.status == LoadingJobs.DONE:
+                # As in check_loading_status; the session middleware has
+                # already run by now, so save the session here
+                await request.session.aset('artists', job.result)
+                await request.session.aset('loading_complete', True)
+                await request.session.apop('loading_job', None)
+                await request.session.asave()
+                await job.adelete()
+                yield _server_sent_event('complete', {'loading_complete': True})
+                return
+
+            if job.status == LoadingJobs.FAILED:
+                yield _server_sent_event('failed', {'error': 'There was an error loading your data.'})
+                return
+
+            yield _server_sent_event('progress', job.progress())
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= LOADING_EVENTS_KEEPALIVE:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+
+        await asyncio.sleep(LOADING_EVENTS_INTERVAL)
 
 def top_artists(request, time_range):
     """
@@ -104,20 +211,105 @@ def top_artists(request, time_range):
     if 'artists' not in request.session:
         return redirect('login')  # Redirect to login if no artists are available
 
-    # Get the artist data for the requested time range
-    artists_data = request.session.get('artists', None)
+    # Get the ranked artist IDs for the requested time range
+    artist_ids = request.session.get('artists', None)
 
     if time_range == 'short':
-        artists = artists_data.get('st_artists', [])
+        key = 'st_artists'
     elif time_range == 'medium':
-        artists = artists_data.get('mt_artists', [])
+        key = 'mt_artists'
     elif time_range == 'long':
-        artists = artists_data.get('lt_artists', [])
+        key = 'lt_artists'
     else:
         # Handle invalid time range
         return redirect('home')  # Redirect to home if the time_range is invalid
+
+    # Look up the artists' details
+    artists = hydrate(artist_ids, [key])[key]
     return render(request, 'top_artists.html', {'artists': artists, 'time_range': time_range})
 
+def map_geojson(request, time_range):
+    """
+    The map markers for a time range's top artists, unclustered, as GeoJSON,
+    for clients that cluster (or export) the points themselves. The map page
+    loads map_clusters instead. Cacheable by the browser (see
+    geojson_response).
+    """
+    if 'artists' not in request.session:
+        return JsonResponse({'error': 'Not logged in'}, status=403)
+
+    key = TIME_RANGE_KEYS.get(time_range)
+    if not key:
+        return JsonResponse({'error': 'Unknown time range'}, status=404)
+
+    artists = hydrate(request.session['artists'], [key])[key]
+    return geojson_response(request, artists_geojson(artists))
+
+def map_clusters(request, time_range, zoom):
+    """
+    The map markers for a time range's top artists, clustered for a zoom
+    level (see clustering.py), as GeoJSON.
+    """
+    if 'artists' not in request.session:
+        return JsonResponse({'error': 'Not logged in'}, status=403)
+
+    key = TIME_RANGE_KEYS.get(time_range)
+    if not key:
+        return JsonResponse({'error': 'Unknown time range'}, status=404)
+
+    artists = hydrate(request.session['artists'], [key])[key]
+    return geojson_response(request, clusters_at_zoom(artists_geojson(artists), zoom))
+
+def artists_in_viewport(request):
+    """
+    Catalog artists born inside a bounding box, for exploring the map beyond
+    the user's own top artists.
+
+    Query parameters: south, west, north, east (degrees; west > east crosses
+    the antimeridian), limit (see catalog.MAX_BBOX_RESULTS), and cursor (the
+    previous page's `next`).
+    """
+    if 'artists' not in request.session:
+        return JsonResponse({'error': 'Not logged in'}, status=403)
+
+    try:
+        bbox = [float(request.GET[param]) for param in ('south', 'west', 'north', 'east')]
+        limit = int(request.GET.get('limit', DEFAULT_BBOX_RESULTS))
+        artists, next_cursor = artists_in_bbox(*bbox, limit=limit, cursor=request.GET.get('cursor'))
+    except KeyError as e:
+        return JsonResponse({'error': f'Missing parameter {e.args[0]}'}, status=400)
+    except ValueError as e:  # Including InvalidQuery
+        return JsonResponse({'error': str(e) if isinstance(e, InvalidQuery) else 'Invalid parameter'}, status=400)
+
+    return JsonResponse({'artists': artists, 'next': next_cursor})
+
+def artists_nearby(request):
+    """
+    Catalog artists born near a point, nearest first, each with a distance_km.
+
+    Query parameters: lat and lon, and either radius_km (with an optional
+    limit) for everyone within that distance, or k for the k nearest (within
+    catalog.NEAREST_MAX_RADIUS_KM).
+    """
+    if 'artists' not in request.session:
+        return JsonResponse({'error': 'Not logged in'}, status=403)
+
+    try:
+        latitude, longitude = float(request.GET['lat']), float(request.GET['lon'])
+        if 'k' in request.GET:
+            artists = nearest_artists(latitude, longitude, int(request.GET['k']))
+        elif 'radius_km' in request.GET:
+            limit = int(request.GET['limit']) if 'limit' in request.GET else MAX_RADIUS_RESULTS
+            artists = artists_near(latitude, longitude, float(request.GET['radius_km']), limit)
+        else:
+            return JsonResponse({'error': 'Missing parameter radius_km or k'}, status=400)
+    except KeyError as e:
+        return JsonResponse({'error': f'Missing parameter {e.args[0]}'}, status=400)
+    except ValueError as e:  # Including InvalidQuery
+        return JsonResponse({'error': str(e) if isinstance(e, InvalidQuery) else 'Invalid parameter'}, status=400)
+
+    return JsonResponse({'artists': artists})
+
 
 # --- Zodiac Route ---
 def zodiac_breakdown(request):
@@ -128,7 +320,7 @@ def zodiac_breakdown(request):
         return redirect('login')  # Redirect to login if no artists are available
 
     # Get the artist data for all time ranges
-    artists_data = request.session.get('artists', None)
+    artists_data = hydrate(request.session.get('artists', None))
 
     # Group the artists by zodiac sign for each time range
     time_ranges = ['st_artists', 'mt_artists', 'lt_artists']
@@ -0,0 +1,89 @@
+from datetime import date, datetime
+
+# First (month, day) of each sign, in calendar order
+SIGN_STARTS = [
+    ((1, 20), "Aquarius"),
+    ((2, 19), "Pisces"),
+    ((3, 21), "Aries"),
+    ((4, 20), "Taurus"),
+    ((5, 21), "Gemini"),
+    ((6, 21), "Cancer"),
+    ((7, 23), "Leo"),
+    ((8, 23), "Virgo"),
+    ((9, 23), "Libra"),
+    ((10, 23), "Scorpio"),
+    ((11, 22), "Sagittarius"),
+    ((12, 22), "Capricorn"),
+]
+SIGNS = [sign for _, sign in SIGN_STARTS]
+
+
+def _build_sign_table() -> list:
+    # Sign index for every (month, day), stored at month * 32 + day
+    table = [None] * (13 * 32)
+    current = SIGNS.index("Capricorn")  # Jan 1 - Jan 19
+    starts = dict(SIGN_STARTS)
+    for month in range(1, 13):
+        for day in range(1, 32):
+            if starts.get((month, day)):
+                current = SIGNS.index(starts[(month, day)])
+            table[month * 32 + day] = current
+    return table
+
+
+SIGN_TABLE = _build_sign_table()
+
+
+def parse_date(date_string) -> date | None:
+    """
+    Parses a date in the format yyyy-mm-dd, returning None if it isn't one.
+    Date objects are returned as-is.
+    """
+    if isinstance(date_string, date):
+        return date_string
+    try:
+        # Fast path for zero-padded dates, which is nearly all of them
+        if len(date_string) == 10 and date_string[4] == "-" and date_string[7] == "-":
+            return date.fromisoformat(date_string)
+        return datetime.strptime(date_string, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def sign_for_date(birthdate: date) -> str:
+    return SIGNS[SIGN_TABLE[birthdate.month * 32 + birthdate.day]]
+
+
+def astrological_sign(birthdate_str):
+    """
+    Returns the zodiac sign for a yyyy-mm-dd string (or date), or None if it
+    isn't a valid date.
+    """
+    birthdate = parse_date(birthdate_str)
+    return sign_for_date(birthdate) if birthdate else None
+
+
+def astrological_signs(dates) -> list:
+    """
+    Maps many dates to zodiac signs in one pass.
+
+    Args:
+        dates: yyyy-mm-dd strings, date objects or None.
+
+    Returns:
+        List of signs, with None for missing or invalid dates.
+    """
+    return [astrological_sign(birthdate) for birthdate in dates]
+
+
+def is_valid_date(date_string):
+    """
+    Checks if a string is a valid date in the format yyyy-mm-dd.
+
+    Args:
+        date_string: The string to check.
+
+    Returns:
+        True if the string is a valid date, False otherwise.
+    """
+    return parse_date(date_string) is not None